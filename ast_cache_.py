@@ -0,0 +1,229 @@
+# The ASTCache avoids re-lexing and re-parsing programs that have been seen before.
+# Parsed Element trees are stored in a compact serialized form (nested tuples and lists
+# encoded with marshal), keyed by a hash of the program source and of the grammar
+# version, in an in-memory LRU and optionally in a directory on disk. The source
+# positions of the nodes are stored alongside, in the order the nodes are walked.
+#
+# Entries are serialized even in memory: every hit rebuilds a fresh Element tree, so a
+# caller can't corrupt the cached copy by changing the tree it was handed.
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+import brewlex
+import brewparse
+import element
+import pratt_
+from brewparse import parse_program, PLY_FRONTEND
+from element import Element, NODE_CLASSES, walk
+
+# bump when the serialized form changes
+FORMAT_VERSION = 4
+
+_grammar_version = None
+
+
+def grammar_version():
+    """Hash of the lexer, the parser and the AST node definitions"""
+    global _grammar_version
+    if _grammar_version is None:
+        digest = hashlib.sha256(f"{FORMAT_VERSION}:{sys.version}".encode())
+        for module in (brewlex, brewparse, pratt_, element):
+            with open(module.__file__, "rb") as f:
+                digest.update(f.read())
+        _grammar_version = digest.hexdigest()
+    return _grammar_version
+
+
+def cache_key(program: str) -> str:
+    digest = hashlib.sha256(grammar_version().encode())
+    digest.update(program.encode())
+    return digest.hexdigest()
+
+
+def serialize(ast: Element) -> bytes:
+    positions = [ast.positions.get(node) for node in walk(ast)]
+    return marshal.dumps((_to_tuples(ast), positions))
+
+
+def deserialize(data: bytes) -> Element:
+    tree, positions = marshal.loads(data)
+    ast = _from_tuples(tree)
+    ast.positions = {
+        node: position
+        for node, position in zip(walk(ast), positions)
+        if position is not None
+    }
+    return ast
+
+
+def _to_tuples(v):
+    """Elements become (elem_type, *children) tuples, lists stay lists"""
+    if isinstance(v, Element):
+        return (v.elem_type,) + tuple(
+            _to_tuples(getattr(v, key)) for key in v._fields
+        )
+    if isinstance(v, list):
+        return [_to_tuples(item) for item in v]
+    return v
+
+
+def _from_tuples(v):
+    if isinstance(v, tuple):
+        node_class = NODE_CLASSES[v[0]]
+        children = (_from_tuples(child) for child in v[1:])
+        return node_class(v[0], **dict(zip(node_class._fields, children)))
+    if isinstance(v, list):
+        return [_from_tuples(item) for item in v]
+    return v
+
+
+class ASTCache:
+    """Content-addressed cache of parsed programs
+
+    max_memory_bytes bounds the total size of the serialized trees kept in memory. If
+    cache_dir is set, trees are also written there and the directory is trimmed to
+    max_disk_bytes, evicting the least recently used files first.
+    """
+
+    def __init__(
+        self, max_memory_bytes=64 << 20, cache_dir=None, max_disk_bytes=256 << 20
+    ):
+        self.max_memory_bytes = max_memory_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()  # key -> serialized tree, least recently used first
+        self.memory_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def parse(self, program: str, frontend=PLY_FRONTEND) -> Element:
+        """Return the AST of a program, parsing it with the frontend only if it isn't
+        cached. Both frontends build the same tree, so they share the entries."""
+        key = cache_key(program)
+        ast = self.__get(key)
+        if ast is None:
+            ast = parse_program(program, frontend)
+            self.__put(key, serialize(ast))
+        return ast
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.memory_bytes = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.memory),
+            "memory_bytes": self.memory_bytes,
+        }
+
+    def __get(self, key):
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+        if data is not None:
+            return deserialize(data)
+
+        data = self.__read_disk(key)
+        ast = None
+        if data is not None:
+            try:
+                ast = deserialize(data)
+            except Exception:  # pylint: disable=broad-except
+                # a truncated or corrupt file counts as a miss and is written again
+                _remove(self.__disk_path(key))
+        with self.lock:
+            if ast is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self.__put_memory(key, data)
+        return ast
+
+    def __put(self, key, data):
+        with self.lock:
+            self.__put_memory(key, data)
+        self.__write_disk(key, data)
+
+    def __put_memory(self, key, data):
+        if len(data) > self.max_memory_bytes:
+            return
+        old = self.memory.pop(key, None)
+        if old is not None:
+            self.memory_bytes -= len(old)
+        self.memory[key] = data
+        self.memory_bytes += len(data)
+        while self.memory_bytes > self.max_memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+            self.evictions += 1
+
+    def __disk_path(self, key):
+        return os.path.join(self.cache_dir, key + ".ast")
+
+    def __read_disk(self, key):
+        if self.cache_dir is None:
+            return None
+        path = self.__disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # the mtime tracks the last use for eviction
+            return data
+        except OSError:
+            return None
+
+    def __write_disk(self, key, data):
+        if self.cache_dir is None:
+            return
+        try:
+            # write to a temporary file first so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        except OSError:
+            return  # the disk cache is best effort
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self.__disk_path(key))
+            self.__trim_disk()
+        except OSError:
+            _remove(tmp_path)  # already gone if it was renamed
+
+    def __trim_disk(self):
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".ast"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            _remove(path)
+            total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,342 @@
+# Runs many Brewin programs in parallel on a pool of worker processes.
+#
+# Every worker imports the interpreter (building the PLY parser) once and then runs jobs
+# sent to it over a pipe, keeping an in-memory ASTCache between jobs. A job that runs
+# past its timeout gets its worker killed and replaced; a job that exceeds the memory
+# limit fails with a MemoryError in its worker, which is then replaced as well. Results
+# are yielded as soon as they are available, in completion order.
+#
+# Usage: python batch_.py [-j WORKERS] [--timeout SEC] [--memory-limit MB]
+#                         [--engine ENGINE] [--json] FILE...
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing.connection import wait
+
+try:
+    import resource
+except ImportError:  # not available on Windows, memory limits are then ignored
+    resource = None
+
+from ast_cache_ import ASTCache
+from interpreter_ import Interpreter
+
+OK = "ok"  # the program ran to completion
+ERROR = "error"  # the program failed with a Brewin error (ErrorType)
+TIMEOUT = "timeout"  # the program ran longer than the timeout
+MEMORY = "memory"  # the program went over the memory limit
+CRASH = "crash"  # the interpreter raised an unexpected exception or the worker died
+
+
+class Job:
+    """A program to run, with the input lines it reads and optionally the output it is
+    expected to produce (followed by the error type for failing programs)"""
+
+    def __init__(self, program, stdin=None, expected=None, name=None, engine="tree"):
+        self.program = program
+        self.stdin = stdin or []
+        self.expected = expected
+        self.name = name
+        self.engine = engine
+
+
+class JobResult:
+    def __init__(self, job_id, name, status, output=(), error_type=None, message=""):
+        self.job_id = job_id  # position of the job in the submitted list
+        self.name = name
+        self.status = status
+        self.output = list(output)
+        self.error_type = error_type  # e.g. "ErrorType.NAME_ERROR" when status is ERROR
+        self.message = message
+        self.elapsed = 0.0
+        self.passed = None  # set when the job has an expected output
+
+    def received(self):
+        """Output in the format of the *OUT* section of a test program"""
+        if self.status == ERROR:
+            return self.output + [self.error_type]
+        return self.output
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "name": self.name,
+            "status": self.status,
+            "output": self.output,
+            "error_type": self.error_type,
+            "message": self.message,
+            "elapsed": self.elapsed,
+            "passed": self.passed,
+        }
+
+
+def extract_test_data(lines, tag):
+    """Lines between the *IN* or *OUT* markers of a test program"""
+    in_section = False
+    data = []
+    for line in lines:
+        if line.strip() == f"*{tag}*":
+            in_section = not in_section
+        elif in_section:
+            data.append(line.rstrip("\n"))
+    return data
+
+
+def load_job(path, engine="tree"):
+    """Build a Job from a .br file, reading its *IN* and *OUT* sections"""
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    expected = extract_test_data(lines, "OUT")
+    return Job(
+        "".join(lines),
+        stdin=extract_test_data(lines, "IN"),
+        expected=expected if any(line.strip() == "*OUT*" for line in lines) else None,
+        name=path,
+        engine=engine,
+    )
+
+
+def run_job(job_id, job, ast_cache=None):
+    """Run a job in the current process"""
+    interpreter = Interpreter(
+        False, job.stdin, False, engine=job.engine, ast_cache=ast_cache
+    )
+    start = time.perf_counter()
+    out_of_memory = False
+    try:
+        interpreter.run(job.program)
+        result = JobResult(job_id, job.name, OK, interpreter.get_output())
+    except MemoryError:
+        # nothing can be allocated until the program's heap is released below
+        out_of_memory = True
+    except Exception as e:  # pylint: disable=broad-except
+        error_type, _ = interpreter.get_error_type_and_line()
+        if error_type is None:
+            result = JobResult(
+                job_id, job.name, CRASH, interpreter.get_output(), message=repr(e)
+            )
+        else:
+            result = JobResult(
+                job_id,
+                job.name,
+                ERROR,
+                interpreter.get_output(),
+                str(error_type),
+                str(e),
+            )
+    if out_of_memory:
+        interpreter = None
+        result = JobResult(job_id, job.name, MEMORY, message="memory limit exceeded")
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _worker_main(conn, memory_limit):
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    ast_cache = ASTCache()
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        job_id, job = task
+        result = run_job(job_id, job, ast_cache)
+        conn.send(result)
+        # the heap may be in a bad state after a MemoryError, let the pool replace us
+        if result.status == MEMORY:
+            return
+
+
+class _Worker:
+    def __init__(self, context, memory_limit):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, memory_limit), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.task = None  # (job id, job) being run
+        self.deadline = None
+
+    def send(self, job_id, job, timeout):
+        self.task = (job_id, job)
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.conn.send(self.task)
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.conn.close()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.kill()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class BatchRunner:
+    """Pool of warm worker processes running Jobs
+
+    workers defaults to the number of CPUs. timeout is the wall-clock limit of a job in
+    seconds and memory_limit the address space limit of a worker in bytes (Unix only),
+    None disables either limit.
+    """
+
+    def __init__(self, workers=None, timeout=5.0, memory_limit=None):
+        self.n_workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.context = multiprocessing.get_context()
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+
+    def run(self, jobs):
+        """Run the jobs, yielding a JobResult as each of them completes"""
+        pending = deque(enumerate(jobs))
+        idle = list(self.workers)
+        busy = {}  # conn -> worker
+
+        try:
+            while pending or busy:
+                while pending and (idle or len(self.workers) < self.n_workers):
+                    worker = idle.pop() if idle else self.__spawn()
+                    job_id, job = pending.popleft()
+                    worker.send(job_id, job, self.timeout)
+                    busy[worker.conn] = worker
+
+                for conn in wait(list(busy), self.__wait_timeout(busy.values())):
+                    worker = busy.pop(conn)
+                    job_id, job = worker.task
+                    try:
+                        result = conn.recv()
+                    except (EOFError, OSError):
+                        # the worker died without reporting, e.g. killed by the OS
+                        result = JobResult(
+                            job_id, job.name, CRASH, message="worker process died"
+                        )
+                        self.__replace(worker)
+                    else:
+                        if result.status == MEMORY:
+                            self.__replace(worker)
+                        else:
+                            idle.append(worker)
+                    yield self.__check(job, result)
+
+                now = time.monotonic()
+                for conn, worker in list(busy.items()):
+                    if worker.deadline is not None and now >= worker.deadline:
+                        del busy[conn]
+                        job_id, job = worker.task
+                        self.__replace(worker)
+                        result = JobResult(
+                            job_id,
+                            job.name,
+                            TIMEOUT,
+                            message=f"timed out after {self.timeout}s",
+                        )
+                        result.elapsed = self.timeout
+                        yield self.__check(job, result)
+        finally:
+            # when the caller stops early, don't leave jobs running in the pool
+            for worker in busy.values():
+                self.__replace(worker)
+
+    def __spawn(self):
+        worker = _Worker(self.context, self.memory_limit)
+        self.workers.append(worker)
+        return worker
+
+    def __replace(self, worker):
+        worker.kill()
+        self.workers.remove(worker)
+
+    def __wait_timeout(self, workers):
+        deadlines = [w.deadline for w in workers if w.deadline is not None]
+        if not deadlines:
+            return None
+        return max(0, min(deadlines) - time.monotonic())
+
+    def __check(self, job, result):
+        if job.expected is not None:
+            result.passed = result.received() == job.expected
+        return result
+
+
+def run_batch(paths, workers=None, timeout=5.0, memory_limit=None, engine="tree"):
+    """Run .br files on a pool of workers, returns their results in input order"""
+    jobs = [load_job(path, engine) for path in paths]
+    with BatchRunner(workers, timeout, memory_limit) as runner:
+        results = list(runner.run(jobs))
+    return sorted(results, key=lambda result: result.job_id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run Brewin programs in parallel. Programs with an *OUT* section "
+        "are checked against it."
+    )
+    parser.add_argument("files", nargs="+", help=".br programs to run")
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None, help="number of worker processes"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=5.0, help="timeout per program in seconds"
+    )
+    parser.add_argument(
+        "--memory-limit", type=int, default=None, help="memory limit per worker in MB"
+    )
+    parser.add_argument(
+        "--engine", default=Interpreter.TREE_ENGINE, choices=sorted(Interpreter.ENGINES)
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="print one JSON object per result"
+    )
+    args = parser.parse_args(argv)
+
+    memory_limit = args.memory_limit << 20 if args.memory_limit else None
+    jobs = [load_job(path, args.engine) for path in args.files]
+    failed = 0
+    with BatchRunner(args.workers, args.timeout, memory_limit) as runner:
+        for result in runner.run(jobs):
+            if result.passed is False or result.status in (TIMEOUT, MEMORY, CRASH):
+                failed += 1
+            if args.json:
+                print(json.dumps(result.to_dict()), flush=True)
+                continue
+            if result.passed is None:
+                verdict = result.status.upper()
+            else:
+                verdict = "PASSED" if result.passed else "FAILED"
+            print(f"{verdict:8} {result.elapsed:8.3f}s  {result.name}", flush=True)
+            if result.status in (TIMEOUT, MEMORY, CRASH):
+                print(f"         {result.message}", flush=True)
+
+    if not args.json:
+        print(f"{len(jobs) - failed}/{len(jobs)} programs passed.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3 @@
+# Performance benchmarks: representative Brewin++ programs in programs/, and a runner
+# (runner.py, also run by `python -m benchmarks`) reporting their parse time, execution
+# time, peak memory and number of evaluated AST nodes on every execution engine.
@@ -0,0 +1,244 @@
+# Runs the benchmark programs on every execution engine and reports, per program and
+# engine:
+#   parse_s     best parse time over the repeats, in seconds
+#   exec_s      best execution time over the repeats (parsing excluded), in seconds
+#   peak_bytes  peak memory allocated during one execution, measured with tracemalloc
+#   nodes       number of AST nodes of the program
+#   node_evals  number of statement and expression nodes evaluated by the tree walker,
+#               the same amount of work for every engine
+#   node_ns     execution time divided by node_evals, in nanoseconds: the average cost
+#               of evaluating one node, which dispatch overhead dominates
+#
+# Results can be written to a JSON file and compared against a previous one: a metric
+# more than --threshold (relative) above the baseline is reported as a regression and
+# makes the runner exit with status 1.
+#
+# Usage, from the root of the repository:
+#   python -m benchmarks [--engine E ...] [--frontend F] [--repeat N] [--output FILE]
+#                        [--baseline FILE] [--threshold 0.1] [BENCHMARK ...]
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from batch_ import extract_test_data
+from brewparse import parse_program, FRONTENDS, PLY_FRONTEND
+from element import Element
+from interpreter_ import Interpreter
+from profiler_ import Profiler
+
+PROGRAM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "programs")
+
+PROFILED_RECURSION_LIMIT = 10000
+
+# metrics compared against the baseline
+TIMED_METRICS = ("parse_s", "exec_s", "peak_bytes")
+
+
+def list_benchmarks():
+    return sorted(
+        name[: -len(".br")] for name in os.listdir(PROGRAM_DIR) if name.endswith(".br")
+    )
+
+
+def load_benchmark(name):
+    """Returns the program, its input lines and its expected output"""
+    with open(os.path.join(PROGRAM_DIR, name + ".br"), encoding="utf-8") as f:
+        lines = f.readlines()
+    stdin = extract_test_data(lines, "IN")
+    return "".join(lines), stdin, extract_test_data(lines, "OUT")
+
+
+class _Parsed:
+    """Stands in for an ASTCache, so that timed runs don't include parsing"""
+
+    def __init__(self, ast):
+        self.ast = ast
+
+    def parse(self, program, frontend=None):
+        return self.ast
+
+
+def count_nodes(node):
+    if isinstance(node, Element):
+        return 1 + sum(count_nodes(getattr(node, key)) for key in node._fields)
+    if isinstance(node, list):
+        return sum(count_nodes(item) for item in node)
+    return 0
+
+
+def count_node_evaluations(ast, stdin):
+    """Run the program on the tree walker, counting the nodes it evaluates"""
+    profiler = Profiler()
+    # profiling wraps every node evaluation, which takes more Python frames per call
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, PROFILED_RECURSION_LIMIT))
+    try:
+        Interpreter(False, stdin, ast_cache=_Parsed(ast), profiler=profiler).run("")
+    finally:
+        sys.setrecursionlimit(limit)
+    return sum(stats.count for stats in profiler.node_stats.values())
+
+
+def run_benchmark(name, engine, repeat=3, frontend=PLY_FRONTEND):
+    program, stdin, expected = load_benchmark(name)
+
+    parse_s = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ast = parse_program(program, frontend)
+        parse_s = min(parse_s, time.perf_counter() - start)
+
+    def execute():
+        interpreter = Interpreter(False, stdin, engine=engine, ast_cache=_Parsed(ast))
+        interpreter.run(program)
+        if interpreter.get_output() != expected:
+            raise AssertionError(
+                f"{name} on {engine}: expected {expected}, "
+                f"got {interpreter.get_output()}"
+            )
+
+    exec_s = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        execute()
+        exec_s = min(exec_s, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        execute()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {"parse_s": parse_s, "exec_s": exec_s, "peak_bytes": peak_bytes}
+
+
+def measure_work(name):
+    """Size of a benchmark and number of nodes it evaluates, the same for all engines"""
+    program, stdin, _ = load_benchmark(name)
+    ast = parse_program(program)
+    return {"nodes": count_nodes(ast), "node_evals": count_node_evaluations(ast, stdin)}
+
+
+def run_all(names, engines, repeat=3, progress=None, frontend=PLY_FRONTEND):
+    """Returns {benchmark: {engine: metrics}}"""
+    results = {}
+    for name in names:
+        work = measure_work(name)
+        results[name] = {}
+        for engine in engines:
+            metrics = {**run_benchmark(name, engine, repeat, frontend), **work}
+            metrics["node_ns"] = metrics["exec_s"] * 1e9 / max(metrics["node_evals"], 1)
+            results[name][engine] = metrics
+            if progress is not None:
+                progress(name, engine, results[name][engine])
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Returns the regressions as (benchmark, engine, metric, baseline, current)"""
+    regressions = []
+    for name, engines in results.items():
+        for engine, metrics in engines.items():
+            old = baseline.get(name, {}).get(engine)
+            if old is None:
+                continue
+            for metric in TIMED_METRICS:
+                if old.get(metric) and metrics[metric] > old[metric] * (1 + threshold):
+                    regressions.append(
+                        (name, engine, metric, old[metric], metrics[metric])
+                    )
+            # the work done by a program is deterministic, any growth is a regression
+            evals, old_evals = metrics["node_evals"], old.get("node_evals")
+            if old_evals is not None and evals > old_evals:
+                regressions.append((name, engine, "node_evals", old_evals, evals))
+    return regressions
+
+
+def format_row(name, engine, metrics):
+    return (
+        f"{name:14} {engine:8} {metrics['parse_s'] * 1000:9.2f} "
+        f"{metrics['exec_s'] * 1000:10.2f} {metrics['peak_bytes'] / 1024:10.1f} "
+        f"{metrics['nodes']:7} {metrics['node_evals']:11} {metrics['node_ns']:8.0f}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Brewin++ benchmarks")
+    parser.add_argument(
+        "benchmarks", nargs="*", help="benchmarks to run (default: all of them)"
+    )
+    parser.add_argument(
+        "--engine",
+        action="append",
+        choices=sorted(Interpreter.ENGINES),
+        help="engine to benchmark, can be repeated (default: all of them)",
+    )
+    parser.add_argument(
+        "--frontend",
+        default=PLY_FRONTEND,
+        choices=sorted(FRONTENDS),
+        help="parser timed for parse_s (default: %(default)s)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per metric")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative increase over the baseline reported as a regression",
+    )
+    args = parser.parse_args(argv)
+
+    names = args.benchmarks or list_benchmarks()
+    engines = args.engine or [
+        Interpreter.TREE_ENGINE,
+        Interpreter.CLOSURE_ENGINE,
+        Interpreter.VM_ENGINE,
+    ]
+
+    print(
+        f"{'benchmark':14} {'engine':8} {'parse ms':>9} {'exec ms':>10} "
+        f"{'peak KiB':>10} {'nodes':>7} {'node evals':>11} {'ns/node':>8}"
+    )
+    results = run_all(
+        names,
+        engines,
+        args.repeat,
+        lambda name, engine, metrics: print(
+            format_row(name, engine, metrics), flush=True
+        ),
+        args.frontend,
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "time": time.time(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, engine, metric, old, new in regressions:
+            print(
+                f"REGRESSION {name} {engine} {metric}: {old:.6g} -> {new:.6g} "
+                f"({(new / old - 1) * 100:+.1f}%)"
+            )
+        if regressions:
+            return 1
+        print(f"No regression above {args.threshold * 100:.0f}% of the baseline.")
+    return 0
@@ -1,4 +1,6 @@
 
+import hashlib
+
 from ply import lex
 
 reserved = (
@@ -129,8 +131,38 @@ def t_error(t):
     print(f"Illegal character {t.value[0]}")
     t.lexer.skip(1)
 
-def reset_lineno():
-    lexer.lineno = 1
-
-# Build the lexer
-lexer = lex.lex()
+def source_hash(*paths):
+    """Hash of source files, recorded in the tables generated from them"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _read_lexer():
+    """The lexer loaded from brewlextab.py, or None if it's missing or was generated
+    from another version of this file"""
+    try:
+        import brewlextab
+
+        if brewlextab._source_hash != source_hash(__file__):
+            return None
+        lexobj = lex.Lexer()
+        lexobj.readtab(brewlextab, globals())
+        return lexobj
+    except (ImportError, AttributeError):
+        return None
+
+
+def build_lexer():
+    """The lexer built from the rules above"""
+    # lex() reads the rules from the globals of its caller, this module, which keep the
+    # order of definition: string rules of the same length match in that order
+    return lex.lex()
+
+
+# Build the lexer, cloned by every brewparse.Parser. Loading its regular expressions
+# from the generated brewlextab.py skips checking the rules above; brewparse.py
+# regenerates it.
+lexer = _read_lexer() or build_lexer()
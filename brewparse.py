@@ -1,7 +1,35 @@
-from element import Element
+import copy
+import os
+import sys
+import threading
+
+import brewlex
+from element import (
+    Program,
+    StructDef,
+    FieldDef,
+    FuncDef,
+    Arg,
+    Assign,
+    VarDef,
+    If,
+    For,
+    Try,
+    Catch,
+    Raise,
+    Return,
+    UnaryOp,
+    BinOp,
+    New,
+    Constant,
+    Nil,
+    VarRef,
+    FCall,
+)
 from brewlex import *
 from intbase import InterpreterBase
 from ply import yacc
+from pratt_ import PrattParser
 
 # Parsing rules
 
@@ -14,6 +42,21 @@ precedence = (
     ("right", "UMINUS", "NOT"),
 )
 
+
+def _position(p, index):
+    """(line, column) of the index-th symbol of the rule, both starting at 1"""
+    lexpos = p.lexpos(index)
+    column = lexpos - p.lexer.lexdata.rfind("\n", 0, lexpos)
+    return p.lineno(index), column
+
+
+def _at(p, node, index=1):
+    """Record the position of the index-th symbol of the rule as the position of node"""
+    # p.parser is the Parser's own LRParser, see Parser.parse
+    p.parser.positions[node] = _position(p, index)
+    return node
+
+
 def collapse_items(p, group_index, singleton_index):
     if len(p) == 2:
         p[0] = [p[1]]
@@ -26,9 +69,9 @@ def p_program(p):
     """program : structs funcs
     | funcs"""
     if len(p) == 2:
-        p[0] = Element(InterpreterBase.PROGRAM_NODE, structs=[], functions=p[1])
+        p[0] = _at(p, Program(InterpreterBase.PROGRAM_NODE, structs=[], functions=p[1]))
     else:
-        p[0] = Element(InterpreterBase.PROGRAM_NODE, structs=p[1], functions=p[2])
+        p[0] = _at(p, Program(InterpreterBase.PROGRAM_NODE, structs=p[1], functions=p[2]))
 
 def p_structs(p):
     """structs : structs struct
@@ -37,7 +80,7 @@ def p_structs(p):
 
 def p_struct(p):
    "struct : STRUCT NAME LBRACE fields RBRACE"
-   p[0] = Element(InterpreterBase.STRUCT_NODE, name=p[2], fields=p[4])
+   p[0] = _at(p, StructDef(InterpreterBase.STRUCT_NODE, name=p[2], fields=p[4]))
 
 def p_fields(p):
    """fields : fields field
@@ -46,7 +89,7 @@ def p_fields(p):
 
 def p_field(p):
   "field : NAME COLON NAME SEMI"  # field_name: type
-  p[0] = Element(InterpreterBase.FIELD_DEF_NODE, name=p[1], var_type=p[3])
+  p[0] = _at(p, FieldDef(InterpreterBase.FIELD_DEF_NODE, name=p[1], var_type=p[3]))
 
 def p_funcs(p):
     """funcs : funcs func
@@ -58,17 +101,17 @@ def p_func(p):
     """func : FUNC NAME LPAREN formal_args RPAREN COLON NAME LBRACE statements RBRACE
     | FUNC NAME LPAREN RPAREN COLON NAME LBRACE statements RBRACE"""
     if len(p) == 11:  # handle with 1+ formal args
-        p[0] = Element(InterpreterBase.FUNC_NODE, name=p[2], args=p[4], return_type = p[7], statements=p[9])
+        p[0] = _at(p, FuncDef(InterpreterBase.FUNC_NODE, name=p[2], args=p[4], return_type = p[7], statements=p[9]))
     else:  # handle no formal args
-        p[0] = Element(InterpreterBase.FUNC_NODE, name=p[2], args=[], return_type = p[6], statements=p[8])
+        p[0] = _at(p, FuncDef(InterpreterBase.FUNC_NODE, name=p[2], args=[], return_type = p[6], statements=p[8]))
 
 def p_func2(p):
     """func : FUNC NAME LPAREN formal_args RPAREN LBRACE statements RBRACE
     | FUNC NAME LPAREN RPAREN LBRACE statements RBRACE"""
     if len(p) == 9:  # handle with 1+ formal args
-        p[0] = Element(InterpreterBase.FUNC_NODE, name=p[2], args=p[4], return_type = None, statements=p[7])
+        p[0] = _at(p, FuncDef(InterpreterBase.FUNC_NODE, name=p[2], args=p[4], return_type = None, statements=p[7]))
     else:  # handle no formal args
-        p[0] = Element(InterpreterBase.FUNC_NODE, name=p[2], args=[], return_type = None, statements=p[6])
+        p[0] = _at(p, FuncDef(InterpreterBase.FUNC_NODE, name=p[2], args=[], return_type = None, statements=p[6]))
 
 def p_formal_args(p):
     """formal_args : formal_args COMMA formal_arg
@@ -80,9 +123,9 @@ def p_formal_arg(p):
     """formal_arg : NAME COLON NAME
     | NAME"""
     if len(p) == 2:
-      p[0] = Element(InterpreterBase.ARG_NODE, name=p[1], var_type = None)
+      p[0] = _at(p, Arg(InterpreterBase.ARG_NODE, name=p[1], var_type = None))
     else:
-      p[0] = Element(InterpreterBase.ARG_NODE, name=p[1], var_type = p[3])
+      p[0] = _at(p, Arg(InterpreterBase.ARG_NODE, name=p[1], var_type = p[3]))
 
 def p_statements(p):
     """statements : statements statement
@@ -96,15 +139,15 @@ def p_statement___assign(p):
 
 def p_assign(p):
     "assign : variable_w_dot ASSIGN expression"
-    p[0] = Element("=", name=p[1], expression=p[3])
+    p[0] = _at(p, Assign("=", name=p[1], expression=p[3]))
 
 def p_statement___var(p):
     """statement : VAR variable COLON NAME SEMI
     | VAR variable SEMI"""
     if len(p) == 6:
-      p[0] = Element(InterpreterBase.VAR_DEF_NODE, name=p[2], var_type=p[4])
+      p[0] = _at(p, VarDef(InterpreterBase.VAR_DEF_NODE, name=p[2], var_type=p[4]))
     else:
-      p[0] = Element(InterpreterBase.VAR_DEF_NODE, name=p[2], var_type=None)
+      p[0] = _at(p, VarDef(InterpreterBase.VAR_DEF_NODE, name=p[2], var_type=None))
 
 def p_variable(p):
     "variable : NAME"
@@ -123,23 +166,25 @@ def p_statement_if(p):
     | IF LPAREN expression RPAREN LBRACE statements RBRACE ELSE LBRACE statements RBRACE
     """
     if len(p) == 8:
-        p[0] = Element(
+        p[0] = If(
             InterpreterBase.IF_NODE,
             condition=p[3],
             statements=p[6],
             else_statements=None,
         )
+        _at(p, p[0])
     else:
-        p[0] = Element(
+        p[0] = If(
             InterpreterBase.IF_NODE,
             condition=p[3],
             statements=p[6],
             else_statements=p[10],
         )
+        _at(p, p[0])
 
 def p_statement_try(p):
     """statement : TRY LBRACE statements RBRACE catchers"""
-    p[0] = Element(InterpreterBase.TRY_NODE, statements=p[3], catchers=p[5])
+    p[0] = _at(p, Try(InterpreterBase.TRY_NODE, statements=p[3], catchers=p[5]))
 
 def p_catches(p):
     """catchers : catchers catch
@@ -148,15 +193,15 @@ def p_catches(p):
 
 def p_catch(p):
     "catch : CATCH STRING LBRACE statements RBRACE"
-    p[0] = Element(InterpreterBase.CATCH_NODE, exception_type=p[2], statements=p[4])
+    p[0] = _at(p, Catch(InterpreterBase.CATCH_NODE, exception_type=p[2], statements=p[4]))
 
 def p_statement_for(p):
     "statement : FOR LPAREN assign SEMI expression SEMI assign RPAREN LBRACE statements RBRACE"
-    p[0] = Element(InterpreterBase.FOR_NODE, init=p[3], condition=p[5], update=p[7], statements=p[10])
+    p[0] = _at(p, For(InterpreterBase.FOR_NODE, init=p[3], condition=p[5], update=p[7], statements=p[10]))
 
 def p_statement_raise(p):
     "statement : RAISE expression SEMI"
-    p[0] = Element(InterpreterBase.RAISE_NODE, exception_type=p[2])
+    p[0] = _at(p, Raise(InterpreterBase.RAISE_NODE, exception_type=p[2]))
 
 def p_statement_expr(p):
     "statement : expression SEMI"
@@ -170,21 +215,21 @@ def p_statement_return(p):
         expr = p[2]
     else:
         expr = None
-    p[0] = Element(InterpreterBase.RETURN_NODE, expression=expr)
+    p[0] = _at(p, Return(InterpreterBase.RETURN_NODE, expression=expr))
 
 
 def p_expression_not(p):
     "expression : NOT expression"
-    p[0] = Element(InterpreterBase.NOT_NODE, op1=p[2])
+    p[0] = _at(p, UnaryOp(InterpreterBase.NOT_NODE, op1=p[2]))
 
 
 def p_expression_uminus(p):
     "expression : MINUS expression %prec UMINUS"
-    p[0] = Element(InterpreterBase.NEG_NODE, op1=p[2])
+    p[0] = _at(p, UnaryOp(InterpreterBase.NEG_NODE, op1=p[2]))
 
 def p_expression_new(p):
     "expression : NEW NAME"
-    p[0] = Element(InterpreterBase.NEW_NODE, var_type=p[2])
+    p[0] = _at(p, New(InterpreterBase.NEW_NODE, var_type=p[2]))
 
 
 def p_arith_expression_binop(p):
@@ -198,7 +243,7 @@ def p_arith_expression_binop(p):
     | expression MINUS expression
     | expression MULTIPLY expression
     | expression DIVIDE expression"""
-    p[0] = Element(p[2], op1=p[1], op2=p[3])
+    p[0] = _at(p, BinOp(p[2], op1=p[1], op2=p[3]))
 
 
 def p_expression_group(p):
@@ -209,43 +254,43 @@ def p_expression_group(p):
 def p_expression_and_or(p):
     """expression : expression OR expression
     | expression AND expression"""
-    p[0] = Element(p[2], op1=p[1], op2=p[3])
+    p[0] = _at(p, BinOp(p[2], op1=p[1], op2=p[3]))
 
 
 def p_expression_number(p):
     "expression : NUMBER"
-    p[0] = Element(InterpreterBase.INT_NODE, val=p[1])
+    p[0] = _at(p, Constant(InterpreterBase.INT_NODE, val=p[1]))
 
 
 def p_expression_bool(p):
     """expression : TRUE
     | FALSE"""
     bool_val = p[1] == InterpreterBase.TRUE_DEF
-    p[0] = Element(InterpreterBase.BOOL_NODE, val=bool_val)
+    p[0] = _at(p, Constant(InterpreterBase.BOOL_NODE, val=bool_val))
 
 
 def p_expression_nil(p):
     "expression : NIL"
-    p[0] = Element(InterpreterBase.NIL_NODE)
+    p[0] = _at(p, Nil(InterpreterBase.NIL_NODE))
 
 
 def p_expression_string(p):
     "expression : STRING"
-    p[0] = Element(InterpreterBase.STRING_NODE, val=p[1])
+    p[0] = _at(p, Constant(InterpreterBase.STRING_NODE, val=p[1]))
 
 
 def p_expression_variable(p):
     "expression : variable_w_dot"
-    p[0] = Element(InterpreterBase.VAR_NODE, name=p[1])
+    p[0] = _at(p, VarRef(InterpreterBase.VAR_NODE, name=p[1]))
 
 
 def p_func_call(p):
     """expression : NAME LPAREN args RPAREN
     | NAME LPAREN RPAREN"""
     if len(p) == 5:
-        p[0] = Element(InterpreterBase.FCALL_NODE, name=p[1], args=p[3])
+        p[0] = _at(p, FCall(InterpreterBase.FCALL_NODE, name=p[1], args=p[3]))
     else:
-        p[0] = Element(InterpreterBase.FCALL_NODE, name=p[1], args=[])
+        p[0] = _at(p, FCall(InterpreterBase.FCALL_NODE, name=p[1], args=[]))
 
 
 def p_expression_args(p):
@@ -261,14 +306,109 @@ def p_error(p):
         print("Syntax error at EOF")
 
 
-# exported function
-def parse_program(program):
-    reset_lineno()
-    ast = yacc.parse(program)
-    if ast is None:
-        raise SyntaxError("Syntax error")
-    return ast
+def _grammar_hash():
+    return brewlex.source_hash(brewlex.__file__, __file__)
+
+
+def _read_parser():
+    """The parser loaded from brewparsetab.py, or None if it's missing or was generated
+    from other versions of brewlex.py and this file"""
+    try:
+        import brewparsetab
+
+        if brewparsetab._source_hash != _grammar_hash():
+            return None
+        tables = yacc.LRTable()
+        tables.read_table(brewparsetab)
+        tables.bind_callables(globals())
+        return yacc.LRParser(tables, p_error)
+    except (ImportError, AttributeError, yacc.VersionError):
+        return None
+
+
+def build_tables():
+    """Regenerate brewlextab.py and brewparsetab.py next to this file, after changing
+    the tokens or the grammar"""
+    outputdir = os.path.dirname(os.path.abspath(__file__))
+    brewlex.build_lexer().writetab("brewlextab", outputdir)
+    # rewrites brewparsetab.py unless its tables are still those of the grammar
+    yacc.yacc(
+        module=sys.modules[__name__],
+        tabmodule="brewparsetab",
+        outputdir=outputdir,
+        debug=False,
+    )
+    for module in ("brewlextab", "brewparsetab"):
+        path = os.path.join(outputdir, module + ".py")
+        with open(path) as f:
+            lines = [line for line in f if not line.startswith("_source_hash = ")]
+        source_hash = (
+            brewlex.source_hash(brewlex.__file__)
+            if module == "brewlextab"
+            else _grammar_hash()
+        )
+        lines.append(f"_source_hash = {source_hash!r}\n")
+        with open(path, "w") as f:
+            f.writelines(lines)
+
 
+# generate our parser: load the tables of brewparsetab.py, or build them in memory if
+# they're out of date, without writing any file. debug=True writes parser.out.
+_parser = _read_parser() or yacc.yacc(debug=False, write_tables=False)
 
-# generate our parser
-yacc.yacc() # yacc.yacc(debug=True, debuglog=open("parse.log", "w"))
+
+class Parser:
+    """A Brewin parser with its own lexer and parsing state. Every Parser shares the
+    lexer rules and LR tables built once when this module is imported, so creating one
+    is cheap. A Parser parses one program at a time, use one per thread."""
+
+    def __init__(self):
+        # shallow copies: the compiled regexes, the tables and the rule functions are
+        # shared and never change, the positions in the input and the stacks are not
+        self.lexer = lexer.clone()
+        self.parser = copy.copy(_parser)
+
+    def parse(self, program):
+        self.lexer.lineno = 1
+        # (line, column) of every node built while parsing, filled in by the rules
+        self.parser.positions = positions = {}
+        try:
+            # tracking gives rules the position of their leftmost token through
+            # p.lineno() and p.lexpos()
+            ast = self.parser.parse(program, lexer=self.lexer, tracking=True)
+        finally:
+            self.parser.positions = None
+        if ast is None:
+            raise SyntaxError("Syntax error")
+        ast.positions = positions
+        return ast
+
+
+_local = threading.local()
+
+PLY_FRONTEND = "ply"  # the LALR parser PLY generates from the rules above
+PRATT_FRONTEND = "pratt"  # the hand-written parser of pratt_.py, faster
+FRONTENDS = {PLY_FRONTEND, PRATT_FRONTEND}
+
+
+# exported function
+def parse_program(program, frontend=PLY_FRONTEND):
+    """Parse a program with the Parser of the calling thread, so threads can parse at
+    the same time, or with a PrattParser. Both build the same tree."""
+    if frontend == PRATT_FRONTEND:
+        try:
+            return PrattParser().parse(program)
+        except SyntaxError:
+            # the PLY parser reports the errors and may recover from them
+            pass
+        except RecursionError:
+            # nested deeper than the Python stack allows, PLY has a stack of its own
+            pass
+    parser = getattr(_local, "parser", None)
+    if parser is None:
+        parser = _local.parser = Parser()
+    return parser.parse(program)
+
+
+if __name__ == "__main__":
+    build_tables()
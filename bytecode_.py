@@ -0,0 +1,366 @@
+# The BytecodeCompiler translates the statements of every function in a parsed Brewin++
+# program into a flat list of instructions for the stack VM in vm_.py. Variables are
+# resolved to frame slots by the Resolver (see resolver_.py), jumps replace the nested
+# if/for blocks, and calls push a new frame instead of recursing in Python.
+#
+# Like the closure compiler, the generated code raises errors lazily when the offending
+# instruction runs and evaluates expressions in the same order as the tree walker.
+from element import Element
+from exception_ import catch_table
+from intbase import InterpreterBase
+from resolver_ import Resolver
+from type_value_ import Type, NIL, get_printable, bool_value, int_value, string_value
+
+# Opcodes. Every instruction is an (opcode, argument) tuple.
+CONST = 0  # push a constant; arg: Value
+DEFAULT = 1  # push the default value of a type; arg: type
+LOAD = 2  # push a variable; arg: slot
+LOAD_FIELD = 3  # push a struct field; arg: (slot, dotted field path)
+LOAD_UNDEFINED = 4  # fail on an unresolved variable; arg: var name
+COERCE = 5  # coerce the top of the stack; arg: target type
+STORE = 6  # pop into a variable; arg: (slot, var name)
+STORE_FIELD = 7  # pop into a struct field; arg: (slot, var name, field path)
+STORE_UNDEFINED = 8  # fail on an assignment to an unresolved variable; arg: var name
+VAR_DEF = 9  # initialize a variable to its default; arg: (slot, type, name, is dup)
+UNARY_OP = 10  # apply a unary operator; arg: (op, {type: lambda})
+BINARY_OP = 11  # apply a binary operator; arg: (op, {type: lambda}, ast node)
+NEW = 12  # allocate a struct; arg: ast node
+JUMP = 13  # arg: target pc
+JUMP_IF_FALSE = 14  # pop a bool and jump when it's false; arg: (target pc, error message)
+CHECK_BOOL = 15  # pop a value and fail unless it's a bool; arg: error message
+CALL = 16  # call a user function; arg: (CodeObject, number of arguments)
+CALL_UNDEFINED = 17  # fail on a call to an unknown function; arg: func name
+RETURN = 18  # return the top of the stack; arg: None
+RETURN_NONE = 19  # fall off the end of a function; arg: None
+POP = 20  # discard the top of the stack; arg: None
+PRINT_START = 21  # push an empty output line; arg: None
+PRINT_ARG = 22  # pop a value and append it to the output line below it; arg: None
+PRINT_END = 23  # pop the output line, emit it and push void; arg: None
+INPUT = 24  # read input, popping the prompt if any; arg: (func name, n args)
+TRACE = 25  # print a statement when tracing; arg: ast node
+# operations proven well typed by the TypeChecker, see typecheck_.py
+CHECKED_UNARY_OP = 26  # apply a unary operator; arg: lambda
+CHECKED_BINARY_OP = 27  # apply a binary operator; arg: lambda
+STORE_CHECKED = 28  # pop a value of the variable's type into it; arg: slot
+# run a user function in place of the running one, for a return statement calling it;
+# arg: (CodeObject, number of arguments, type the result is coerced to or None)
+TAIL_CALL = 29
+# skip the right operand of && or || when the left one, on top of the stack, decides
+# the result, replacing it with the result; arg: (op, pc after the operation)
+SHORT_CIRCUIT = 30
+# pop a string and raise it, jumping to the catch block of the innermost try block
+# catching it, in this function or in a caller; arg: None
+RAISE = 31
+
+OPCODE_NAMES = {
+    value: name
+    for name, value in globals().items()
+    if name.isupper() and isinstance(value, int)
+}
+
+
+class CodeObject:
+    """The bytecode of one Brewin function"""
+
+    def __init__(self, func_def: Element, layout):
+        self.func_def = func_def
+        self.name = func_def.get("name")
+        self.args = func_def.get("args")
+        self.return_type = func_def.get("return_type")
+        self.frame_size = layout.frame_size
+        self.arg_slots = layout.arg_slots
+        self.instructions = []  # filled in by BytecodeCompiler.compile()
+        self.lines = []  # source line of the statement of each instruction
+        # (first pc, pc after the last, {exception type: pc of its catch block}) of each
+        # try block, innermost first
+        self.handlers = []
+
+
+def disassemble(code: CodeObject) -> str:
+    """Return a human readable listing of a CodeObject, for debugging"""
+    lines = [f"{code.name}({len(code.args)}) frame_size={code.frame_size}"]
+    for pc, ((op, arg), line) in enumerate(zip(code.instructions, code.lines)):
+        if op in (CALL, TAIL_CALL):
+            arg = f"{arg[0].name}/{arg[1]}"
+        elif op in (UNARY_OP, BINARY_OP):
+            arg = arg[0]
+        elif op in (CHECKED_UNARY_OP, CHECKED_BINARY_OP):
+            arg = None  # a bare operator lambda
+        elif op == CONST:
+            arg = get_printable(arg) if arg.type() != Type.STRING else repr(arg.value())
+        elif op in (NEW, TRACE):
+            arg = str(arg)
+        elif op == SHORT_CIRCUIT:
+            arg = f"{arg[0]} {arg[1]}"
+        lines.append(
+            f"{'' if line is None else line:>4} {pc:5} {OPCODE_NAMES[op]:16} "
+            f"{'' if arg is None else arg}"
+        )
+    for start, end, catch_pcs in code.handlers:
+        catches = ", ".join(f"{repr(name)} -> {pc}" for name, pc in catch_pcs.items())
+        lines.append(f"try {start}-{end - 1}: {catches}")
+    return "\n".join(lines)
+
+
+class BytecodeCompiler:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.code_objects = {}  # (function name, number of arguments) -> CodeObject
+        self.try_depth = 0  # number of try blocks around the statement being compiled
+
+    def compile(self, func_name_to_ast):
+        """Compile every function in the function table, returns the compiled table"""
+        resolver = Resolver()
+        layouts = {
+            key: resolver.resolve_function(func_def)
+            for key, func_def in func_name_to_ast.items()
+        }
+        # create all the code objects first so that calls can be bound up front
+        self.code_objects = {
+            key: CodeObject(func_def, layouts[key])
+            for key, func_def in func_name_to_ast.items()
+        }
+        for key, code in self.code_objects.items():
+            self.layout = layouts[key]
+            self.code = code.instructions
+            self.lines = code.lines
+            self.handlers = code.handlers
+            self.line = self.interpreter.line_of(code.func_def)
+            self.__emit_block(code.func_def.get("statements"), code.return_type)
+            self.__emit(RETURN_NONE)
+        return self.code_objects
+
+    def __emit(self, op, arg=None):
+        self.code.append((op, arg))
+        self.lines.append(self.line)
+        return len(self.code) - 1
+
+    def __patch(self, pc, arg):
+        self.code[pc] = (self.code[pc][0], arg)
+
+    def __emit_block(self, statements, return_type):
+        outer_line = self.line
+        for statement in statements:
+            self.line = self.interpreter.line_of(statement)
+            if self.interpreter.trace_output:
+                self.__emit(TRACE, statement)
+            self.__emit_statement(statement, return_type)
+        self.line = outer_line
+
+    def __emit_statement(self, statement, return_type):
+        elem_type = statement.elem_type
+        if elem_type == InterpreterBase.FCALL_NODE:
+            self.__emit_call(statement)
+            self.__emit(POP)
+        elif elem_type == "=":
+            self.__emit_assign(statement)
+        elif elem_type == InterpreterBase.VAR_DEF_NODE:
+            self.__emit_var_def(statement)
+        elif elem_type == InterpreterBase.IF_NODE:
+            self.__emit_if(statement, return_type)
+        elif elem_type == InterpreterBase.RETURN_NODE:
+            self.__emit_return(statement.get("expression"), return_type)
+        elif elem_type == InterpreterBase.FOR_NODE:
+            self.__emit_for(statement, return_type)
+        elif elem_type == InterpreterBase.TRY_NODE:
+            self.__emit_try(statement, return_type)
+        elif elem_type == InterpreterBase.RAISE_NODE:
+            self.__emit_expr(statement.get("exception_type"), None)
+            self.__emit(RAISE)
+        # the tree walker ignores any other statement without evaluating it
+
+    def __emit_return(self, expr_ast, return_type):
+        if (
+            expr_ast is not None
+            and expr_ast.elem_type == InterpreterBase.FCALL_NODE
+            and expr_ast.get("name") not in self.interpreter.BUILTIN_FUNCTIONS
+            and not self.try_depth
+        ):
+            args = expr_ast.get("args")
+            code = self.code_objects.get((expr_ast.get("name"), len(args)))
+            if code is not None:
+                for arg, arg_def in zip(args, code.args):
+                    self.__emit_expr(arg, arg_def.get("var_type"))
+                coerce_to = (
+                    None
+                    if self.interpreter.static_types.get(expr_ast) == return_type
+                    else return_type
+                )
+                self.__emit(TAIL_CALL, (code, len(args), coerce_to))
+                return
+        self.__emit_expr(expr_ast, return_type)
+        self.__emit(RETURN)
+
+    def __emit_if(self, if_ast, return_type):
+        self.__emit_expr(if_ast.get("condition"), Type.BOOL)
+        jump_to_else = self.__emit(JUMP_IF_FALSE)
+        self.__emit_block(if_ast.get("statements"), return_type)
+        else_statements = if_ast.get("else_statements")
+        if else_statements:
+            jump_to_end = self.__emit(JUMP)
+            self.__patch(
+                jump_to_else,
+                (len(self.code), "If condition must be a boolean expression"),
+            )
+            self.__emit_block(else_statements, return_type)
+            self.__patch(jump_to_end, len(self.code))
+        else:
+            self.__patch(
+                jump_to_else,
+                (len(self.code), "If condition must be a boolean expression"),
+            )
+
+    def __emit_for(self, for_ast, return_type):
+        condition = for_ast.get("condition")
+        self.__emit_assign(for_ast.get("init"))
+
+        # the tree walker evaluates the condition one extra time for its type check
+        self.__emit_expr(condition, Type.BOOL)
+        self.__emit(CHECK_BOOL, "for condition must be a boolean expression")
+
+        loop_start = len(self.code)
+        self.__emit_expr(condition, Type.BOOL)
+        jump_to_end = self.__emit(JUMP_IF_FALSE)
+        self.__emit_block(for_ast.get("statements"), return_type)
+        self.__emit_block([for_ast.get("update")], return_type)
+        self.__emit(JUMP, loop_start)
+        self.__patch(
+            jump_to_end, (len(self.code), "for condition must be a boolean expression")
+        )
+
+    def __emit_try(self, try_ast, return_type):
+        start = len(self.code)
+        self.try_depth += 1
+        self.__emit_block(try_ast.get("statements"), return_type)
+        self.try_depth -= 1
+        end = len(self.code)
+        jumps_to_end = [self.__emit(JUMP)]
+        catch_pcs = {}
+        for exception_type, catch_ast in catch_table(try_ast).items():
+            catch_pcs[exception_type] = len(self.code)
+            self.__emit_block(catch_ast.get("statements"), return_type)
+            jumps_to_end.append(self.__emit(JUMP))
+        for jump in jumps_to_end:
+            self.__patch(jump, len(self.code))
+        # the try blocks nested in this one were added first
+        self.handlers.append((start, end, catch_pcs))
+
+    def __emit_var_def(self, var_ast):
+        binding = self.layout.binding(var_ast)
+        var_type = var_ast.get("var_type")
+        var_name = var_ast.get("name")
+        # a duplicate definition has no binding, a void variable has no slot
+        slot = binding[1] if binding is not None else None
+        self.__emit(VAR_DEF, (slot, var_type, var_name, binding is None))
+
+    def __emit_assign(self, assign_ast):
+        var_name = assign_ast.get("name")
+        binding = self.layout.binding(assign_ast)
+        self.__emit_expr(assign_ast.get("expression"), None)
+        if binding is None:
+            self.__emit(STORE_UNDEFINED, var_name)
+        elif "." in var_name:
+            self.__emit(
+                STORE_FIELD, (binding[1], var_name, var_name.split(".", 1)[1])
+            )
+        elif assign_ast in self.interpreter.checked_assigns:
+            self.__emit(STORE_CHECKED, binding[1])
+        else:
+            self.__emit(STORE, (binding[1], var_name))
+
+    def __emit_expr(self, expr_ast, target_type):
+        interp = self.interpreter
+        if expr_ast is None:
+            self.__emit(DEFAULT, target_type)
+            return
+
+        elem_type = expr_ast.elem_type
+        # string and bool constants are never coerced by the tree walker
+        if elem_type == InterpreterBase.STRING_NODE:
+            self.__emit(CONST, string_value(expr_ast.get("val")))
+            return
+        if elem_type == InterpreterBase.BOOL_NODE:
+            self.__emit(CONST, bool_value(expr_ast.get("val")))
+            return
+
+        if elem_type == InterpreterBase.NIL_NODE:
+            self.__emit(CONST, NIL)
+        elif elem_type == InterpreterBase.INT_NODE:
+            self.__emit(CONST, int_value(expr_ast.get("val")))
+        elif elem_type == InterpreterBase.VAR_NODE:
+            self.__emit_var(expr_ast)
+        elif elem_type == InterpreterBase.FCALL_NODE:
+            self.__emit_call(expr_ast)
+        elif elem_type in interp.UNARY_OPS:
+            self.__emit_expr(expr_ast.get("op1"), None)
+            if expr_ast in interp.checked_ops:
+                self.__emit(CHECKED_UNARY_OP, interp.checked_ops[expr_ast])
+            else:
+                self.__emit(UNARY_OP, (elem_type, self.__op_lambdas(elem_type)))
+        elif elem_type in interp.BIN_OPS:
+            self.__emit_expr(expr_ast.get("op1"), None)
+            short_circuit = None
+            if elem_type in interp.LOGICAL_OPS and (
+                interp.short_circuit or expr_ast in interp.skippable_ops
+            ):
+                short_circuit = self.__emit(SHORT_CIRCUIT)
+            self.__emit_expr(expr_ast.get("op2"), None)
+            if expr_ast in interp.checked_ops:
+                self.__emit(CHECKED_BINARY_OP, interp.checked_ops[expr_ast])
+            else:
+                self.__emit(
+                    BINARY_OP, (elem_type, self.__op_lambdas(elem_type), expr_ast)
+                )
+            if short_circuit is not None:
+                self.__patch(short_circuit, (elem_type, len(self.code)))
+        elif elem_type == InterpreterBase.NEW_NODE:
+            self.__emit(NEW, expr_ast)
+        else:
+            raise ValueError(f"Unknown expression node {elem_type}")
+
+        if (
+            target_type is not None
+            and interp.static_types.get(expr_ast) != target_type
+        ):
+            self.__emit(COERCE, target_type)
+
+    def __op_lambdas(self, op):
+        """resolve the operator lambda for every operand type up front"""
+        op_to_lambda = self.interpreter.op_to_lambda
+        return {t: ops[op] for t, ops in op_to_lambda.items() if op in ops}
+
+    def __emit_var(self, var_ast):
+        var_name = var_ast.get("name")
+        binding = self.layout.binding(var_ast)
+        if binding is None:
+            self.__emit(LOAD_UNDEFINED, var_name)
+        elif "." in var_name:
+            self.__emit(LOAD_FIELD, (binding[1], var_name.split(".", 1)[1]))
+        else:
+            self.__emit(LOAD, binding[1])
+
+    def __emit_call(self, call_ast):
+        func_name = call_ast.get("name")
+        args = call_ast.get("args")
+
+        if func_name == "print":
+            self.__emit(PRINT_START)
+            for arg in args:
+                self.__emit_expr(arg, None)
+                self.__emit(PRINT_ARG)
+            self.__emit(PRINT_END)
+            return
+        if func_name in ("inputi", "inputs"):
+            if len(args) == 1:
+                self.__emit_expr(args[0], None)
+            self.__emit(INPUT, (func_name, len(args)))
+            return
+
+        code = self.code_objects.get((func_name, len(args)))
+        if code is None:
+            # the tree walker fails before evaluating any argument
+            self.__emit(CALL_UNDEFINED, func_name)
+            return
+        for arg, arg_def in zip(args, code.args):
+            self.__emit_expr(arg, arg_def.get("var_type"))
+        self.__emit(CALL, (code, len(args)))
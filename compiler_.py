@@ -0,0 +1,719 @@
+# The ClosureCompiler turns the statements of every function in a parsed Brewin++
+# program into a tree of pre-bound Python closures. Each AST node is visited once at
+# compile time, so the elem_type dispatch, the operator lookups and the splitting of
+# dotted variable names are paid once instead of on every evaluation.
+#
+# Variables are resolved to frame slots up front by the Resolver (see resolver_.py):
+# every compiled closure takes the frame of the running function, a flat list of
+# Values, and reads or writes its variables by index.
+#
+# The compiled form must behave exactly like the tree-walking Interpreter: errors are
+# raised lazily when the offending node is executed (never at compile time), and
+# expressions are evaluated in the same order.
+
+from element import Element
+from exception_ import BrewinException, catch_table
+from intbase import InterpreterBase, ErrorType
+from memo_ import memo_key
+from resolver_ import Resolver
+from type_value_ import (
+    Type,
+    Value,
+    NIL,
+    bool_value,
+    int_value,
+    string_value,
+    get_printable,
+)
+
+
+class CompiledFunction:
+    """A Brewin function whose body has been compiled into a closure"""
+
+    def __init__(self, func_def: Element, layout):
+        self.func_def = func_def
+        self.name = func_def.get("name")
+        self.args = func_def.get("args")
+        self.return_type = func_def.get("return_type")
+        self.layout = layout
+        self.body = None  # filled in by ClosureCompiler.compile()
+
+
+class TailCall:
+    """Returned by a return statement calling a function: the caller's frame is done,
+    and the callee runs in its place. The tree walker returns it too."""
+
+    __slots__ = ("function", "args", "coerce_to")
+
+    def __init__(self, function, args, coerce_to):
+        # CompiledFunction, or function definition node in the tree walker
+        self.function = function
+        self.args = args  # evaluated
+        self.coerce_to = coerce_to  # type the caller coerces the result to, or None
+
+
+class ClosureCompiler:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.functions = {}  # (function name, number of arguments) -> CompiledFunction
+        self.try_depth = 0  # number of try blocks around the statement being compiled
+
+    def compile(self, func_name_to_ast):
+        """Compile every function in the function table, returns the compiled table"""
+        resolver = Resolver()
+        # create all the function objects first so that calls can be bound up front
+        self.functions = {
+            key: CompiledFunction(func_def, resolver.resolve_function(func_def))
+            for key, func_def in func_name_to_ast.items()
+        }
+        for func in self.functions.values():
+            self.layout = func.layout
+            func.body = self.__compile_block(
+                func.func_def.get("statements"), func.return_type
+            )
+        return self.functions
+
+    def call(self, func_name, arg_closures=(), caller_frame=None):
+        """Call a compiled function, mirrors Interpreter.__run_function"""
+        interp = self.interpreter
+        func = self.functions.get((func_name, len(arg_closures)))
+        if func is None:
+            interp.error(ErrorType.NAME_ERROR, f"Function {func_name} not found")
+        evaluated_args = self.__eval_args(func, arg_closures, caller_frame)
+        key = None
+        if func.func_def in interp.pure_functions:
+            key = memo_key(func.name, evaluated_args)
+            return_val = interp.memo.get(key)
+            if return_val is not None:
+                return return_val
+
+        if interp.call_depth >= interp.max_call_depth:
+            interp.call_depth_exceeded()
+        interp.call_depth += 1
+        caller_node = interp.current_node
+        profiler = interp.profiler
+        # tail calls replacing the frames of their callers, with the caller's return
+        # statement
+        tail_calls = []
+        while True:
+            frame = self.__bind_args(func, evaluated_args)
+            if profiler is not None:
+                profiler.enter_function(func.name)
+                result = func.body(frame)
+                profiler.exit_function()
+            else:
+                result = func.body(frame)
+            if result.__class__ is not TailCall:
+                break
+            tail_calls.append((func, result, interp.current_node))
+            func = result.function
+            evaluated_args = result.args
+
+        has_return = result is not None
+        return_val = self.__check_return(
+            func, has_return, result[0] if has_return else None
+        )
+        # finish the returns of the tail calls, innermost first
+        coerce_value = interp.coerce_value
+        for func, tail_call, return_ast in reversed(tail_calls):
+            interp.current_node = return_ast
+            if tail_call.coerce_to is not None:
+                return_val = coerce_value(return_val, tail_call.coerce_to)
+            return_val = self.__check_return(func, True, return_val)
+        if key is not None:
+            interp.memo.put(key, return_val)
+        interp.call_depth -= 1
+        interp.current_node = caller_node
+        return return_val
+
+    def __eval_args(self, func, arg_closures, caller_frame):
+        interp = self.interpreter
+        evaluated_args = [arg(caller_frame) for arg in arg_closures]
+
+        # check if the type of the arguments passed in matches the type of the arguments in the function definition
+        if not interp.type_check:
+            for val, arg_def in zip(evaluated_args, func.args):
+                if val.type() != arg_def.get("var_type"):
+                    interp.error(
+                        ErrorType.TYPE_ERROR,
+                        f"Argument type mismatch in function {func.name} and argument {arg_def.get('name')}",
+                    )
+        return evaluated_args
+
+    def __bind_args(self, func, evaluated_args):
+        """New frame of func holding its arguments"""
+        frame = [None] * func.layout.frame_size
+        for slot, arg_def, value in zip(
+            func.layout.arg_slots, func.args, evaluated_args
+        ):
+            if slot is None:
+                self.interpreter.error(
+                    ErrorType.NAME_ERROR,
+                    f"Duplicate definition for function argument name {arg_def.get('name')}",
+                )
+            frame[slot] = value
+        return frame
+
+    def __check_return(self, func, has_return, return_val):
+        """Check the value returned by a function, returns the value the call
+        evaluates to"""
+        interp = self.interpreter
+        return_type = func.return_type
+
+        # if the function return_type is void, it must not have return value
+        if return_type == InterpreterBase.VOID_DEF and return_val is not None:
+            interp.error(
+                ErrorType.TYPE_ERROR,
+                f"Function {func.name} must return a value of type {return_type}",
+            )
+
+        # if the function return_type is not void, and there is no return statement or no specific return value
+        if return_type != InterpreterBase.VOID_DEF and (
+            not has_return or return_val is None
+        ):
+            return_val = interp._create_default_value_obj(return_type)
+
+        # if the function return_type is struct, and the return value is nil
+        if interp._is_struct(return_type) and (
+            not return_val or return_val.value() == None
+        ):
+            return_val = interp._create_default_value_obj(return_type)
+
+        # if the function return_type is not void, and return type isn't match
+        if (
+            not interp.type_check
+            and return_type != InterpreterBase.VOID_DEF
+            and return_val.type() != return_type
+        ):
+            interp.error(
+                ErrorType.TYPE_ERROR,
+                f"Function {func.name} must return a value of type {return_type}",
+            )
+        return return_val
+
+    # Statements compile to closures taking the frame. A closure returns None when
+    # control falls through, a 1-tuple holding the return value when a return
+    # statement was executed, or a TailCall when the return statement calls a function.
+
+    def __compile_block(self, statements, return_type):
+        compiled = [
+            (statement, self.__compile_statement(statement, return_type))
+            for statement in statements
+        ]
+        compiled = [pair for pair in compiled if pair[1] is not None]
+        interp = self.interpreter
+
+        def run_block(frame):
+            for node, statement in compiled:
+                # errors are reported at the line of the running statement
+                interp.current_node = node
+                result = statement(frame)
+                if result is not None:
+                    return result
+            return None
+
+        return run_block
+
+    def __compile_statement(self, statement, return_type):
+        elem_type = statement.elem_type
+        if elem_type == InterpreterBase.FCALL_NODE:
+            compiled = self.__compile_call_statement(statement)
+        elif elem_type == "=":
+            compiled = self.__compile_assign(statement)
+        elif elem_type == InterpreterBase.VAR_DEF_NODE:
+            compiled = self.__compile_var_def(statement)
+        elif elem_type == InterpreterBase.IF_NODE:
+            compiled = self.__compile_if(statement, return_type)
+        elif elem_type == InterpreterBase.RETURN_NODE:
+            compiled = self.__compile_return(statement, return_type)
+        elif elem_type == InterpreterBase.FOR_NODE:
+            compiled = self.__compile_for(statement, return_type)
+        elif elem_type == InterpreterBase.TRY_NODE:
+            compiled = self.__compile_try(statement, return_type)
+        elif elem_type == InterpreterBase.RAISE_NODE:
+            compiled = self.__compile_raise(statement)
+        else:
+            # the tree walker ignores any other statement without evaluating it
+            compiled = None
+
+        if self.interpreter.profiler is not None and compiled is not None:
+            compiled = self.__profiled(statement, compiled)
+        if self.interpreter.trace_output:
+            return self.__traced(statement, compiled)
+        return compiled
+
+    def __traced(self, statement, compiled):
+        interp = self.interpreter
+
+        def run_traced(frame):
+            interp.trace(statement)
+            if compiled is not None:
+                return compiled(frame)
+
+        return run_traced
+
+    def __profiled(self, node, compiled):
+        profiler = self.interpreter.profiler
+
+        def run_profiled(frame):
+            profiler.enter_node(node)
+            try:
+                return compiled(frame)
+            finally:
+                profiler.exit_node()
+
+        return run_profiled
+
+    def __compile_call_statement(self, call_ast):
+        call = self.__compile_call(call_ast)
+
+        def run_call(frame):
+            call(frame)
+
+        return run_call
+
+    def __compile_return(self, return_ast, return_type):
+        expression_ast = return_ast.get("expression")
+        if (
+            expression_ast is not None
+            and expression_ast.elem_type == InterpreterBase.FCALL_NODE
+            and expression_ast.get("name") not in self.interpreter.BUILTIN_FUNCTIONS
+            and (expression_ast.get("name"), len(expression_ast.get("args")))
+            in self.functions
+            and not self.try_depth
+        ):
+            return self.__compile_tail_call(expression_ast, return_type)
+        expression = self.__compile_expr(expression_ast, return_type)
+
+        def run_return(frame):
+            return (expression(frame),)
+
+        return run_return
+
+    def __compile_tail_call(self, call_ast, return_type):
+        args = call_ast.get("args")
+        func = self.functions[(call_ast.get("name"), len(args))]
+        arg_closures = [
+            self.__compile_expr(arg, arg_def.get("var_type"))
+            for arg, arg_def in zip(args, func.args)
+        ]
+        eval_args = self.__eval_args
+        coerce_to = (
+            None
+            if self.interpreter.static_types.get(call_ast) == return_type
+            else return_type
+        )
+
+        def run_tail_call(frame):
+            return TailCall(func, eval_args(func, arg_closures, frame), coerce_to)
+
+        return run_tail_call
+
+    def __compile_if(self, if_ast, return_type):
+        interp = self.interpreter
+        condition = self.__compile_expr(if_ast.get("condition"), Type.BOOL)
+        statements = self.__compile_block(if_ast.get("statements"), return_type)
+        else_statements = self.__compile_block(
+            if_ast.get("else_statements") or [], return_type
+        )
+
+        def run_if(frame):
+            condition_val = condition(frame)
+            if condition_val.type() != Type.BOOL:
+                interp.error(
+                    ErrorType.TYPE_ERROR, "If condition must be a boolean expression"
+                )
+            if condition_val.value():
+                return statements(frame)
+            return else_statements(frame)
+
+        return run_if
+
+    def __compile_for(self, for_ast, return_type):
+        interp = self.interpreter
+        init = self.__compile_assign(for_ast.get("init"))
+        condition = self.__compile_expr(for_ast.get("condition"), Type.BOOL)
+        statements = self.__compile_block(for_ast.get("statements"), return_type)
+        update = self.__compile_block([for_ast.get("update")], return_type)
+
+        def run_for(frame):
+            init(frame)
+
+            # the tree walker evaluates the condition one extra time for its type check
+            if condition(frame).type() != Type.BOOL:
+                interp.error(
+                    ErrorType.TYPE_ERROR, "for condition must be a boolean expression"
+                )
+
+            while condition(frame).value():
+                result = statements(frame)
+                if result is not None:
+                    return result
+                update(frame)
+            return None
+
+        return run_for
+
+    def __compile_try(self, try_ast, return_type):
+        interp = self.interpreter
+        profiler = interp.profiler
+        self.try_depth += 1
+        statements = self.__compile_block(try_ast.get("statements"), return_type)
+        self.try_depth -= 1
+        catchers = {
+            exception_type: self.__compile_block(
+                catch_ast.get("statements"), return_type
+            )
+            for exception_type, catch_ast in catch_table(try_ast).items()
+        }
+
+        def run_try(frame):
+            # what the statements that raised leave behind is unwound by the catch
+            call_depth = interp.call_depth
+            profiled_calls = (
+                len(profiler.function_stack) if profiler is not None else 0
+            )
+            try:
+                return statements(frame)
+            except BrewinException as exception:
+                catch = catchers.get(exception.exception_type)
+                if catch is None:
+                    raise
+
+            interp.call_depth = call_depth
+            if profiler is not None:
+                while len(profiler.function_stack) > profiled_calls:
+                    profiler.exit_function()
+            return catch(frame)
+
+        return run_try
+
+    def __compile_raise(self, raise_ast):
+        interp = self.interpreter
+        exception_type = self.__compile_expr(raise_ast.get("exception_type"), None)
+        line = interp.line_of(raise_ast)
+
+        def run_raise(frame):
+            value_obj = exception_type(frame)
+            if value_obj == None or value_obj.type() != Type.STRING:
+                interp.error(ErrorType.TYPE_ERROR, "Raise expression must be a string")
+            raise BrewinException(value_obj.value(), line)
+
+        return run_raise
+
+    def __compile_var_def(self, var_ast):
+        interp = self.interpreter
+        var_name = var_ast.get("name")
+        var_type = var_ast.get("var_type")
+        binding = self.layout.binding(var_ast)
+        create_default_value_obj = interp._create_default_value_obj
+
+        if binding is None:
+
+            def run_duplicate_var_def(frame):
+                create_default_value_obj(var_type)
+                interp.error(
+                    ErrorType.NAME_ERROR,
+                    f"Duplicate definition for variable {var_name}",
+                )
+
+            return run_duplicate_var_def
+
+        _, slot = binding
+        if slot is None:
+            # a void variable holds no value and is never looked up
+            return lambda frame: create_default_value_obj(var_type)
+
+        def run_var_def(frame):
+            frame[slot] = create_default_value_obj(var_type)
+
+        return run_var_def
+
+    def __compile_assign(self, assign_ast):
+        interp = self.interpreter
+        var_name = assign_ast.get("name")
+        expression = self.__compile_expr(assign_ast.get("expression"), None)
+        binding = self.layout.binding(assign_ast)
+        coerce_value = interp.coerce_value
+        find_field = interp._find_struct_field
+
+        def check_value(value_obj):
+            if value_obj == None:
+                interp.error(
+                    ErrorType.TYPE_ERROR,
+                    f"Cannot assign void value to variable {var_name}",
+                )
+
+        if binding is None:
+
+            def run_undefined_assign(frame):
+                check_value(expression(frame))
+                interp.error(
+                    ErrorType.NAME_ERROR, f"Undefined variable {var_name} in assignment"
+                )
+
+            return run_undefined_assign
+
+        _, slot = binding
+        if "." in var_name:
+            field_name = var_name.split(".", 1)[1]
+
+            def run_field_assign(frame):
+                value_obj = expression(frame)
+                check_value(value_obj)
+                owner, field_slot, value_ast = find_field(frame[slot], field_name)
+                value_obj = coerce_value(value_obj, value_ast.type())
+                if value_ast.type() != value_obj.type():
+                    interp.error(
+                        ErrorType.TYPE_ERROR,
+                        f"Cannot assign value of type for struct attribute {value_obj.type()} to {value_ast.type()}",
+                    )
+                owner.values[field_slot] = value_obj
+
+            return run_field_assign
+
+        if assign_ast in interp.checked_assigns:
+            # the value already has the type of the variable
+
+            def run_checked_assign(frame):
+                frame[slot] = expression(frame)
+
+            return run_checked_assign
+
+        def run_assign(frame):
+            value_obj = expression(frame)
+            check_value(value_obj)
+            # coerce_value either returns a value of the variable's type or fails, which
+            # covers the type checks done by EnvironmentManager.set
+            frame[slot] = coerce_value(value_obj, frame[slot].type())
+
+        return run_assign
+
+    # Expressions compile to closures taking the frame and returning the Value, already
+    # coerced to the target type the same way Interpreter.__eval_expr does.
+
+    def __compile_expr(self, expr_ast, target_type):
+        compiled = self.__compile_unprofiled_expr(expr_ast, target_type)
+        if self.interpreter.profiler is not None and expr_ast is not None:
+            return self.__profiled(expr_ast, compiled)
+        return compiled
+
+    def __compile_unprofiled_expr(self, expr_ast, target_type):
+        interp = self.interpreter
+        if expr_ast is None:
+            return lambda frame: interp._create_default_value_obj(target_type)
+
+        elem_type = expr_ast.elem_type
+        # string and bool constants are never coerced by the tree walker
+        if elem_type == InterpreterBase.STRING_NODE:
+            value = string_value(expr_ast.get("val"))
+            return lambda frame: value
+        if elem_type == InterpreterBase.BOOL_NODE:
+            value = bool_value(expr_ast.get("val"))
+            return lambda frame: value
+
+        if elem_type == InterpreterBase.NIL_NODE:
+            raw = lambda frame: NIL
+        elif elem_type == InterpreterBase.INT_NODE:
+            value = int_value(expr_ast.get("val"))
+            raw = lambda frame: value
+        elif elem_type == InterpreterBase.VAR_NODE:
+            raw = self.__compile_var(expr_ast)
+        elif elem_type == InterpreterBase.FCALL_NODE:
+            raw = self.__compile_call(expr_ast)
+        elif elem_type in interp.UNARY_OPS:
+            raw = self.__compile_unary_op(expr_ast)
+        elif elem_type in interp.BIN_OPS:
+            raw = self.__compile_binary_op(expr_ast)
+        elif elem_type == InterpreterBase.NEW_NODE:
+            raw = self.__compile_new(expr_ast)
+        else:
+            raise ValueError(f"Unknown expression node {elem_type}")
+
+        if target_type is None or interp.static_types.get(expr_ast) == target_type:
+            return raw
+        coerce_value = interp.coerce_value
+        return lambda frame: coerce_value(raw(frame), target_type)
+
+    def __compile_var(self, var_ast):
+        interp = self.interpreter
+        var_name = var_ast.get("name")
+        binding = self.layout.binding(var_ast)
+
+        if binding is None:
+
+            def run_undefined_var(frame):
+                interp.error(ErrorType.NAME_ERROR, f"Variable {var_name} not found")
+
+            return run_undefined_var
+
+        _, slot = binding
+        if "." in var_name:
+            field_name = var_name.split(".", 1)[1]
+            get_field = interp._get_struct_field_obj
+            return lambda frame: get_field(frame[slot], field_name)
+        return lambda frame: frame[slot]
+
+    def __compile_call(self, call_ast):
+        func_name = call_ast.get("name")
+        args = call_ast.get("args")
+
+        if func_name == "print":
+            return self.__compile_print(args)
+        if func_name in ("inputi", "inputs"):
+            return self.__compile_input(func_name, args)
+
+        func = self.functions.get((func_name, len(args)))
+        if func is None:
+            arg_closures = [None] * len(args)
+        else:
+            arg_closures = [
+                self.__compile_expr(arg, arg_def.get("var_type"))
+                for arg, arg_def in zip(args, func.args)
+            ]
+        call = self.call
+
+        return lambda frame: call(func_name, arg_closures, frame)
+
+    def __compile_print(self, args):
+        interp = self.interpreter
+        arg_closures = [self.__compile_expr(arg, None) for arg in args]
+
+        def run_print(frame):
+            output = ""
+            for arg in arg_closures:
+                result = arg(frame)
+                if result == None:
+                    interp.error(
+                        ErrorType.TYPE_ERROR,
+                        "Cannot print void value in print statement",
+                    )
+                output = output + get_printable(result)
+            interp.write_output(output)
+
+        return run_print
+
+    def __compile_input(self, func_name, args):
+        interp = self.interpreter
+        prompt = self.__compile_expr(args[0], None) if len(args) == 1 else None
+        n_args = len(args)
+
+        def run_input(frame):
+            if prompt is not None:
+                interp.write_output(get_printable(prompt(frame)))
+            elif n_args > 1:
+                interp.error(
+                    ErrorType.NAME_ERROR,
+                    "No inputi() function that takes > 1 parameter",
+                )
+            inp = interp.get_input()
+            if func_name == "inputi":
+                return int_value(int(inp))
+            return Value(Type.STRING, inp)
+
+        return run_input
+
+    def __compile_new(self, new_ast):
+        new_struct = self.interpreter._new_struct
+        return lambda frame: new_struct(new_ast)
+
+    def __compile_unary_op(self, arith_ast):
+        interp = self.interpreter
+        op = arith_ast.elem_type
+        operand = self.__compile_expr(arith_ast.get("op1"), None)
+        checked_op = interp.checked_ops.get(arith_ast)
+        if checked_op is not None:
+            return lambda frame: checked_op(operand(frame))
+        op_to_lambda = interp.op_to_lambda
+        # resolve the operator lambda for every operand type up front
+        lambdas = {t: ops[op] for t, ops in op_to_lambda.items() if op in ops}
+
+        def run_unary_op(frame):
+            value_obj = operand(frame)
+            if value_obj == None:
+                interp.error(
+                    ErrorType.TYPE_ERROR,
+                    f"Cannot perform unary operation on void value",
+                )
+            f = lambdas.get(value_obj.type())
+            if f is None:
+                # unknown types fail with the same exception as the tree walker
+                if op not in op_to_lambda[value_obj.type()]:
+                    interp.error(
+                        ErrorType.TYPE_ERROR,
+                        f"Incompatible operator {op} for type {value_obj.type()}",
+                    )
+            return f(value_obj)
+
+        return run_unary_op
+
+    def __compile_binary_op(self, arith_ast):
+        interp = self.interpreter
+        op = arith_ast.elem_type
+        left = self.__compile_expr(arith_ast.get("op1"), None)
+        right = self.__compile_expr(arith_ast.get("op2"), None)
+        checked_op = interp.checked_ops.get(arith_ast)
+        if op in interp.LOGICAL_OPS and (
+            interp.short_circuit or arith_ast in interp.skippable_ops
+        ):
+            return self.__compile_short_circuit(arith_ast, left, right, checked_op)
+        if checked_op is not None:
+            return lambda frame: checked_op(left(frame), right(frame))
+        op_to_lambda = interp.op_to_lambda
+        # resolve the operator lambda for every operand type up front
+        lambdas = {t: ops[op] for t, ops in op_to_lambda.items() if op in ops}
+        is_struct = interp._is_struct
+        struct_eval_op = interp._struct_eval_op
+        coerce_value = interp.coerce_value
+
+        def run_binary_op(frame):
+            left_value_obj = left(frame)
+            right_value_obj = right(frame)
+
+            if left_value_obj == None or right_value_obj == None:
+                interp.error(ErrorType.TYPE_ERROR, f"Cannot compare void value")
+
+            left_type = left_value_obj.type()
+            right_type = right_value_obj.type()
+            if is_struct(left_type) or is_struct(right_type):
+                return struct_eval_op(arith_ast, left_value_obj, right_value_obj)
+
+            if left_type == Type.BOOL and right_type == Type.INT:
+                right_value_obj = coerce_value(right_value_obj, Type.BOOL)
+                right_type = Type.BOOL
+            if right_type == Type.BOOL and left_type == Type.INT:
+                left_value_obj = coerce_value(left_value_obj, Type.BOOL)
+                left_type = Type.BOOL
+
+            if left_type != right_type:
+                interp.error(
+                    ErrorType.TYPE_ERROR,
+                    f"Incompatible types for {op} operation",
+                )
+            f = lambdas.get(left_type)
+            if f is None:
+                interp.error(
+                    ErrorType.TYPE_ERROR,
+                    f"Incompatible operator {op} for type {left_type}",
+                )
+            return f(left_value_obj, right_value_obj)
+
+        return run_binary_op
+
+    def __compile_short_circuit(self, arith_ast, left, right, checked_op):
+        """&& or || skipping its right operand when its left operand decides it"""
+        interp = self.interpreter
+        op = arith_ast.elem_type
+        short_circuit_value = interp.short_circuit_value
+        apply_binary_op = interp._apply_binary_op
+
+        def run_short_circuit(frame):
+            left_value_obj = left(frame)
+            value_obj = short_circuit_value(op, left_value_obj)
+            if value_obj is not None:
+                return value_obj
+            if checked_op is not None:
+                return checked_op(left_value_obj, right(frame))
+            return apply_binary_op(arith_ast, left_value_obj, right(frame))
+
+        return run_short_circuit
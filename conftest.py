@@ -0,0 +1,3 @@
+# pytest runs the tests in tests/. The other test_ files are scripts for running
+# programs by hand, and the autograder has its own runner, tester.py.
+collect_ignore = ["test_.py", "fall-24-autograder", "solution-p1", "submission"]
@@ -1,19 +1,42 @@
+# AST nodes. Every node type is a class with __slots__ holding its children as direct
+# attributes; `_fields` lists the children in the order the parser provides them.
+# Element(elem_type, **kwargs) still works and builds the node class for elem_type, and
+# get(key) returns a child or None, so code written against the original dict-based
+# Element keeps working.
+from intbase import InterpreterBase
+
+
 class Element:
+    __slots__ = ("elem_type",)
+    _fields = ()
+
+    def __new__(cls, elem_type, **kwargs):
+        if cls is Element:
+            if elem_type not in NODE_CLASSES:
+                raise ValueError(f"Unknown AST node type {elem_type}")
+            cls = NODE_CLASSES[elem_type]
+        return object.__new__(cls)
+
     def __init__(self, elem_type, **kwargs):
         self.elem_type = elem_type
-        self.dict = {}
-        for key, value in kwargs.items():
-            self.dict[key] = value
+        for key in self._fields:
+            setattr(self, key, kwargs.pop(key, None))
+        if kwargs:
+            raise TypeError(
+                f"Unexpected fields {', '.join(kwargs)} for {type(self).__name__}"
+            )
 
     def get(self, key):
-        if key not in self.dict:
-            return None
-        return self.dict[key]
+        return getattr(self, key, None)
+
+    @property
+    def dict(self):
+        return {key: getattr(self, key) for key in self._fields}
 
     def __str__(self):
         s = f"{self.elem_type}: "
-        for key, value in self.dict.items():
-            s += key + ": " + self.__val(value) + ", "
+        for key in self._fields:
+            s += key + ": " + self.__val(getattr(self, key)) + ", "
         return s[0:-2]
 
     def __val(self, v):
@@ -27,3 +50,132 @@ class Element:
                 return "[" + s[0:-2] + "]"
             return "[" + s + "]"
         return str(v)
+
+
+class Program(Element):
+    _fields = ("structs", "functions")
+    # positions: side table mapping each node of the program to its (line, column) in
+    # the source, filled in by the parser
+    __slots__ = _fields + ("positions",)
+
+    def __init__(self, elem_type, **kwargs):
+        super().__init__(elem_type, **kwargs)
+        self.positions = {}
+
+
+class StructDef(Element):
+    __slots__ = _fields = ("name", "fields")
+
+
+class FieldDef(Element):
+    __slots__ = _fields = ("name", "var_type")
+
+
+class FuncDef(Element):
+    __slots__ = _fields = ("name", "args", "return_type", "statements")
+
+
+class Arg(Element):
+    __slots__ = _fields = ("name", "var_type")
+
+
+class Assign(Element):
+    __slots__ = _fields = ("name", "expression")
+
+
+class VarDef(Element):
+    __slots__ = _fields = ("name", "var_type")
+
+
+class If(Element):
+    __slots__ = _fields = ("condition", "statements", "else_statements")
+
+
+class For(Element):
+    __slots__ = _fields = ("init", "condition", "update", "statements")
+
+
+class Try(Element):
+    __slots__ = _fields = ("statements", "catchers")
+
+
+class Catch(Element):
+    __slots__ = _fields = ("exception_type", "statements")
+
+
+class Raise(Element):
+    __slots__ = _fields = ("exception_type",)
+
+
+class Return(Element):
+    __slots__ = _fields = ("expression",)
+
+
+class UnaryOp(Element):
+    __slots__ = _fields = ("op1",)
+
+
+class BinOp(Element):
+    __slots__ = _fields = ("op1", "op2")
+
+
+class New(Element):
+    __slots__ = _fields = ("var_type",)
+
+
+class Constant(Element):
+    """int, string and bool constants"""
+
+    __slots__ = _fields = ("val",)
+
+
+class Nil(Element):
+    __slots__ = _fields = ()
+
+
+class VarRef(Element):
+    __slots__ = _fields = ("name",)
+
+
+class FCall(Element):
+    __slots__ = _fields = ("name", "args")
+
+
+def walk(node):
+    """Yield node and all the nodes below it, parents before their children"""
+    if isinstance(node, Element):
+        yield node
+        for key in node._fields:
+            yield from walk(getattr(node, key))
+    elif isinstance(node, list):
+        for item in node:
+            yield from walk(item)
+
+
+# elem_type -> node class
+NODE_CLASSES = {
+    InterpreterBase.PROGRAM_NODE: Program,
+    InterpreterBase.STRUCT_NODE: StructDef,
+    InterpreterBase.FIELD_DEF_NODE: FieldDef,
+    InterpreterBase.FUNC_NODE: FuncDef,
+    InterpreterBase.ARG_NODE: Arg,
+    "=": Assign,
+    InterpreterBase.VAR_DEF_NODE: VarDef,
+    InterpreterBase.IF_NODE: If,
+    InterpreterBase.FOR_NODE: For,
+    InterpreterBase.TRY_NODE: Try,
+    InterpreterBase.CATCH_NODE: Catch,
+    InterpreterBase.RAISE_NODE: Raise,
+    InterpreterBase.RETURN_NODE: Return,
+    InterpreterBase.NOT_NODE: UnaryOp,
+    InterpreterBase.NEG_NODE: UnaryOp,
+    InterpreterBase.NEW_NODE: New,
+    InterpreterBase.INT_NODE: Constant,
+    InterpreterBase.STRING_NODE: Constant,
+    InterpreterBase.BOOL_NODE: Constant,
+    InterpreterBase.NIL_NODE: Nil,
+    InterpreterBase.VAR_NODE: VarRef,
+    InterpreterBase.FCALL_NODE: FCall,
+}
+for op in ("+", "-", "*", "/", "==", "!=", "<", "<=", ">", ">=", "&&", "||"):
+    NODE_CLASSES[op] = BinOp
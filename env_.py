@@ -5,6 +5,11 @@
 from type_value_ import Type, Value, is_generic_type
 
 
+class ScopeType:
+    FUNCTION = "function"
+    BLOCK = "block"
+
+
 class EnvironmentManager:
     def __init__(self):
         self.environment = {}
@@ -39,7 +44,14 @@ class EnvironmentManager:
                 f"Cannot assign non nil value to {self.environment[symbol].type()}"
             )
 
-        self.environment[symbol].v = value.v
+        # a struct variable keeps its type when it's set to nil
+        if value.type() == Type.NIL and self.environment[symbol].type() != Type.NIL:
+            value = Value(self.environment[symbol].type(), None)
+        self.environment[symbol] = value
+
+    # Removes every variable, so that the environment can be reused
+    def clear(self):
+        self.environment.clear()
 
     def create(self, symbol, start_val):
         if symbol not in self.environment:
@@ -0,0 +1,29 @@
+# Brewin exceptions. A raise statement throws a string, which the innermost running
+# try statement with a catch block for that string catches. The catch block runs in
+# place of the rest of the try block, then execution continues after the try
+# statement. An exception no try statement catches is a FAULT_ERROR, reported at the
+# line of its raise statement.
+#
+# Running a try statement costs nothing more than running its block: the tree walker
+# and the closure engine rely on Python's zero-cost try, and the VM on a table of the
+# try blocks of each function, only searched when an exception is raised. A return
+# statement calling a function in a try block doesn't make a tail call, since the try
+# block must still catch what the callee raises.
+
+
+class BrewinException(Exception):
+    """A Brewin exception being raised"""
+
+    def __init__(self, exception_type, line):
+        super().__init__(exception_type)
+        self.exception_type = exception_type  # the string raised
+        self.line = line  # line of the raise statement
+
+
+def catch_table(try_ast):
+    """Map of the exception types a try statement catches to their catch node, the first
+    catch block for a type catching it"""
+    table = {}
+    for catch_ast in try_ast.catchers:
+        table.setdefault(catch_ast.exception_type, catch_ast)
+    return table
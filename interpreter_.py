@@ -1,24 +1,36 @@
 # Add to spec:
 # - printing out a nil value is undefined
 
-from env_ import EnvironmentManager
+import sys
+
+from env_ import EnvironmentManager, ScopeType
 from type_value_ import (
     Type,
     Value,
+    TRUE,
+    FALSE,
+    NIL,
+    ZERO,
+    EMPTY_STRING,
+    bool_value,
+    int_value,
+    string_value,
     get_printable,
     is_generic_type,
     is_non_nil_generic_type,
 )
 from intbase import InterpreterBase, ErrorType
-from brewparse import parse_program
+from brewparse import parse_program, FRONTENDS, PLY_FRONTEND
 from element import Element
-from copy import copy
-from struct_ import Struct
-
-
-class ScopeType:
-    FUNCTION = "function"
-    BLOCK = "block"
+from struct_ import Struct, StructLayout
+from compiler_ import ClosureCompiler, TailCall
+from bytecode_ import BytecodeCompiler
+from vm_ import VM
+from typecheck_ import TypeChecker
+from optimizer_ import Optimizer
+from memo_ import PurityAnalyzer, memo_key
+from lazy_ import Thunk, free_variables
+from exception_ import BrewinException, catch_table
 
 
 # Main interpreter class
@@ -27,244 +39,680 @@ class Interpreter(InterpreterBase):
     UNARY_OPS = {"!", "neg"}
     BIN_OPS_EXCEPT = {"==", "!="}
     BIN_OPS = {"+", "-", "*", "/", ">=", "<=", ">", "<", "==", "!=", "||", "&&"}
+    LOGICAL_OPS = {"&&", "||"}
+    UNCOERCED_NODES = {InterpreterBase.STRING_NODE, InterpreterBase.BOOL_NODE}
+    LITERAL_TYPES = {
+        InterpreterBase.INT_NODE: Type.INT,
+        InterpreterBase.STRING_NODE: Type.STRING,
+        InterpreterBase.BOOL_NODE: Type.BOOL,
+    }
+    # execution engines
+    TREE_ENGINE = "tree"  # walk the AST directly
+    CLOSURE_ENGINE = "closure"  # compile the AST into closures, see compiler_.py
+    VM_ENGINE = "vm"  # compile the AST into bytecode for a stack VM, see vm_.py
+    ENGINES = {TREE_ENGINE, CLOSURE_ENGINE, VM_ENGINE}
+    # calls
+    BUILTIN_FUNCTIONS = {"print", "inputi", "inputs"}
+    DEFAULT_MAX_CALL_DEPTH = 100_000  # Brewin frames, past it a call is a FAULT_ERROR
+    # the tree walker and the closure engine recurse in Python, with a few Python frames
+    # per Brewin call, more when the call is nested in an expression
+    PYTHON_FRAMES_PER_CALL = 16
+    # the attributes of the interpreter are read on every node. Slots keep reading them
+    # fast however many there are, which a __dict__ doesn't past about 30 attributes
+    __slots__ = (
+        "trace_output",
+        "engine",
+        "frontend",
+        "ast_cache",
+        "output_sink",
+        "profiler",
+        "type_check",
+        "optimize",
+        "static_types",
+        "checked_ops",
+        "checked_assigns",
+        "op_to_lambda",
+        "statement_handlers",
+        "expr_handlers",
+        "func_name_to_ast",
+        "scoped_blocks",
+        "catch_tables",
+        "guarded_returns",
+        "max_call_depth",
+        "call_depth",
+        "memo",
+        "pure_functions",
+        "short_circuit",
+        "skippable_ops",
+        "lazy",
+        "free_variables",
+        "variable_scope_stack",
+        "env",
+        "structure_table",
+        "field_paths",
+        "outputs",
+        "write_output",
+        "positions",
+        "current_node",
+        "error_description",
+    )
 
     # methods
-    def __init__(self, console_output=True, inp=None, trace_output=False):
+    def __init__(
+        self,
+        console_output=True,
+        inp=None,
+        trace_output=False,
+        engine=TREE_ENGINE,
+        ast_cache=None,
+        output_sink=None,
+        profiler=None,
+        type_check=False,
+        optimize=False,
+        max_call_depth=DEFAULT_MAX_CALL_DEPTH,
+        memo=None,
+        short_circuit=False,
+        lazy=False,
+        frontend=PLY_FRONTEND,
+    ):
         super().__init__(console_output, inp)
+        if engine not in Interpreter.ENGINES:
+            raise ValueError(f"Unknown execution engine {engine}")
+        if frontend not in FRONTENDS:
+            raise ValueError(f"Unknown parser frontend {frontend}")
+        if lazy and engine != Interpreter.TREE_ENGINE:
+            raise ValueError("Lazy evaluation runs on the tree engine only")
+        if lazy and memo is not None:
+            # a memo key holds the argument values, which lazy calls don't compute
+            raise ValueError("Lazy evaluation can't be combined with memoization")
+        if max_call_depth < 1:
+            raise ValueError("max_call_depth must be at least 1")
         self.trace_output = trace_output
+        self.engine = engine
+        self.frontend = frontend  # parser building the AST, see brewparse.py
+        self.ast_cache = ast_cache  # optional ASTCache shared between runs
+        # optional OutputSink receiving the output as it's printed, see output_.py
+        self.output_sink = output_sink
+        # optional Profiler timing every node and function, see profiler_.py
+        self.profiler = profiler
+        if profiler is not None:
+            self.__run_statement = self.__profiled_node(self.__run_statement)
+            self.__eval_expr = self.__profiled_node(self.__eval_expr)
+        # check the types of a program before running it, see typecheck_.py. A program
+        # that passes the check runs without the dynamic checks it made redundant.
+        self.type_check = type_check
+        if type_check:
+            self.__eval_op = self.__eval_checked_op
+            self.__eval_unary_op = self.__eval_checked_unary_op
+        # fold constants and remove dead code before running, see optimizer_.py
+        self.optimize = optimize
+        # deepest Brewin recursion allowed, a tail call reuses the frame of its caller
+        self.max_call_depth = max_call_depth
+        self.call_depth = 0  # Brewin functions running in the tree walker
+        # optional MemoCache caching the results of the pure functions, see memo_.py
+        self.memo = memo
+        self.pure_functions = set()  # definitions of the functions to memoize
+        # && and || skip their right operand when their left operand decides them.
+        # Otherwise, in the strict mode of Brewin++ v3, they evaluate both operands,
+        # except for the right operands that type checking proves pure and infallible.
+        self.short_circuit = short_circuit
+        self.skippable_ops = set()  # && and || nodes whose right operand can be skipped
+        # delay assignments to variables and arguments until their value is read, see
+        # lazy_.py
+        self.lazy = lazy
+        self.free_variables = {}  # delayed expression node -> names of its variables
+        if lazy:
+            self.__assign = self.__assign_lazily
+            self.__eval_args = self.__delay_args
+        self.static_types = {}  # expression node -> static type
+        self.checked_ops = {}  # operator node -> operator lambda
+        self.checked_assigns = set()  # assignments that need no coercion
         self.__setup_ops()
+        self.__setup_handlers()
         self.func_name_to_ast = {}  # dict of function names to its node
+        # ids of the statement lists declaring variables, the only blocks that need a
+        # block scope of their own
+        self.scoped_blocks = set()
+        self.catch_tables = {}  # try node -> {exception type: catch node}
+        # return statements in try blocks, whose calls aren't tail calls
+        self.guarded_returns = set()
         self.variable_scope_stack = []  # stack of function call
         self.env: EnvironmentManager = (
             None  # EnvironmentManager of the current function scope
         )
-        self.structure_table = dict()  # dictionary of structure names to their struct
+        self.structure_table = dict()  # dictionary of structure names to their layout
+        self.field_paths = {}  # (struct type, dotted field path) -> slot indexes
         self.outputs = []
+        self.write_output = self.outputs.append
+        self.positions = {}  # AST node -> (line, column), see brewparse.py
+        # statement being run by the tree walker or the closure engine, errors are
+        # reported at its line (the VM finds the line from its bytecode instead)
+        self.current_node = None
+        self.error_description = None  # description of the last error reported
 
     # run a program that's provided in a string
     # usese the provided Parser found in brewparse.py to parse the program
     # into an abstract syntax tree (ast)
     def run(self, program):
-        ast = parse_program(program)
+        if self.ast_cache is not None:
+            ast = self.ast_cache.parse(program, self.frontend)
+        else:
+            ast = parse_program(program, self.frontend)
+        if self.optimize:
+            ast = Optimizer(self).optimize(ast)
         self.outputs = []
-        self.__set_up_structure_table(ast.get("structs"))
+        # without a sink, the output is only forwarded once main has returned
+        if self.output_sink is None:
+            self.write_output = self.outputs.append
+        else:
+            self.write_output = self.output_sink.write
+        self.positions = ast.positions
+        self.current_node = None
+        self.__set_up_structure_table(ast.structs)
         self.__set_up_function_table(ast)
-        self.__run_function("main")
+        self.scoped_blocks = set()
+        self.catch_tables = {}
+        self.guarded_returns = set()
+        self.__scan_blocks(ast)
+        if self.memo is not None:
+            self.pure_functions = PurityAnalyzer(self.func_name_to_ast).pure_functions()
+            self.memo.clear()
+        if self.type_check:
+            self.__check_types(ast)
+        if self.profiler is not None:
+            self.profiler.add_positions(ast.positions)
+        self.call_depth = 0
+        self.free_variables = {}
+        recursion_limit = sys.getrecursionlimit()
+        try:
+            if self.engine == Interpreter.VM_ENGINE:
+                code_objects = BytecodeCompiler(self).compile(self.func_name_to_ast)
+                if ("main", 0) not in code_objects:
+                    self.error(ErrorType.NAME_ERROR, "Function main not found")
+                VM(self).run(code_objects[("main", 0)])
+            else:
+                self.__run_recursive_engine(recursion_limit)
+        except BrewinException as exception:
+            self.error(
+                ErrorType.FAULT_ERROR,
+                f"Uncaught exception {exception.exception_type}",
+                exception.line,
+            )
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+            if self.output_sink is not None:
+                self.output_sink.flush()
         for output in self.outputs:
             super().output(output)
 
+    def __run_recursive_engine(self, recursion_limit):
+        """Run main on the tree walker or the closure engine, which recurse in Python"""
+        # the profiler's wrappers recurse through C, whose stack is much smaller
+        if self.profiler is None:
+            sys.setrecursionlimit(
+                max(
+                    recursion_limit,
+                    self.max_call_depth * Interpreter.PYTHON_FRAMES_PER_CALL,
+                )
+            )
+        try:
+            if self.engine == Interpreter.CLOSURE_ENGINE:
+                compiler = ClosureCompiler(self)
+                compiler.compile(self.func_name_to_ast)
+                compiler.call("main")
+            else:
+                self.__run_function("main")
+        except RecursionError:
+            # deeply nested expressions can still run out of Python frames
+            self.error(ErrorType.FAULT_ERROR, "Maximum recursion depth exceeded")
+
+    def call_depth_exceeded(self):
+        """Report a call going deeper than max_call_depth"""
+        self.error(
+            ErrorType.FAULT_ERROR,
+            f"Maximum call depth of {self.max_call_depth} exceeded",
+        )
+
+    def error(self, error_type, description=None, line_num=None):
+        """Report a Brewin error, by default at the line of the running statement"""
+        if line_num is None and self.current_node is not None:
+            line_num = self.line_of(self.current_node)
+        self.error_description = description
+        super().error(error_type, description, line_num)
+
+    def line_of(self, node):
+        """Source line of an AST node, None if unknown"""
+        position = self.positions.get(node)
+        return None if position is None else position[0]
+
+    def trace(self, statement):
+        """Print a statement about to run, when tracing"""
+        print(f"line {self.line_of(statement)}: {statement}")
+
+    def __check_types(self, ast):
+        """Reject a program with type errors before it runs, reporting the first one"""
+        checker = TypeChecker(self)
+        errors = checker.check(ast)
+        if errors:
+            error_type, description, node = errors[0]
+            self.error(error_type, description, self.line_of(node))
+        self.static_types = checker.types
+        self.checked_ops = checker.operators
+        self.checked_assigns = checker.assigns
+        # a lazy variable may be bound to a thunk whose forcing prints or fails
+        self.skippable_ops = (
+            set()
+            if self.lazy
+            else {
+                node
+                for node in checker.operators
+                if node.elem_type in Interpreter.LOGICAL_OPS
+                and node.op2 in checker.infallible
+            }
+        )
+
+    def get_input(self):
+        # when reading from the keyboard, show the prompt before waiting for input
+        if self.output_sink is not None and not self.inp:
+            self.output_sink.flush()
+        return super().get_input()
+
     def __set_up_structure_table(self, structs):
-        """Structure table is a dictionary of (structure_name, struct_object)"""
+        """Structure table is a dictionary of (structure_name, StructLayout)"""
+        self.field_paths = {}
         for struct_def in structs:
-            fields = dict()
-            self.structure_table[struct_def.get("name")] = fields
+            layout = StructLayout(struct_def.name)
+            self.structure_table[struct_def.name] = layout
 
-            for field in struct_def.get("fields"):
+            for field in struct_def.fields:
                 # if the field type is not defined, raise an error
                 if (
-                    not is_non_nil_generic_type(field.get("var_type"))
-                    and field.get("var_type") not in self.structure_table
+                    not is_non_nil_generic_type(field.var_type)
+                    and field.var_type not in self.structure_table
                 ):
-                    super().error(
-                        ErrorType.TYPE_ERROR, f"Unknown type {field} for field"
+                    self.error(
+                        ErrorType.TYPE_ERROR,
+                        f"Unknown type {field} for field",
+                        self.line_of(field),
                     )
                 else:
-                    fields[field.get("name")] = field.get("var_type")
+                    layout.add_field(
+                        field.name,
+                        field.var_type,
+                        self._create_default_value_obj(field.var_type),
+                    )
 
     def __run_function(self, func_name, passed_arguments: list[Element] = []):
         """run a function based on name and list of arguments"""
-        func_def: Element = self.__get_func(func_name, passed_arguments)
+        func_def: Element = self._get_func(func_name, passed_arguments)
+        evaluated_args = self.__eval_args(func_def, passed_arguments)
+        key = None
+        if func_def in self.pure_functions:
+            key = memo_key(func_def.name, evaluated_args)
+            return_val = self.memo.get(key)
+            if return_val is not None:
+                return return_val
+
+        if self.call_depth >= self.max_call_depth:
+            self.call_depth_exceeded()
+        self.call_depth += 1
+        caller_node = self.current_node
+        # functions whose scope a tail call replaced, with the type they coerce the
+        # result to and their return statement
+        tail_callers = []
+        while True:
+            self._create_new_function_scope(
+                func_def.name, func_def.args, evaluated_args
+            )
+            if self.profiler is not None:
+                self.profiler.enter_function(func_def.name)
+            result = self.__run_statements(func_def.statements, func_def.return_type)
+            if self.profiler is not None:
+                self.profiler.exit_function()
+            if result.__class__ is not TailCall:
+                break
+            # run the callee in place of the function, which returns what it returns
+            self._destroy_top_scope()
+            tail_callers.append((func_def, result.coerce_to, self.current_node))
+            func_def = result.function
+            evaluated_args = result.args
+
+        has_return = result is not None
+        return_val = self.__check_return(
+            func_def, has_return, result[0] if has_return else None
+        )
+        self._destroy_top_scope()
+        # finish the returns of the tail calls, innermost first
+        for func_def, coerce_to, return_ast in reversed(tail_callers):
+            self.current_node = return_ast
+            return_val = self.__check_return(
+                func_def, True, self.coerce_value(return_val, coerce_to)
+            )
+        if key is not None:
+            self.memo.put(key, return_val)
+        self.call_depth -= 1
+        self.current_node = caller_node
+        return return_val
+
+    def __eval_args(self, func_def, passed_arguments):
+        """Evaluate the arguments of a call to func_def"""
         evaluated_args = [
-            copy(self.__eval_expr(arg, arg_def.get("var_type")))
-            for arg, arg_def in zip(passed_arguments, func_def.get("args"))
+            self.__eval_expr(arg, arg_def.var_type)
+            for arg, arg_def in zip(passed_arguments, func_def.args)
         ]
 
         # check if the type of the arguments passed in matches the type of the arguments in the function definition
-        for val, arg_type in zip(evaluated_args, func_def.get("args")):
-            if val.type() != arg_type.get("var_type"):
-                super().error(
-                    ErrorType.TYPE_ERROR,
-                    f"Argument type mismatch in function {func_name} and argument {arg_type.get('name')}",
-                )
-
-        self.__create_new_function_scope(
-            func_def.get("name"), func_def.get("args"), evaluated_args
-        )
-        has_return, return_val = self.__run_statements(
-            func_def.get("statements"), func_def.get("return_type")
-        )
+        if not self.type_check:
+            for val, arg_type in zip(evaluated_args, func_def.args):
+                if val.type() != arg_type.var_type:
+                    self.error(
+                        ErrorType.TYPE_ERROR,
+                        f"Argument type mismatch in function {func_def.name} and argument {arg_type.name}",
+                    )
+        return evaluated_args
 
+    def __check_return(self, func_def, has_return, return_val):
+        """Check the value returned by a function, returns the value the call
+        evaluates to"""
+        func_name = func_def.name
         # if the function return_type is void, it must not have return value
         if (
-            func_def.get("return_type") == InterpreterBase.VOID_DEF
+            func_def.return_type == InterpreterBase.VOID_DEF
             and return_val is not None
         ):
-            super().error(
+            self.error(
                 ErrorType.TYPE_ERROR,
-                f"Function {func_name} must return a value of type {func_def.get('return_type')}",
+                f"Function {func_name} must return a value of type {func_def.return_type}",
             )
 
         # if the function return_type is not void, and there is no return statement or no specific return value
-        if func_def.get("return_type") != InterpreterBase.VOID_DEF and (
+        if func_def.return_type != InterpreterBase.VOID_DEF and (
             not has_return or return_val is None
         ):
-            return_val = self.__create_default_value_obj(func_def.get("return_type"))
+            return_val = self._create_default_value_obj(func_def.return_type)
 
         # if the function return_type is struct, and the return value is nil
-        if self.__is_struct(func_def.get("return_type")) and (
+        if self._is_struct(func_def.return_type) and (
             not return_val or return_val.value() == None
         ):
-            return_val = self.__create_default_value_obj(func_def.get("return_type"))
+            return_val = self._create_default_value_obj(func_def.return_type)
 
         # if the function return_type is not void, and return type isn't match
-        if func_def.get("return_type") != InterpreterBase.VOID_DEF and (
-            return_val.type() != func_def.get("return_type")
+        if (
+            not self.type_check
+            and func_def.return_type != InterpreterBase.VOID_DEF
+            and return_val.type() != func_def.return_type
         ):
-            super().error(
+            self.error(
                 ErrorType.TYPE_ERROR,
-                f"Function {func_name} must return a value of type {func_def.get('return_type')}",
+                f"Function {func_name} must return a value of type {func_def.return_type}",
             )
-
-        self.__destroy_top_scope()
         return return_val
 
-    def __create_new_function_scope(self, func_name, args, values):
+    def _create_new_function_scope(self, func_name, args, values):
         """Initialize new variable scope for a function"""
         self.variable_scope_stack.append((ScopeType.FUNCTION, EnvironmentManager()))
         # current environment is top of stack
         self.env = self.variable_scope_stack[-1][1]
         for arg, value in zip(args, values):
-            self.__arg_def(arg.get("name"), value)
+            self.__arg_def(arg.name, value)
 
-    def __create_new_block_scope(self):
-        """Initialize new variable scope for a block"""
-        self.variable_scope_stack.append((ScopeType.BLOCK, EnvironmentManager()))
-        self.env = self.variable_scope_stack[-1][1]
+    def _create_new_block_scope(self, env=None):
+        """Initialize new variable scope for a block, reusing env if given"""
+        if env is None:
+            env = EnvironmentManager()
+        self.variable_scope_stack.append((ScopeType.BLOCK, env))
+        self.env = env
 
-    def __destroy_top_scope(self):
+    def _destroy_top_scope(self):
         """Destroy the current function scope, doesn't check errors"""
         self.variable_scope_stack.pop()
         self.env = (
             self.variable_scope_stack[-1][1] if self.variable_scope_stack else None
         )
 
+    def __scan_blocks(self, ast):
+        """Collect the blocks of a program that declare variables, the catch tables of
+        its try statements and the return statements in try blocks. A block without a
+        var def would only push an empty scope, which lookups go through."""
+        # (statements, whether they are in a try block)
+        blocks = [(func_def.statements, False) for func_def in ast.functions]
+        while blocks:
+            statements, in_try = blocks.pop()
+            for statement in statements:
+                elem_type = statement.elem_type
+                if elem_type == InterpreterBase.VAR_DEF_NODE:
+                    self.scoped_blocks.add(id(statements))
+                elif elem_type == InterpreterBase.RETURN_NODE:
+                    if in_try:
+                        self.guarded_returns.add(statement)
+                elif elem_type == InterpreterBase.IF_NODE:
+                    blocks.append((statement.statements, in_try))
+                    if statement.else_statements:
+                        blocks.append((statement.else_statements, in_try))
+                elif elem_type == InterpreterBase.FOR_NODE:
+                    blocks.append((statement.statements, in_try))
+                elif elem_type == InterpreterBase.TRY_NODE:
+                    self.catch_tables[statement] = catch_table(statement)
+                    blocks.append((statement.statements, True))
+                    for catch_ast in statement.catchers:
+                        blocks.append((catch_ast.statements, in_try))
+
     def __set_up_function_table(self, ast):
         """function table is a dictionary of (function name, number of arguments) to the AST node"""
         self.func_name_to_ast = {}
-        for func_def in ast.get("functions"):
-            self.func_name_to_ast[(func_def.get("name"), len(func_def.get("args")))] = (
+        for func_def in ast.functions:
+            self.func_name_to_ast[(func_def.name, len(func_def.args))] = (
                 func_def
             )
 
             # check if the return type of the function is defined
             if (
-                not is_non_nil_generic_type(func_def.get("return_type"))
-                and not self.__is_struct(func_def.get("return_type"))
-                and func_def.get("return_type") != InterpreterBase.VOID_DEF
+                not is_non_nil_generic_type(func_def.return_type)
+                and not self._is_struct(func_def.return_type)
+                and func_def.return_type != InterpreterBase.VOID_DEF
             ):
-                super().error(
+                self.error(
                     ErrorType.TYPE_ERROR,
-                    f"Unknown type {func_def.get('return_type')} on function {func_def.get('name')} return type",
+                    f"Unknown type {func_def.return_type} on function {func_def.name} return type",
+                    self.line_of(func_def),
                 )
 
             # check if the type of the arguments in the function definition is defined
-            for arg in func_def.get("args"):
+            for arg in func_def.args:
                 if not is_non_nil_generic_type(
-                    arg.get("var_type")
-                ) and not self.__is_struct(arg.get("var_type")):
-                    super().error(
+                    arg.var_type
+                ) and not self._is_struct(arg.var_type):
+                    self.error(
                         ErrorType.TYPE_ERROR,
-                        f"Unknown type {arg.get('var_type')} for argument {arg.get('name')} in function {func_def.get('name')}",
+                        f"Unknown type {arg.var_type} for argument {arg.name} in function {func_def.name}",
+                        self.line_of(arg),
                     )
 
-    def __get_func(self, name, args):
+    def _get_func(self, name, args):
         """get a function by name and number of arguments"""
         n_args = len(args)
         if (name, n_args) not in self.func_name_to_ast:
-            super().error(ErrorType.NAME_ERROR, f"Function {name} not found")
+            self.error(ErrorType.NAME_ERROR, f"Function {name} not found")
         return self.func_name_to_ast[(name, n_args)]
 
-    def __run_statements(self, statements, return_type):
-        "if there is a return statement, return True, value. otherwise return False, None"
-        # create a block scope
-        self.__create_new_block_scope()
+    def __run_statements(self, statements, return_type, scope=None):
+        """Run a block, returns the completion of the statement that left it or None"""
+        # create a block scope, if the block declares variables. A loop passes the
+        # scope of its body, reused from one iteration to the next
+        scoped = scope is not None or id(statements) in self.scoped_blocks
+        if scoped:
+            self._create_new_block_scope(scope)
 
         for statement in statements:
+            self.current_node = statement
             if self.trace_output:
-                print(statement)
-            if statement.elem_type == InterpreterBase.FCALL_NODE:
-                self.__call_func(statement)
-            elif statement.elem_type == "=":
-                self.__assign(statement)
-            elif statement.elem_type == InterpreterBase.VAR_DEF_NODE:
-                self.__var_def(statement)
-            elif statement.elem_type == InterpreterBase.IF_NODE:
-                is_return, return_value = self.__if_condition(statement, return_type)
-                if is_return:
-                    self.__destroy_top_scope()
-                    return is_return, return_value
-            elif statement.elem_type == InterpreterBase.RETURN_NODE:
-                val = self.__return_value(statement, return_type)
-                self.__destroy_top_scope()
-                return True, val
-            elif statement.elem_type == InterpreterBase.FOR_NODE:
-                is_return, return_value = self.__for_loop(statement, return_type)
-                if is_return:
-                    self.__destroy_top_scope()
-                    return is_return, return_value
+                self.trace(statement)
+            result = self.__run_statement(statement, return_type)
+            if result is not None:
+                if scoped:
+                    self._destroy_top_scope()
+                return result
 
         # destroy block scope
-        self.__destroy_top_scope()
-        return False, None
+        if scoped:
+            self._destroy_top_scope()
+        return None
+
+    def __run_statement(self, statement, return_type):
+        handler = self.statement_handlers.get(statement.elem_type)
+        if handler is None:
+            # any other statement is ignored
+            return None
+        return handler(statement, return_type)
+
+    def __setup_handlers(self):
+        """Map every node type to the method running it, so that a node is dispatched
+        with a single lookup"""
+        self.statement_handlers = {
+            InterpreterBase.FCALL_NODE: self.__run_call_statement,
+            "=": self.__assign,
+            InterpreterBase.VAR_DEF_NODE: self.__var_def,
+            InterpreterBase.IF_NODE: self.__if_condition,
+            InterpreterBase.RETURN_NODE: self.__return_value,
+            InterpreterBase.FOR_NODE: self.__for_loop,
+            InterpreterBase.TRY_NODE: self.__try,
+            InterpreterBase.RAISE_NODE: self.__raise,
+        }
+        # expression handlers return the Value of the expression before coercion
+        self.expr_handlers = {
+            InterpreterBase.NIL_NODE: self.__eval_nil,
+            InterpreterBase.INT_NODE: self.__eval_int,
+            InterpreterBase.STRING_NODE: self.__eval_string,
+            InterpreterBase.BOOL_NODE: self.__eval_bool,
+            InterpreterBase.VAR_NODE: self.__eval_var,
+            InterpreterBase.FCALL_NODE: self.__call_func,
+            InterpreterBase.NEW_NODE: self._new_struct,
+        }
+        if self.lazy:
+            self.expr_handlers[InterpreterBase.VAR_NODE] = self.__eval_lazy_var
+        for op in Interpreter.UNARY_OPS:
+            self.expr_handlers[op] = self.__eval_unary_op
+        for op in Interpreter.BIN_OPS:
+            self.expr_handlers[op] = self.__eval_op
+        if self.short_circuit or self.type_check:
+            for op in Interpreter.LOGICAL_OPS:
+                self.expr_handlers[op] = self.__eval_logical_op
+
+    # statement handlers take the statement and the return type of the function, and
+    # return its completion, like the statements compiled by the ClosureCompiler: None
+    # when control falls through, a 1-tuple holding the return value when a return
+    # statement was executed, or a TailCall when the return statement calls a function.
+    # Falling through, the common case, allocates nothing and costs a single test.
+
+    def __run_call_statement(self, statement, return_type):
+        self.__call_func(statement)
+
+    def __profiled_node(self, evaluate):
+        """Wrap a method evaluating a node (its first argument) to profile it"""
+        profiler = self.profiler
+
+        def profiled(node, *args):
+            if node is None:
+                return evaluate(node, *args)
+            profiler.enter_node(node)
+            try:
+                return evaluate(node, *args)
+            finally:
+                profiler.exit_node()
+
+        return profiled
 
     def __return_value(self, return_ast, return_type):
-        value = self.__eval_expr(return_ast.get("expression"), return_type)
-        return value
+        expression = return_ast.expression
+        if (
+            expression is not None
+            and expression.elem_type == InterpreterBase.FCALL_NODE
+            and expression.name not in Interpreter.BUILTIN_FUNCTIONS
+            and return_ast not in self.guarded_returns
+        ):
+            # a tail call, run by __run_function once this function's scope is gone
+            func_def = self._get_func(expression.name, expression.args)
+            return TailCall(
+                func_def, self.__eval_args(func_def, expression.args), return_type
+            )
+        return (self.__eval_expr(expression, return_type),)
 
     def __for_loop(self, for_ast, return_type):
-        init = for_ast.get("init")
-        condition = for_ast.get("condition")
-        update = for_ast.get("update")
-        statements = for_ast.get("statements")
+        init = for_ast.init
+        condition = for_ast.condition
+        update = for_ast.update
+        statements = for_ast.statements
 
-        self.__create_new_block_scope()
+        # the init and the update are assignments, they don't need a scope of their own
         self.__assign(init)
 
         if self.__eval_expr(condition, Type.BOOL).type() != Type.BOOL:
-            super().error(
+            self.error(
                 ErrorType.TYPE_ERROR, "for condition must be a boolean expression"
             )
 
+        body_scope = (
+            EnvironmentManager() if id(statements) in self.scoped_blocks else None
+        )
         while self.__eval_expr(condition, Type.BOOL).value():
-            is_return, return_value = self.__run_statements(statements, return_type)
-            if is_return:
-                self.__destroy_top_scope()
-                return is_return, return_value
-            self.__run_statements([update], return_type)
-        self.__destroy_top_scope()
-        return False, None
+            result = self.__run_statements(statements, return_type, body_scope)
+            if result is not None:
+                return result
+            if body_scope is not None:
+                # the next iteration declares its variables again
+                body_scope.clear()
+            self.current_node = update
+            if self.trace_output:
+                self.trace(update)
+            self.__run_statement(update, return_type)
+        return None
 
     def __if_condition(self, if_ast, return_type):
-        condition = self.__eval_expr(if_ast.get("condition"), Type.BOOL)
+        condition = self.__eval_expr(if_ast.condition, Type.BOOL)
         if condition.type() != Type.BOOL:
-            super().error(
+            self.error(
                 ErrorType.TYPE_ERROR, "If condition must be a boolean expression"
             )
-        statements = if_ast.get("statements")
+        statements = if_ast.statements
         else_statements = (
-            if_ast.get("else_statements") if if_ast.get("else_statements") else []
+            if_ast.else_statements if if_ast.else_statements else []
         )
         if condition.value():
-            is_return, return_value = self.__run_statements(statements, return_type)
-        else:
-            is_return, return_value = self.__run_statements(
-                else_statements, return_type
-            )
-        return is_return, return_value
+            return self.__run_statements(statements, return_type)
+        return self.__run_statements(else_statements, return_type)
+
+    def __try(self, try_ast, return_type):
+        # what the statements that raised leave behind is unwound by the catch
+        scope_depth = len(self.variable_scope_stack)
+        call_depth = self.call_depth
+        profiled_calls = (
+            len(self.profiler.function_stack) if self.profiler is not None else 0
+        )
+        try:
+            return self.__run_statements(try_ast.statements, return_type)
+        except BrewinException as exception:
+            catch_ast = self.catch_tables[try_ast].get(exception.exception_type)
+            if catch_ast is None:
+                raise
+
+        del self.variable_scope_stack[scope_depth:]
+        self.env = self.variable_scope_stack[-1][1]
+        self.call_depth = call_depth
+        if self.profiler is not None:
+            while len(self.profiler.function_stack) > profiled_calls:
+                self.profiler.exit_function()
+        return self.__run_statements(catch_ast.statements, return_type)
+
+    def __raise(self, raise_ast, return_type):
+        value_obj = self.__eval_expr(raise_ast.exception_type, None)
+        if value_obj == None or value_obj.type() != Type.STRING:
+            self.error(ErrorType.TYPE_ERROR, "Raise expression must be a string")
+        raise BrewinException(value_obj.value(), self.line_of(raise_ast))
 
     def __call_func(self, call_node):
-        func_name = call_node.get("name")
-        func_args = call_node.get("args")
+        func_name = call_node.name
+        func_args = call_node.args
 
         if func_name == "print":
             return self.__call_print(call_node)
@@ -277,39 +725,39 @@ class Interpreter(InterpreterBase):
 
     def __call_print(self, call_ast):
         output = ""
-        for arg in call_ast.get("args"):
+        for arg in call_ast.args:
             result = self.__eval_expr(arg, None)  # result is a Value object
             if result == None:
-                super().error(
+                self.error(
                     ErrorType.TYPE_ERROR, "Cannot print void value in print statement"
                 )
             output = output + get_printable(result)
-        self.outputs.append(output)
+        self.write_output(output)
         # super().output(output)
 
     def __call_input(self, call_ast):
-        args = call_ast.get("args")
+        args = call_ast.args
         if args is not None and len(args) == 1:
             result = self.__eval_expr(args[0], None)
-            self.outputs.append(get_printable(result))
+            self.write_output(get_printable(result))
             # super().output(get_printable(result))
         elif args is not None and len(args) > 1:
-            super().error(
+            self.error(
                 ErrorType.NAME_ERROR, "No inputi() function that takes > 1 parameter"
             )
-        inp = super().get_input()
-        if call_ast.get("name") == "inputi":
-            return Value(Type.INT, int(inp))
+        inp = self.get_input()
+        if call_ast.name == "inputi":
+            return int_value(int(inp))
         # input string
-        if call_ast.get("name") == "inputs":
+        if call_ast.name == "inputs":
             return Value(Type.STRING, inp)
 
-    def __assign(self, assign_ast):
-        var_name = assign_ast.get("name")
-        value_obj = self.__eval_expr(assign_ast.get("expression"), None)
+    def __assign(self, assign_ast, return_type=None):
+        var_name = assign_ast.name
+        value_obj = self.__eval_expr(assign_ast.expression, None)
 
         if value_obj == None:
-            super().error(
+            self.error(
                 ErrorType.TYPE_ERROR,
                 f"Cannot assign void value to variable {var_name}",
             )
@@ -325,12 +773,17 @@ class Interpreter(InterpreterBase):
             if var is not None:
                 # try setting the value to var, if it fails, it's a type error
                 try:
-                    if "." not in var_name:
+                    if assign_ast in self.checked_assigns and "." not in var_name:
+                        # the value already has the type of the variable
+                        env_iterator.environment[var_name] = value_obj
+                    elif "." not in var_name:
                         value_obj = self.coerce_value(value_obj, var.type())
                         env_iterator.set(var_name, value_obj)
                     else:
                         struct_ast = env_iterator.get(var_var)
-                        value_ast = self.__get_struct_field_obj(struct_ast, field_name)
+                        owner, slot, value_ast = self._find_struct_field(
+                            struct_ast, field_name
+                        )
                         value_obj = self.coerce_value(value_obj, value_ast.type())
 
                         # TODO: check if necessary
@@ -338,32 +791,114 @@ class Interpreter(InterpreterBase):
                             raise TypeError(
                                 f"Cannot assign value of type for struct attribute {value_obj.type()} to {value_ast.type()}"
                             )
-                        value_ast.v = value_obj.v
-                        # struct_ast.value().set_field(field_name, value_obj)
+                        owner.values[slot] = value_obj
                     break
                 except TypeError as e:
-                    super().error(ErrorType.TYPE_ERROR, str(e))
+                    self.error(ErrorType.TYPE_ERROR, str(e))
             # when reaching the function scope but the variable is not found
             elif scope_type == ScopeType.FUNCTION:
-                super().error(
+                self.error(
                     ErrorType.NAME_ERROR, f"Undefined variable {var_name} in assignment"
                 )
+        return None
+
+    def __assign_lazily(self, assign_ast, return_type=None):
+        """Bind a variable to its delayed value, a field is assigned right away"""
+        var_name = assign_ast.name
+        base_name = var_name.split(".", 1)[0]
+        for scope_type, env_iterator in reversed(self.variable_scope_stack):
+            var = env_iterator.get(base_name)
+            if var is not None:
+                if "." in var_name:
+                    if var.__class__ is Thunk:
+                        # the struct holding the field is needed now
+                        env_iterator.environment[base_name] = var.force()
+                    break
+                env_iterator.environment[var_name] = self.__delay(
+                    assign_ast.expression, var.type(), var_name
+                )
+                return None
+            if scope_type == ScopeType.FUNCTION:
+                break
+        # a field, or an undefined variable to report
+        return Interpreter.__assign(self, assign_ast)
+
+    def __delay_args(self, func_def, passed_arguments):
+        """Delay the evaluation of the arguments of a call to func_def"""
+        return [
+            self.__delay(arg, arg_def.var_type, arg_def.name)
+            for arg, arg_def in zip(passed_arguments, func_def.args)
+        ]
+
+    def __delay(self, expr_ast, var_type, var_name):
+        """Value or Thunk to bind to a variable of type var_type, for an expression
+        evaluated lazily"""
+        # a literal of the right type can't fail, it costs less than a thunk
+        if Interpreter.LITERAL_TYPES.get(expr_ast.elem_type) == var_type:
+            return self.__eval_expr(expr_ast, None)
+        names = self.free_variables.get(expr_ast)
+        if names is None:
+            names = self.free_variables[expr_ast] = free_variables(expr_ast)
+        scope = EnvironmentManager()
+        for name in names:
+            binding = self.__binding(name)
+            if binding is not None:
+                scope.environment[name] = binding
+        if expr_ast.elem_type == InterpreterBase.VAR_NODE and "." not in expr_ast.name:
+            # the variable's binding is shared, it's evaluated at most once
+            binding = scope.environment.get(expr_ast.name)
+            if binding is not None and binding.type() == var_type:
+                return binding
+        return Thunk(
+            var_type, var_name, expr_ast, scope, self.current_node, self.__force
+        )
+
+    def __binding(self, var_name):
+        """Value or Thunk bound to a variable, None if it's not defined"""
+        for scope_type, env_iterator in reversed(self.variable_scope_stack):
+            var = env_iterator.get(var_name)
+            if var is not None:
+                # a forced thunk is only kept for its value
+                if var.__class__ is Thunk and var.value_obj is not None:
+                    return var.value_obj
+                return var
+            if scope_type == ScopeType.FUNCTION:
+                return None
+        return None
+
+    def __force(self, thunk):
+        """Evaluate a delayed expression with the variables it captured"""
+        saved = self.variable_scope_stack, self.env, self.current_node
+        self.variable_scope_stack = [(ScopeType.FUNCTION, thunk.scope)]
+        self.env = thunk.scope
+        self.current_node = thunk.node
+        try:
+            value_obj = self.__eval_expr(thunk.expr, None)
+            if value_obj == None:
+                self.error(
+                    ErrorType.TYPE_ERROR,
+                    f"Cannot assign void value to variable {thunk.name}",
+                )
+            return self.coerce_value(value_obj, thunk.t)
+        finally:
+            self.variable_scope_stack, self.env, self.current_node = saved
 
-    def __var_def(self, var_ast):
-        var_name = var_ast.get("name")
-        var_type = var_ast.get("var_type")
+    def __var_def(self, var_ast, return_type=None):
+        var_name = var_ast.name
+        var_type = var_ast.var_type
 
-        default_value = self.__create_default_value_obj(var_type)
+        default_value = self._create_default_value_obj(var_type)
 
         if not self.env.create(var_name, default_value):
-            super().error(
+            self.error(
                 ErrorType.NAME_ERROR, f"Duplicate definition for variable {var_name}"
             )
+        return None
 
     def __arg_def(self, var_name, value):
         """Define a new argument in the current function scope with passed value node"""
         if not self.env.create(var_name, value):
-            super().error(
+            self.error(
                 ErrorType.NAME_ERROR,
                 f"Duplicate definition for function argument name {var_name}",
             )
@@ -375,81 +910,95 @@ class Interpreter(InterpreterBase):
             return value
 
         if value.type() == Type.INT and target == Type.BOOL:
-            return Value(Type.BOOL, value.value() != 0)
+            return bool_value(value.value() != 0)
 
         if not is_generic_type(target) and value.type() == Type.NIL:
             return Value(target, None)
 
-        super().error(
+        self.error(
             ErrorType.TYPE_ERROR,
             f"Cannot coerce value of type {value.type()} to type {target}",
         )
 
     def __eval_expr(self, expr_ast, target_type) -> Value:
         if expr_ast is None:
-            return self.__create_default_value_obj(target_type)
-        if expr_ast.elem_type == InterpreterBase.NIL_NODE:
-            res = Value(Type.NIL, None)
-        if expr_ast.elem_type == InterpreterBase.INT_NODE:
-            res = Value(Type.INT, expr_ast.get("val"))
-        if expr_ast.elem_type == InterpreterBase.STRING_NODE:
-            return Value(Type.STRING, expr_ast.get("val"))
-        if expr_ast.elem_type == InterpreterBase.BOOL_NODE:
-            return Value(Type.BOOL, expr_ast.get("val"))
-        if expr_ast.elem_type == InterpreterBase.VAR_NODE:
-            var_name = expr_ast.get("name")
-            # look up variable from current scope up to the closest function scope
-            for scope_type, env_iterator in reversed(self.variable_scope_stack):
-                if "." in var_name:
-                    var_var, field_name = var_name.split(".", 1)
-                    var = env_iterator.get(var_var)
-                else:
-                    var = env_iterator.get(var_name)
-                if var is not None:
-                    if "." in var_name:
-                        res = self.__get_struct_field_obj(var, field_name)
-                        return self.coerce_value(res, target_type)
+            return self._create_default_value_obj(target_type)
+        value = self.expr_handlers[expr_ast.elem_type](expr_ast)
+        # string and bool constants are never coerced
+        if target_type is None or expr_ast.elem_type in Interpreter.UNCOERCED_NODES:
+            return value
+        return self.coerce_value(value, target_type)
 
-                    else:
-                        return self.coerce_value(var, target_type)
-                if scope_type == ScopeType.FUNCTION and var is None:
-                    super().error(
-                        ErrorType.NAME_ERROR, f"Variable {var_name} not found"
-                    )
-        if expr_ast.elem_type == InterpreterBase.FCALL_NODE:
-            res = self.__call_func(expr_ast)
-        if expr_ast.elem_type in Interpreter.UNARY_OPS:
-            res = self.__eval_unary_op(expr_ast)
-        if expr_ast.elem_type in Interpreter.BIN_OPS:
-            res = self.__eval_op(expr_ast)
-        if expr_ast.elem_type == InterpreterBase.NEW_NODE:
-            res = self.__new_struct(expr_ast)
+    def __eval_nil(self, expr_ast):
+        return NIL
+
+    def __eval_int(self, expr_ast):
+        return int_value(expr_ast.val)
 
-        return self.coerce_value(res, target_type)
+    def __eval_string(self, expr_ast):
+        return string_value(expr_ast.val)
+
+    def __eval_bool(self, expr_ast):
+        return bool_value(expr_ast.val)
+
+    def __eval_var(self, expr_ast):
+        var_name = expr_ast.name
+        # look up variable from current scope up to the closest function scope
+        for scope_type, env_iterator in reversed(self.variable_scope_stack):
+            if "." in var_name:
+                var_var, field_name = var_name.split(".", 1)
+                var = env_iterator.get(var_var)
+            else:
+                var = env_iterator.get(var_name)
+            if var is not None:
+                if "." in var_name:
+                    return self._get_struct_field_obj(var, field_name)
+                return var
+            if scope_type == ScopeType.FUNCTION and var is None:
+                self.error(ErrorType.NAME_ERROR, f"Variable {var_name} not found")
+
+    def __eval_lazy_var(self, expr_ast):
+        """Value of a variable, forcing the delayed expression it's bound to"""
+        var_name = expr_ast.name
+        base_name, _, field_name = var_name.partition(".")
+        var = self.__binding(base_name)
+        if var is None:
+            self.error(ErrorType.NAME_ERROR, f"Variable {var_name} not found")
+        if var.__class__ is Thunk:
+            var = var.force()
+        if field_name:
+            return self._get_struct_field_obj(var, field_name)
+        return var
+
+    def __eval_checked_unary_op(self, arith_ast):
+        f = self.checked_ops.get(arith_ast)
+        if f is None:
+            return Interpreter.__eval_unary_op(self, arith_ast)
+        return f(self.__eval_expr(arith_ast.op1, None))
 
     def __eval_unary_op(self, arith_ast):
-        value_obj = self.__eval_expr(arith_ast.get("op1"), None)
+        value_obj = self.__eval_expr(arith_ast.op1, None)
         if value_obj == None:
-            super().error(
+            self.error(
                 ErrorType.TYPE_ERROR,
                 f"Cannot perform unary operation on void value",
             )
         if arith_ast.elem_type not in self.op_to_lambda[value_obj.type()]:
-            super().error(
+            self.error(
                 ErrorType.TYPE_ERROR,
                 f"Incompatible operator {arith_ast.elem_type} for type {value_obj.type()}",
             )
         f = self.op_to_lambda[value_obj.type()][arith_ast.elem_type]
         return f(value_obj)
 
-    def __is_struct(self, val_type: str) -> bool:
+    def _is_struct(self, val_type: str) -> bool:
         return val_type in self.structure_table
 
-    def __struct_eval_op(self, arith_ast, left_value_obj, right_value_obj):
+    def _struct_eval_op(self, arith_ast, left_value_obj, right_value_obj):
         if is_non_nil_generic_type(left_value_obj.type()) or is_non_nil_generic_type(
             right_value_obj.type()
         ):
-            super().error(
+            self.error(
                 ErrorType.TYPE_ERROR,
                 f"Cannot compare struct with non-struct type other than nil",
             )
@@ -457,10 +1006,10 @@ class Interpreter(InterpreterBase):
         # if both values are structs but diff types, raise an error
         if (
             left_value_obj.type() != right_value_obj.type()
-            and self.__is_struct(left_value_obj.type())
-            and self.__is_struct(right_value_obj.type())
+            and self._is_struct(left_value_obj.type())
+            and self._is_struct(right_value_obj.type())
         ):
-            super().error(
+            self.error(
                 ErrorType.TYPE_ERROR,
                 f"Cannot compare struct {left_value_obj.type()} with struct {right_value_obj.type()}",
             )
@@ -468,37 +1017,76 @@ class Interpreter(InterpreterBase):
         if arith_ast.elem_type == "==":
             # if one of the values is nil, return the opposite of the other value
             if left_value_obj.type() != right_value_obj.type():
-                return Value(
-                    Type.BOOL, left_value_obj.value() == right_value_obj.value()
-                )
+                return bool_value(left_value_obj.value() == right_value_obj.value())
             # if both values are structs, compare their references
-            return Value(Type.BOOL, left_value_obj.value() is right_value_obj.value())
+            return bool_value(left_value_obj.value() is right_value_obj.value())
 
         if arith_ast.elem_type in "!=":
             # if one of the values is nil, return the opposite of the other value
             if left_value_obj.type() != right_value_obj.type():
-                return Value(
-                    Type.BOOL, left_value_obj.value() != right_value_obj.value()
-                )
+                return bool_value(left_value_obj.value() != right_value_obj.value())
             # if both values are structs, compare their references
-            return Value(
-                Type.BOOL, left_value_obj.value() is not right_value_obj.value()
-            )
+            return bool_value(left_value_obj.value() is not right_value_obj.value())
+
+    def __eval_checked_op(self, arith_ast):
+        f = self.checked_ops.get(arith_ast)
+        if f is None:
+            return Interpreter.__eval_op(self, arith_ast)
+        return f(
+            self.__eval_expr(arith_ast.op1, None), self.__eval_expr(arith_ast.op2, None)
+        )
 
     def __eval_op(self, arith_ast):
-        left_value_obj = self.__eval_expr(arith_ast.get("op1"), None)
-        right_value_obj = self.__eval_expr(arith_ast.get("op2"), None)
+        return self._apply_binary_op(
+            arith_ast,
+            self.__eval_expr(arith_ast.op1, None),
+            self.__eval_expr(arith_ast.op2, None),
+        )
 
+    def __eval_logical_op(self, arith_ast):
+        """&& and ||, skipping the right operand when the left one decides the result,
+        if the language short-circuits or if the right operand is pure and can't
+        fail"""
+        if not self.short_circuit and arith_ast not in self.skippable_ops:
+            return self.__eval_op(arith_ast)
+        left_value_obj = self.__eval_expr(arith_ast.op1, None)
+        value_obj = self.short_circuit_value(arith_ast.elem_type, left_value_obj)
+        if value_obj is not None:
+            return value_obj
+        right_value_obj = self.__eval_expr(arith_ast.op2, None)
+        f = self.checked_ops.get(arith_ast)
+        if f is not None:
+            return f(left_value_obj, right_value_obj)
+        return self._apply_binary_op(arith_ast, left_value_obj, right_value_obj)
+
+    def short_circuit_value(self, op, left_value_obj):
+        """Value of a && or || operation when its left operand decides it, None when
+        the right operand is needed"""
+        if left_value_obj == None:
+            return None
+        left_type = left_value_obj.type()
+        if left_type == Type.INT and self.short_circuit:
+            # the int is coerced to a bool, whatever the type of the right operand
+            left_value_obj = bool_value(left_value_obj.value() != 0)
+        elif left_type != Type.BOOL and left_type != Type.INT:
+            return None
+        if bool(left_value_obj.value()) != (op == "||"):
+            return None
+        # the operators give the payload of a deciding left operand
+        return bool_value(left_value_obj.value())
+
+    def _apply_binary_op(self, arith_ast, left_value_obj, right_value_obj):
+        """Apply a binary operator to the values of its operands"""
         if left_value_obj == None or right_value_obj == None:
-            super().error(
+            self.error(
                 ErrorType.TYPE_ERROR,
                 f"Cannot compare void value",
             )
 
-        if self.__is_struct(left_value_obj.type()) or self.__is_struct(
+        if self._is_struct(left_value_obj.type()) or self._is_struct(
             right_value_obj.type()
         ):
-            return self.__struct_eval_op(arith_ast, left_value_obj, right_value_obj)
+            return self._struct_eval_op(arith_ast, left_value_obj, right_value_obj)
 
         if left_value_obj.type() == Type.BOOL and right_value_obj.type() == Type.INT:
             right_value_obj = self.coerce_value(right_value_obj, Type.BOOL)
@@ -510,17 +1098,17 @@ class Interpreter(InterpreterBase):
             not left_value_obj or not right_value_obj
         ):
             if arith_ast.elem_type == "==":
-                return Value(Type.BOOL, False)
+                return FALSE
             elif arith_ast.elem_type == "!=":
-                return Value(Type.BOOL, True)
+                return TRUE
 
         if left_value_obj.type() != right_value_obj.type():
-            super().error(
+            self.error(
                 ErrorType.TYPE_ERROR,
                 f"Incompatible types for {arith_ast.elem_type} operation",
             )
         if arith_ast.elem_type not in self.op_to_lambda[left_value_obj.type()]:
-            super().error(
+            self.error(
                 ErrorType.TYPE_ERROR,
                 f"Incompatible operator {arith_ast.elem_type} for type {left_value_obj.type()}",
             )
@@ -531,129 +1119,158 @@ class Interpreter(InterpreterBase):
         self.op_to_lambda = {}
         # set up operations on integers
         self.op_to_lambda[Type.INT] = {}
-        self.op_to_lambda[Type.INT]["+"] = lambda x, y: Value(
-            x.type(), x.value() + y.value()
-        )
-        self.op_to_lambda[Type.INT]["-"] = lambda x, y: Value(
-            x.type(), x.value() - y.value()
+        self.op_to_lambda[Type.INT]["+"] = lambda x, y: int_value(x.value() + y.value())
+        self.op_to_lambda[Type.INT]["-"] = lambda x, y: int_value(x.value() - y.value())
+        self.op_to_lambda[Type.INT]["*"] = lambda x, y: int_value(x.value() * y.value())
+        self.op_to_lambda[Type.INT]["/"] = lambda x, y: int_value(
+            x.value() // y.value()
         )
-        self.op_to_lambda[Type.INT]["*"] = lambda x, y: Value(
-            x.type(), x.value() * y.value()
+        self.op_to_lambda[Type.INT][">="] = lambda x, y: bool_value(
+            x.value() >= y.value()
         )
-        self.op_to_lambda[Type.INT]["/"] = lambda x, y: Value(
-            x.type(), x.value() // y.value()
+        self.op_to_lambda[Type.INT]["<="] = lambda x, y: bool_value(
+            x.value() <= y.value()
         )
-        self.op_to_lambda[Type.INT][">="] = lambda x, y: Value(
-            Type.BOOL, x.value() >= y.value()
+        self.op_to_lambda[Type.INT][">"] = lambda x, y: bool_value(
+            x.value() > y.value()
         )
-        self.op_to_lambda[Type.INT]["<="] = lambda x, y: Value(
-            Type.BOOL, x.value() <= y.value()
+        self.op_to_lambda[Type.INT]["<"] = lambda x, y: bool_value(
+            x.value() < y.value()
         )
-        self.op_to_lambda[Type.INT][">"] = lambda x, y: Value(
-            Type.BOOL, x.value() > y.value()
+        self.op_to_lambda[Type.INT]["=="] = lambda x, y: bool_value(
+            x.value() == y.value()
         )
-        self.op_to_lambda[Type.INT]["<"] = lambda x, y: Value(
-            Type.BOOL, x.value() < y.value()
+        self.op_to_lambda[Type.INT]["!="] = lambda x, y: bool_value(
+            x.value() != y.value()
         )
-        self.op_to_lambda[Type.INT]["=="] = lambda x, y: Value(
-            Type.BOOL, x.value() == y.value()
+        self.op_to_lambda[Type.INT]["&&"] = lambda x, y: bool_value(
+            x.value() and y.value()
         )
-        self.op_to_lambda[Type.INT]["!="] = lambda x, y: Value(
-            Type.BOOL, x.value() != y.value()
-        )
-        self.op_to_lambda[Type.INT]["&&"] = lambda x, y: Value(
-            Type.BOOL, x.value() and y.value()
-        )
-        self.op_to_lambda[Type.INT]["||"] = lambda x, y: Value(
-            Type.BOOL, x.value() or y.value()
+        self.op_to_lambda[Type.INT]["||"] = lambda x, y: bool_value(
+            x.value() or y.value()
         )
         # set up operations on strings
         self.op_to_lambda[Type.STRING] = {}
         self.op_to_lambda[Type.STRING]["+"] = lambda x, y: Value(
             x.type(), x.value() + y.value()
         )
-        self.op_to_lambda[Type.STRING]["=="] = lambda x, y: Value(
-            Type.BOOL, x.value() == y.value()
+        self.op_to_lambda[Type.STRING]["=="] = lambda x, y: bool_value(
+            x.value() == y.value()
         )
-        self.op_to_lambda[Type.STRING]["!="] = lambda x, y: Value(
-            Type.BOOL, x.value() != y.value()
+        self.op_to_lambda[Type.STRING]["!="] = lambda x, y: bool_value(
+            x.value() != y.value()
         )
         # set up operations on booleans
         self.op_to_lambda[Type.BOOL] = {}
-        self.op_to_lambda[Type.BOOL]["||"] = lambda x, y: Value(
-            x.type(), x.value() or y.value()
+        self.op_to_lambda[Type.BOOL]["||"] = lambda x, y: bool_value(
+            x.value() or y.value()
         )
-        self.op_to_lambda[Type.BOOL]["&&"] = lambda x, y: Value(
-            Type.BOOL, x.value() and y.value()
+        self.op_to_lambda[Type.BOOL]["&&"] = lambda x, y: bool_value(
+            x.value() and y.value()
         )
-        self.op_to_lambda[Type.BOOL]["=="] = lambda x, y: Value(
-            Type.BOOL, x.value() == y.value()
+        self.op_to_lambda[Type.BOOL]["=="] = lambda x, y: bool_value(
+            x.value() == y.value()
         )
-        self.op_to_lambda[Type.BOOL]["!="] = lambda x, y: Value(
-            Type.BOOL, x.value() != y.value()
+        self.op_to_lambda[Type.BOOL]["!="] = lambda x, y: bool_value(
+            x.value() != y.value()
         )
 
         #  unary operations
-        self.op_to_lambda[Type.INT]["neg"] = lambda x: Value(Type.INT, -x.value())
-        self.op_to_lambda[Type.BOOL]["!"] = lambda x: Value(Type.BOOL, not x.value())
-        self.op_to_lambda[Type.INT]["!"] = lambda x: Value(
-            Type.BOOL, False if x.value() else True
+        self.op_to_lambda[Type.INT]["neg"] = lambda x: int_value(-x.value())
+        self.op_to_lambda[Type.BOOL]["!"] = lambda x: bool_value(not x.value())
+        self.op_to_lambda[Type.INT]["!"] = lambda x: bool_value(
+            False if x.value() else True
         )
 
         # nil operations
         self.op_to_lambda[Type.NIL] = {}
-        self.op_to_lambda[Type.NIL]["=="] = lambda x, y: Value(Type.BOOL, True)
-        self.op_to_lambda[Type.NIL]["!="] = lambda x, y: Value(Type.BOOL, False)
+        self.op_to_lambda[Type.NIL]["=="] = lambda x, y: TRUE
+        self.op_to_lambda[Type.NIL]["!="] = lambda x, y: FALSE
 
-    def __create_default_value_obj(self, val_type):
+    def _create_default_value_obj(self, val_type):
         if val_type == Type.INT:
-            return Value(Type.INT, 0)
+            return ZERO
         if val_type == Type.STRING:
-            return Value(Type.STRING, "")
+            return EMPTY_STRING
         if val_type == Type.BOOL:
-            return Value(Type.BOOL, False)
+            return FALSE
         if val_type == Type.NIL:
-            return Value(Type.NIL)
+            return NIL
 
         if val_type in self.structure_table:
-            return Value(val_type)
+            return self.structure_table[val_type].nil_value
         if val_type == InterpreterBase.VOID_DEF:
             return None
 
         # This should never happen
-        super().error(ErrorType.TYPE_ERROR, f"Unknown type {val_type}")
+        self.error(ErrorType.TYPE_ERROR, f"Unknown type {val_type}")
         return None
 
-    def __new_struct(self, ast):
+    def _new_struct(self, ast):
         """Generating a new struct object from the AST"""
-        struct_type = ast.get("var_type")
+        struct_type = ast.var_type
         if struct_type not in self.structure_table:
-            super().error(
+            self.error(
                 ErrorType.TYPE_ERROR,
-                f"Unknown struct {ast.get('var_type')} on new operation",
+                f"Unknown struct {ast.var_type} on new operation",
             )
 
-        struct_obj = Struct(
-            self.structure_table[struct_type], self.__create_default_value_obj
-        )
-        return Value(struct_type, struct_obj)
+        return Value(struct_type, Struct(self.structure_table[struct_type]))
 
     def __check_field_in_struct(self, struct_type, field_name):
         # verify the struct_type is a struct
         if struct_type not in self.structure_table:
-            super().error(
+            self.error(
                 ErrorType.TYPE_ERROR,
                 f"Unknown struct {struct_type} on field access",
             )
         if field_name not in self.structure_table[struct_type]:
-            super().error(
+            self.error(
                 ErrorType.NAME_ERROR,
                 f"Field {field_name} does not exist in struct {struct_type}",
             )
 
-    def __get_struct_field_obj(self, struct_ast, field_name):
+    def _get_struct_field_obj(self, struct_ast, field_name):
+        return self._find_struct_field(struct_ast, field_name)[2]
+
+    def __field_path(self, struct_type, field_name):
+        """Slot indexes of a dotted field path starting from struct_type, or None if
+        the path doesn't go through struct fields only; cached per type and path"""
+        key = (struct_type, field_name)
+        if key in self.field_paths:
+            return self.field_paths[key]
+        path = []
+        for current_field in field_name.split("."):
+            layout = self.structure_table.get(struct_type)
+            if layout is None or current_field not in layout:
+                path = None
+                break
+            path.append(layout.index[current_field])
+            struct_type = layout.field_type(current_field)
+        if path is not None:
+            path = tuple(path)
+        self.field_paths[key] = path
+        return path
+
+    def _find_struct_field(self, struct_ast, field_name):
+        """Look up a dotted field path, returns (struct holding the last field, slot
+        of the last field, field value) so assignments can replace the field's value"""
+        # fast path: every struct on the way is set, follow the precomputed slots
+        path = self.__field_path(struct_ast.type(), field_name)
+        if path is not None:
+            struct_obj = struct_ast.value()
+            for slot in path:
+                if struct_obj is None:
+                    break
+                owner = struct_obj
+                value = owner.values[slot]
+                struct_obj = value.value()
+            else:
+                return owner, slot, value
+
+        # slow path, which also reports the errors
         if struct_ast.value() is None:
-            super().error(
+            self.error(
                 ErrorType.FAULT_ERROR,
                 f"Cannot access field {field_name} of nil struct",
             )
@@ -661,7 +1278,7 @@ class Interpreter(InterpreterBase):
 
         obj_type, struct_obj = struct_ast.type(), struct_ast.value()
         if not isinstance(struct_obj, Struct):
-            super().error(
+            self.error(
                 ErrorType.TYPE_ERROR,
                 f"Expected struct object, got {obj_type} for .{field_name}",
             )
@@ -674,14 +1291,15 @@ class Interpreter(InterpreterBase):
             try:
                 if isinstance(struct_obj, Value):
                     if not struct_obj.value():
-                        super().error(
+                        self.error(
                             ErrorType.TYPE_ERROR,
                             f"Cannot access field {current_field} of nil struct",
                         )
-                    struct_obj = struct_obj.value().get_field(current_field)
+                    owner = struct_obj.value()
                 else:
-                    struct_obj = struct_obj.get_field(current_field)
+                    owner = struct_obj
+                struct_obj = owner.get_field(current_field)
             except AttributeError as e:
-                super().error(ErrorType.NAME_ERROR, str(e))
+                self.error(ErrorType.NAME_ERROR, str(e))
 
-        return struct_obj
+        return owner, owner.layout.index[current_field], struct_obj
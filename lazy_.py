@@ -0,0 +1,61 @@
+# Lazy (call-by-need) evaluation for the tree walker. With Interpreter(lazy=True), an
+# assignment to a variable and an argument of a call to a user function don't evaluate
+# their expression: they bind the variable to a Thunk, which evaluates it the first time
+# the variable is read and keeps the result. Reading a variable happens when a value is
+# observed: by print, a condition, an operator, a return statement, a struct field
+# assignment or an input prompt, so an expression whose value is never used never runs.
+#
+# A Thunk captures the bindings of the variables its expression reads when it's
+# created, so assigning to them afterwards doesn't change its value. The bindings are
+# Values or Thunks themselves, which are only forced if the expression reads them.
+# Errors in a delayed expression, including the type errors of the assignment or of
+# the argument, are reported when it's forced, at the line of the statement that
+# delayed it.
+from element import Element
+from intbase import InterpreterBase
+
+
+class Thunk:
+    """A delayed expression, evaluated at most once to a value of a known type"""
+
+    __slots__ = ("t", "name", "expr", "scope", "node", "evaluate", "value_obj")
+
+    def __init__(self, var_type, name, expr, scope, node, evaluate):
+        self.t = var_type  # type of the variable or argument it's bound to
+        self.name = name  # name of the variable or argument
+        self.expr = expr
+        self.scope = scope  # EnvironmentManager of the captured variables
+        self.node = node  # statement that delayed the expression
+        self.evaluate = evaluate  # evaluate(thunk) -> Value
+        self.value_obj = None
+
+    def type(self):
+        return self.t
+
+    def force(self):
+        """Value of the expression, evaluated on the first call only"""
+        if self.value_obj is None:
+            self.value_obj = self.evaluate(self)
+            # the captured variables may hold more thunks, let them go
+            self.expr = self.scope = self.node = None
+        return self.value_obj
+
+
+def free_variables(expr_ast):
+    """Names of the variables an expression reads, the variable holding the struct for
+    a field path, in order of first appearance"""
+    names = []
+    stack = [expr_ast]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif not isinstance(node, Element):
+            continue
+        elif node.elem_type == InterpreterBase.VAR_NODE:
+            name = node.name.split(".", 1)[0]
+            if name not in names:
+                names.append(name)
+        else:
+            stack.extend(reversed([getattr(node, key) for key in node._fields]))
+    return tuple(names)
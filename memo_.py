@@ -0,0 +1,122 @@
+# Memoization of pure Brewin functions. A function is pure when calling it again with
+# the same arguments gives the same result and has no visible effect:
+#   - its arguments and its return value are ints, bools or strings. A struct argument
+#     may be mutated by the function or by its caller between two calls, and a struct
+#     returned by two calls would be shared. Structs the function creates can't escape
+#     it, so it may use them freely.
+#   - it doesn't print nor read input,
+#   - it only calls pure functions (it may call itself).
+# Brewin has no global variables, so nothing else a function does is visible outside.
+#
+# Pass a MemoCache to the Interpreter with memo=...: every engine looks up the calls to
+# pure functions in it before running them, and stores their results. A call that fails
+# stores nothing. Only the outermost call of a chain of tail calls is looked up and
+# stored. A call answered by the cache isn't traced nor profiled.
+from collections import OrderedDict
+
+from element import Element
+from intbase import InterpreterBase
+from type_value_ import Type
+
+PRIMITIVE_TYPES = {Type.INT, Type.BOOL, Type.STRING}
+IO_FUNCTIONS = {"print", "inputi", "inputs"}
+
+
+def memo_key(func_name, args):
+    """Cache key of a call, args being the evaluated arguments"""
+    # the class of a payload tells a bool apart from an int: `int && int` gives a bool
+    # holding an int, and 1 == True
+    return (
+        func_name,
+        len(args),
+        tuple([(arg.value().__class__, arg.value()) for arg in args]),
+    )
+
+
+class PurityAnalyzer:
+    def __init__(self, func_name_to_ast):
+        self.functions = func_name_to_ast
+
+    def pure_functions(self):
+        """Returns the set of the definitions of the pure functions"""
+        callees = {}  # (name, number of arguments) -> the functions it calls
+        for key, func_def in self.functions.items():
+            called = set()
+            if self.__has_primitive_signature(func_def) and self.__collect_calls(
+                func_def.statements, called
+            ):
+                callees[key] = called
+
+        # a function calling a function that isn't pure isn't pure either
+        pure = set(callees)
+        changed = True
+        while changed:
+            changed = False
+            for key in list(pure):
+                if not callees[key] <= pure:
+                    pure.discard(key)
+                    changed = True
+        return {self.functions[key] for key in pure}
+
+    def __has_primitive_signature(self, func_def):
+        return func_def.return_type in PRIMITIVE_TYPES and all(
+            arg.var_type in PRIMITIVE_TYPES for arg in func_def.args
+        )
+
+    def __collect_calls(self, node, called):
+        """Add the functions called under node to called, returns False if it does
+        I/O"""
+        if isinstance(node, list):
+            return all(self.__collect_calls(item, called) for item in node)
+        if not isinstance(node, Element):
+            return True
+        if node.elem_type == InterpreterBase.FCALL_NODE:
+            if node.name in IO_FUNCTIONS:
+                return False
+            # an unknown function fails when called, and isn't pure
+            called.add((node.name, len(node.args)))
+        return all(
+            self.__collect_calls(getattr(node, key), called) for key in node._fields
+        )
+
+
+class MemoCache:
+    """Bounded LRU of the results of calls to pure functions, with hit and miss
+    counts"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # memo_key() -> Value
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Cached result of a call, None if it isn't cached"""
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, the statistics are kept"""
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+        }
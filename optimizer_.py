@@ -0,0 +1,264 @@
+# The Optimizer rewrites a parsed program before it runs:
+#   - constant subexpressions are folded into a single constant, computing them with the
+#     interpreter's own operator lambdas so int to bool coercion, floor division and the
+#     other quirks of the runtime are kept. An operation that would fail at runtime is
+#     left as it is, so it still fails when (and if) it runs.
+#   - an if statement with a constant condition is replaced by the branch that runs. The
+#     branch's statements are spliced into the enclosing block, unless the branch
+#     declares variables and needs a block scope of its own.
+#   - a for loop whose condition is constantly false is replaced by its initialization.
+#   - the statements following an unconditional return or raise in a block are removed.
+#
+# The original tree is left untouched: optimize() returns a new Program sharing the
+# unchanged subtrees, with the positions of the new nodes copied from the nodes they
+# replace.
+from element import Element, Program
+from intbase import InterpreterBase
+from type_value_ import Type, NIL, bool_value, int_value, string_value
+
+CONSTANT_NODES = {
+    InterpreterBase.INT_NODE,
+    InterpreterBase.STRING_NODE,
+    InterpreterBase.BOOL_NODE,
+    InterpreterBase.NIL_NODE,
+}
+
+
+class Optimizer:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.op_to_lambda = interpreter.op_to_lambda
+        self.positions = {}
+
+    def optimize(self, ast: Program) -> Program:
+        self.positions = dict(ast.positions)
+        functions = [
+            self.__replace(
+                func_def, statements=self.__optimize_block(func_def.statements)
+            )
+            for func_def in ast.functions
+        ]
+        program = Element(ast.elem_type, structs=ast.structs, functions=functions)
+        program.positions = self.positions
+        return program
+
+    def __replace(self, node, **changes):
+        """Copy of node with some children replaced, or node itself if none changed"""
+        if all(getattr(node, key) is value for key, value in changes.items()):
+            return node
+        new_node = Element(node.elem_type, **{**node.dict, **changes})
+        if node in self.positions:
+            self.positions[new_node] = self.positions[node]
+        return new_node
+
+    def __constant_node(self, value, like):
+        """Constant node holding a Value, None if the Value has no literal form"""
+        if value.type() == Type.INT and type(value.value()) is int:
+            elem_type = InterpreterBase.INT_NODE
+        elif value.type() == Type.STRING:
+            elem_type = InterpreterBase.STRING_NODE
+        elif value.type() == Type.BOOL and type(value.value()) is bool:
+            elem_type = InterpreterBase.BOOL_NODE
+        else:
+            # e.g. int && int, a bool holding an int
+            return None
+        node = Element(elem_type, val=value.value())
+        if like in self.positions:
+            self.positions[node] = self.positions[like]
+        return node
+
+    # statements
+
+    def __optimize_block(self, statements):
+        optimized = []
+        for statement in statements:
+            optimized += self.__optimize_statement(statement)
+            if optimized and self.__always_returns(optimized[-1]):
+                # the rest of the block never runs
+                break
+        return optimized
+
+    def __always_returns(self, statement):
+        """Whether control never goes past a statement, returning or raising"""
+        if statement.elem_type in (
+            InterpreterBase.RETURN_NODE,
+            InterpreterBase.RAISE_NODE,
+        ):
+            return True
+        if statement.elem_type == InterpreterBase.IF_NODE:
+            return self.__block_returns(statement.statements) and self.__block_returns(
+                statement.else_statements or []
+            )
+        return False
+
+    def __block_returns(self, statements):
+        return any(self.__always_returns(statement) for statement in statements)
+
+    def __optimize_statement(self, statement):
+        """Returns the list of statements replacing statement"""
+        elem_type = statement.elem_type
+        if elem_type == InterpreterBase.FCALL_NODE:
+            return [self.__optimize_expr(statement)]
+        if elem_type == "=":
+            return [self.__optimize_assign(statement)]
+        if elem_type == InterpreterBase.RETURN_NODE:
+            return [
+                self.__replace(
+                    statement, expression=self.__optimize_expr(statement.expression)
+                )
+            ]
+        if elem_type == InterpreterBase.IF_NODE:
+            return self.__optimize_if(statement)
+        if elem_type == InterpreterBase.FOR_NODE:
+            return self.__optimize_for(statement)
+        if elem_type == InterpreterBase.TRY_NODE:
+            return [self.__optimize_try(statement)]
+        if elem_type == InterpreterBase.RAISE_NODE:
+            return [
+                self.__replace(
+                    statement,
+                    exception_type=self.__optimize_expr(statement.exception_type),
+                )
+            ]
+        return [statement]
+
+    def __optimize_assign(self, assign_ast):
+        return self.__replace(
+            assign_ast, expression=self.__optimize_expr(assign_ast.expression)
+        )
+
+    def __optimize_if(self, if_ast):
+        condition = self.__optimize_expr(if_ast.condition)
+        truth = self.__constant_truth(condition)
+        if truth is None:
+            return [
+                self.__replace(
+                    if_ast,
+                    condition=condition,
+                    statements=self.__optimize_block(if_ast.statements),
+                    else_statements=(
+                        self.__optimize_block(if_ast.else_statements)
+                        if if_ast.else_statements
+                        else if_ast.else_statements
+                    ),
+                )
+            ]
+
+        branch = self.__optimize_block(
+            if_ast.statements if truth else if_ast.else_statements or []
+        )
+        if not any(
+            statement.elem_type == InterpreterBase.VAR_DEF_NODE for statement in branch
+        ):
+            return branch
+        # the branch's variables must stay in a block scope of their own
+        always = self.__constant_node(bool_value(True), if_ast.condition)
+        return [
+            self.__replace(
+                if_ast, condition=always, statements=branch, else_statements=None
+            )
+        ]
+
+    def __optimize_for(self, for_ast):
+        init = self.__optimize_assign(for_ast.init)
+        condition = self.__optimize_expr(for_ast.condition)
+        if self.__constant_truth(condition) is False:
+            # an assignment doesn't declare anything, it can run outside the loop scope
+            return [init]
+        return [
+            self.__replace(
+                for_ast,
+                init=init,
+                condition=condition,
+                update=self.__optimize_assign(for_ast.update),
+                statements=self.__optimize_block(for_ast.statements),
+            )
+        ]
+
+    def __optimize_try(self, try_ast):
+        catchers = [
+            self.__replace(
+                catch_ast, statements=self.__optimize_block(catch_ast.statements)
+            )
+            for catch_ast in try_ast.catchers
+        ]
+        if all(new is old for new, old in zip(catchers, try_ast.catchers)):
+            catchers = try_ast.catchers
+        return self.__replace(
+            try_ast,
+            statements=self.__optimize_block(try_ast.statements),
+            catchers=catchers,
+        )
+
+    def __constant_truth(self, condition):
+        """Truth value of a constant condition, None if it's not a constant bool"""
+        if condition.elem_type == InterpreterBase.BOOL_NODE:
+            return condition.val
+        if condition.elem_type == InterpreterBase.INT_NODE:
+            # the condition is coerced to a bool
+            return condition.val != 0
+        return None
+
+    # expressions
+
+    def __optimize_expr(self, expr_ast):
+        if expr_ast is None:
+            return None
+        elem_type = expr_ast.elem_type
+        if elem_type == InterpreterBase.FCALL_NODE:
+            args = [self.__optimize_expr(arg) for arg in expr_ast.args]
+            if all(new is old for new, old in zip(args, expr_ast.args)):
+                return expr_ast
+            return self.__replace(expr_ast, args=args)
+        if elem_type in self.interpreter.UNARY_OPS:
+            op1 = self.__optimize_expr(expr_ast.op1)
+            if op1.elem_type in CONSTANT_NODES:
+                folded = self.__fold_unary(expr_ast, self.__constant_value(op1))
+                if folded is not None:
+                    return folded
+            return self.__replace(expr_ast, op1=op1)
+        if elem_type in self.interpreter.BIN_OPS:
+            op1 = self.__optimize_expr(expr_ast.op1)
+            op2 = self.__optimize_expr(expr_ast.op2)
+            if op1.elem_type in CONSTANT_NODES and op2.elem_type in CONSTANT_NODES:
+                folded = self.__fold_binary(
+                    expr_ast, self.__constant_value(op1), self.__constant_value(op2)
+                )
+                if folded is not None:
+                    return folded
+            return self.__replace(expr_ast, op1=op1, op2=op2)
+        return expr_ast
+
+    def __constant_value(self, node):
+        if node.elem_type == InterpreterBase.INT_NODE:
+            return int_value(node.val)
+        if node.elem_type == InterpreterBase.STRING_NODE:
+            return string_value(node.val)
+        if node.elem_type == InterpreterBase.BOOL_NODE:
+            return bool_value(node.val)
+        return NIL
+
+    def __fold_unary(self, arith_ast, value_obj):
+        f = self.op_to_lambda[value_obj.type()].get(arith_ast.elem_type)
+        if f is None:
+            return None
+        return self.__constant_node(f(value_obj), arith_ast)
+
+    def __fold_binary(self, arith_ast, left_value_obj, right_value_obj):
+        """Mirrors Interpreter.__eval_op for constant operands"""
+        left_type = left_value_obj.type()
+        right_type = right_value_obj.type()
+        if left_type == Type.BOOL and right_type == Type.INT:
+            right_value_obj = bool_value(right_value_obj.value() != 0)
+        elif right_type == Type.BOOL and left_type == Type.INT:
+            left_value_obj = bool_value(left_value_obj.value() != 0)
+        if left_value_obj.type() != right_value_obj.type():
+            return None
+        f = self.op_to_lambda[left_value_obj.type()].get(arith_ast.elem_type)
+        if f is None:
+            return None
+        try:
+            result = f(left_value_obj, right_value_obj)
+        except ZeroDivisionError:
+            return None
+        return self.__constant_node(result, arith_ast)
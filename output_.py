@@ -0,0 +1,107 @@
+# Output sinks receive the lines printed by a Brewin program as print() runs, instead of
+# the Interpreter collecting all of them until main returns. Pass one to the Interpreter
+# with output_sink=...; without a sink the Interpreter keeps its original behavior and
+# only forwards the output of programs that complete without an error.
+import sys
+from abc import ABC, abstractmethod
+from collections import deque
+
+
+class OutputSink(ABC):
+    """Base class of the output sinks, write() is called once per printed line"""
+
+    @abstractmethod
+    def write(self, line: str):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StdoutSink(OutputSink):
+    """Writes lines to stdout (or another text stream), buffer_lines at a time"""
+
+    def __init__(self, stream=None, buffer_lines=1024):
+        self.stream = stream if stream is not None else sys.stdout
+        self.buffer_lines = buffer_lines
+        self.buffer = []
+
+    def write(self, line: str):
+        self.buffer.append(line)
+        if len(self.buffer) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.buffer.append("")  # for the trailing newline
+            self.stream.write("\n".join(self.buffer))
+            self.buffer = []
+        self.stream.flush()
+
+
+class ListSink(OutputSink):
+    """Keeps every line in memory, in self.lines"""
+
+    def __init__(self):
+        self.lines = []
+        self.write = self.lines.append  # saves a call per line
+
+    def write(self, line: str):
+        self.lines.append(line)
+
+
+class FileSink(OutputSink):
+    """Writes lines to a file, given either as a path or as an open text file. A file
+    opened from a path is closed by close()"""
+
+    def __init__(self, file, encoding="utf-8"):
+        if isinstance(file, (str, bytes)) or hasattr(file, "__fspath__"):
+            self.file = open(file, "w", encoding=encoding)
+            self.owns_file = True
+        else:
+            self.file = file
+            self.owns_file = False
+
+    def write(self, line: str):
+        self.file.write(line)
+        self.file.write("\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self.owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class CallbackSink(OutputSink):
+    """Calls callback(line) for every line"""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.write = callback  # saves a call per line
+
+    def write(self, line: str):
+        self.callback(line)
+
+
+class RingBufferSink(OutputSink):
+    """Keeps only the last max_lines lines, in self.lines"""
+
+    def __init__(self, max_lines=1000):
+        self.lines = deque(maxlen=max_lines)
+        self.write = self.lines.append  # saves a call per line
+
+    def write(self, line: str):
+        self.lines.append(line)
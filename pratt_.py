@@ -0,0 +1,476 @@
+# A hand-written parser for Brewin++, the faster alternative to the PLY parser of
+# brewparse.py for large programs. It builds the same Element tree, with the same
+# source positions, without the LALR engine's Python call and list per reduction:
+# statements are parsed by recursive descent and expressions by precedence climbing (a
+# Pratt parser), which costs one loop iteration per binary operator.
+#
+# The tokens are those of brewlex.py, matched by a single regular expression. The parser
+# stops at the first syntax error, raising a SyntaxError describing it, where the PLY
+# parser recovers and goes on, sometimes up to a tree without the statements in error.
+# parse_program hands such programs to the PLY parser.
+import re
+from bisect import bisect_left
+from itertools import accumulate, chain
+
+from brewlex import reserved_map
+from element import (
+    Program,
+    StructDef,
+    FieldDef,
+    FuncDef,
+    Arg,
+    Assign,
+    VarDef,
+    If,
+    For,
+    Try,
+    Catch,
+    Raise,
+    Return,
+    UnaryOp,
+    BinOp,
+    New,
+    Constant,
+    Nil,
+    VarRef,
+    FCall,
+)
+from intbase import InterpreterBase
+
+END = "$end"  # kind of the token after the last one
+
+# The spaces, tabs and newlines before a token, and the token. Its alternatives are the
+# rules of brewlex.py in the order PLY tries them: the functions in the order they are
+# defined, then the strings from the longest regular expression to the shortest. Like
+# t_DOT, the last one matches any other character. Newlines are only found between
+# tokens and in comments, so the line of a token is one more than the newlines before
+# it, as PLY counts them.
+_TOKEN_RE = re.compile(
+    r"([ \t\n]*)("
+    r"\d+"  # NUMBER
+    r"|[A-Za-z_][\w_]*"  # NAME
+    r"|/\*(?:.|\n)*?\*/"  # comment
+    r'|".*?"'  # STRING
+    r"|\|\||==|>=|<=|!=|&&"
+    r"|[^ \t\n]"
+    r")"
+)
+_NEWLINE_RE = re.compile("\n")
+
+# token -> kind, for the operators, DOT and the reserved words
+KINDS = {
+    "||": "OR",
+    "(": "LPAREN",
+    ")": "RPAREN",
+    "{": "LBRACE",
+    "}": "RBRACE",
+    "==": "EQ",
+    ">=": "GREATER_EQ",
+    "<=": "LESS_EQ",
+    "!=": "NOT_EQ",
+    "+": "PLUS",
+    "-": "MINUS",
+    "*": "MULTIPLY",
+    "&&": "AND",
+    ",": "COMMA",
+    ":": "COLON",
+    ";": "SEMI",
+    ">": "GREATER",
+    "<": "LESS",
+    "=": "ASSIGN",
+    "/": "DIVIDE",
+    "!": "NOT",
+    ".": "DOT",
+    **reserved_map,
+}
+
+# binary operator token -> precedence, the higher the tighter. They are all left
+# associative, and the unary operators bind tighter than any of them.
+PRECEDENCE = {
+    "OR": 1,
+    "AND": 2,
+    "EQ": 3,
+    "NOT_EQ": 3,
+    "GREATER": 3,
+    "GREATER_EQ": 3,
+    "LESS": 3,
+    "LESS_EQ": 3,
+    "PLUS": 4,
+    "MINUS": 4,
+    "MULTIPLY": 5,
+    "DIVIDE": 5,
+}
+
+# tokens starting an expression statement, besides NAME
+EXPRESSION_STARTS = {
+    "NOT",
+    "MINUS",
+    "NEW",
+    "LPAREN",
+    "NUMBER",
+    "TRUE",
+    "FALSE",
+    "NIL",
+    "STRING",
+}
+
+
+def _kind(token):
+    """Kind of a token that isn't in KINDS"""
+    first = token[0]
+    if first == '"':
+        return "STRING" if len(token) > 1 else "DOT"
+    if first.isdecimal():
+        return "NUMBER"
+    if first == "_" or first.isascii() and first.isalpha():
+        return "NAME"
+    return "DOT"
+
+
+def tokenize(program):
+    """Kinds, texts and offsets of the tokens of a program, ending with END"""
+    # spaces at the end would make findall() try every one of them as a start
+    matches = _TOKEN_RE.findall(program.rstrip(" \t\n"))
+    # offsets of the ends of the spaces and of the tokens, in turn
+    ends = list(accumulate(map(len, chain.from_iterable(matches))))
+    texts = [text for _, text in matches]
+    starts = ends[::2]
+    if "/*" in program:
+        tokens = [i for i, text in enumerate(texts) if not text.startswith("/*")]
+        texts = [texts[i] for i in tokens]
+        starts = [starts[i] for i in tokens]
+    kinds = [KINDS.get(text) or _kind(text) for text in texts]
+    kinds.append(END)
+    texts.append("")
+    starts.append(len(program))
+    return kinds, texts, starts
+
+
+class PrattParser:
+    """Parses a program into the tree the PLY parser builds. A PrattParser parses one
+    program at a time, and creating one costs nothing."""
+
+    def parse(self, program):
+        self.kinds, self.texts, self.starts = tokenize(program)
+        self.pos = 0  # index of the next token
+        self.newlines = [match.start() for match in _NEWLINE_RE.finditer(program)]
+        # (line, column) of every node built while parsing, like Parser.parse
+        self.positions = {}
+        ast = self.__program()
+        ast.positions = self.positions
+        return ast
+
+    def __error(self):
+        """Raise a syntax error at the next token, in the words of brewparse.p_error"""
+        pos = self.pos
+        kind = self.kinds[pos]
+        if kind == END:
+            raise SyntaxError("Syntax error at EOF")
+        value = self.texts[pos]
+        if kind == "NUMBER":
+            value = int(value)
+        elif kind == "STRING":
+            value = value[1:-1]
+        line = self.__position(pos)[0]
+        raise SyntaxError(f"Syntax error at '{value}' on line {line}")
+
+    def __expect(self, kind):
+        """Consume the next token, which must be of that kind, and return it"""
+        pos = self.pos
+        if self.kinds[pos] != kind:
+            self.__error()
+        self.pos = pos + 1
+        return self.texts[pos]
+
+    def __position(self, pos):
+        """(line, column) of the token at pos, counted like brewparse._position"""
+        start = self.starts[pos]
+        newlines = bisect_left(self.newlines, start)  # before the token
+        return newlines + 1, start - (self.newlines[newlines - 1] if newlines else -1)
+
+    def __at(self, node, pos):
+        """Record the position of the token at pos as the position of node"""
+        self.positions[node] = self.__position(pos)
+        return node
+
+    def __program(self):
+        kinds = self.kinds
+        structs = []
+        while kinds[self.pos] == "STRUCT":
+            structs.append(self.__struct())
+        functions = [self.__func()]
+        while kinds[self.pos] == "FUNC":
+            functions.append(self.__func())
+        if kinds[self.pos] != END:
+            self.__error()
+        program = Program(
+            InterpreterBase.PROGRAM_NODE, structs=structs, functions=functions
+        )
+        return self.__at(program, 0)
+
+    def __struct(self):
+        start = self.pos
+        self.pos += 1
+        name = self.__expect("NAME")
+        self.__expect("LBRACE")
+        fields = [self.__field()]
+        while self.kinds[self.pos] == "NAME":
+            fields.append(self.__field())
+        self.__expect("RBRACE")
+        struct = StructDef(InterpreterBase.STRUCT_NODE, name=name, fields=fields)
+        return self.__at(struct, start)
+
+    def __field(self):
+        start = self.pos
+        name = self.__expect("NAME")
+        self.__expect("COLON")
+        var_type = self.__expect("NAME")
+        self.__expect("SEMI")
+        field = FieldDef(InterpreterBase.FIELD_DEF_NODE, name=name, var_type=var_type)
+        return self.__at(field, start)
+
+    def __func(self):
+        start = self.pos
+        self.__expect("FUNC")
+        name = self.__expect("NAME")
+        self.__expect("LPAREN")
+        args = []
+        if self.kinds[self.pos] != "RPAREN":
+            args.append(self.__formal_arg())
+            while self.kinds[self.pos] == "COMMA":
+                self.pos += 1
+                args.append(self.__formal_arg())
+        self.__expect("RPAREN")
+        return_type = None
+        if self.kinds[self.pos] == "COLON":
+            self.pos += 1
+            return_type = self.__expect("NAME")
+        self.__expect("LBRACE")
+        func = FuncDef(
+            InterpreterBase.FUNC_NODE,
+            name=name,
+            args=args,
+            return_type=return_type,
+            statements=self.__block(),
+        )
+        return self.__at(func, start)
+
+    def __formal_arg(self):
+        start = self.pos
+        name = self.__expect("NAME")
+        var_type = None
+        if self.kinds[self.pos] == "COLON":
+            self.pos += 1
+            var_type = self.__expect("NAME")
+        arg = Arg(InterpreterBase.ARG_NODE, name=name, var_type=var_type)
+        return self.__at(arg, start)
+
+    def __block(self):
+        """The statements up to the closing brace, at least one"""
+        statements = [self.__statement()]
+        kinds = self.kinds
+        while kinds[self.pos] != "RBRACE":
+            statements.append(self.__statement())
+        self.pos += 1
+        return statements
+
+    def __statement(self):
+        start = self.pos
+        kind = self.kinds[start]
+        # the statements ending with a block
+        if kind == "IF":
+            return self.__if()
+        if kind == "FOR":
+            return self.__for()
+        if kind == "TRY":
+            return self.__try()
+        # the statements ending with a semicolon
+        if kind == "NAME":
+            if self.kinds[start + 1] == "LPAREN":
+                statement = self.__expression()
+            else:
+                name = self.__variable()
+                if self.kinds[self.pos] == "ASSIGN":
+                    self.pos += 1
+                    assign = Assign("=", name=name, expression=self.__expression())
+                    statement = self.__at(assign, start)
+                else:
+                    var = self.__at(VarRef(InterpreterBase.VAR_NODE, name=name), start)
+                    statement = self.__operators(var, start, 1)
+        elif kind in EXPRESSION_STARTS:
+            statement = self.__expression()
+        elif kind == "RETURN":
+            self.pos += 1
+            expression = None
+            if self.kinds[self.pos] != "SEMI":
+                expression = self.__expression()
+            return_ast = Return(InterpreterBase.RETURN_NODE, expression=expression)
+            statement = self.__at(return_ast, start)
+        elif kind == "VAR":
+            self.pos += 1
+            name = self.__expect("NAME")
+            var_type = None
+            if self.kinds[self.pos] == "COLON":
+                self.pos += 1
+                var_type = self.__expect("NAME")
+            var_def = VarDef(InterpreterBase.VAR_DEF_NODE, name=name, var_type=var_type)
+            statement = self.__at(var_def, start)
+        elif kind == "RAISE":
+            self.pos += 1
+            raise_ast = Raise(
+                InterpreterBase.RAISE_NODE, exception_type=self.__expression()
+            )
+            statement = self.__at(raise_ast, start)
+        else:
+            self.__error()
+        self.__expect("SEMI")
+        return statement
+
+    def __if(self):
+        start = self.pos
+        self.pos += 1
+        self.__expect("LPAREN")
+        condition = self.__expression()
+        self.__expect("RPAREN")
+        self.__expect("LBRACE")
+        statements = self.__block()
+        else_statements = None
+        if self.kinds[self.pos] == "ELSE":
+            self.pos += 1
+            self.__expect("LBRACE")
+            else_statements = self.__block()
+        if_ast = If(
+            InterpreterBase.IF_NODE,
+            condition=condition,
+            statements=statements,
+            else_statements=else_statements,
+        )
+        return self.__at(if_ast, start)
+
+    def __for(self):
+        start = self.pos
+        self.pos += 1
+        self.__expect("LPAREN")
+        init = self.__assign()
+        self.__expect("SEMI")
+        condition = self.__expression()
+        self.__expect("SEMI")
+        update = self.__assign()
+        self.__expect("RPAREN")
+        self.__expect("LBRACE")
+        for_ast = For(
+            InterpreterBase.FOR_NODE,
+            init=init,
+            condition=condition,
+            update=update,
+            statements=self.__block(),
+        )
+        return self.__at(for_ast, start)
+
+    def __try(self):
+        start = self.pos
+        self.pos += 1
+        self.__expect("LBRACE")
+        statements = self.__block()
+        catchers = [self.__catch()]
+        while self.kinds[self.pos] == "CATCH":
+            catchers.append(self.__catch())
+        try_ast = Try(
+            InterpreterBase.TRY_NODE, statements=statements, catchers=catchers
+        )
+        return self.__at(try_ast, start)
+
+    def __catch(self):
+        start = self.pos
+        self.__expect("CATCH")
+        exception_type = self.__expect("STRING")[1:-1]
+        self.__expect("LBRACE")
+        catch_ast = Catch(
+            InterpreterBase.CATCH_NODE,
+            exception_type=exception_type,
+            statements=self.__block(),
+        )
+        return self.__at(catch_ast, start)
+
+    def __assign(self):
+        start = self.pos
+        name = self.__variable()
+        self.__expect("ASSIGN")
+        assign = Assign("=", name=name, expression=self.__expression())
+        return self.__at(assign, start)
+
+    def __variable(self):
+        """A variable name, with the dotted path of a field"""
+        name = self.__expect("NAME")
+        kinds = self.kinds
+        while kinds[self.pos] == "DOT":
+            self.pos += 1
+            name = name + "." + self.__expect("NAME")
+        return name
+
+    def __expression(self, min_precedence=1):
+        """An expression whose binary operators have at least that precedence"""
+        start = self.pos
+        return self.__operators(self.__unary(), start, min_precedence)
+
+    def __operators(self, left, start, min_precedence):
+        """left, the operand starting at the token at start, and the binary operators
+        of at least that precedence following it"""
+        kinds = self.kinds
+        while True:
+            pos = self.pos
+            precedence = PRECEDENCE.get(kinds[pos], 0)
+            if precedence < min_precedence:
+                return left
+            self.pos = pos + 1
+            right = self.__expression(precedence + 1)
+            left = BinOp(self.texts[pos], op1=left, op2=right)
+            # like every node, at the leftmost token of the rule, an opening
+            # parenthesis around the left operand included
+            self.positions[left] = self.__position(start)
+
+    def __unary(self):
+        """A unary operator and its operand, or an operand"""
+        start = self.pos
+        kind = self.kinds[start]
+        self.pos = start + 1
+        if kind == "NAME":
+            if self.kinds[start + 1] == "LPAREN":
+                self.pos += 1
+                args = []
+                if self.kinds[self.pos] != "RPAREN":
+                    args.append(self.__expression())
+                    while self.kinds[self.pos] == "COMMA":
+                        self.pos += 1
+                        args.append(self.__expression())
+                self.__expect("RPAREN")
+                node = FCall(
+                    InterpreterBase.FCALL_NODE, name=self.texts[start], args=args
+                )
+            else:
+                self.pos = start
+                node = VarRef(InterpreterBase.VAR_NODE, name=self.__variable())
+        elif kind == "NUMBER":
+            node = Constant(InterpreterBase.INT_NODE, val=int(self.texts[start]))
+        elif kind == "LPAREN":
+            node = self.__expression()
+            self.__expect("RPAREN")
+            return node
+        elif kind == "STRING":
+            node = Constant(InterpreterBase.STRING_NODE, val=self.texts[start][1:-1])
+        elif kind == "TRUE" or kind == "FALSE":
+            bool_val = self.texts[start] == InterpreterBase.TRUE_DEF
+            node = Constant(InterpreterBase.BOOL_NODE, val=bool_val)
+        elif kind == "MINUS":
+            node = UnaryOp(InterpreterBase.NEG_NODE, op1=self.__unary())
+        elif kind == "NOT":
+            node = UnaryOp(InterpreterBase.NOT_NODE, op1=self.__unary())
+        elif kind == "NIL":
+            node = Nil(InterpreterBase.NIL_NODE)
+        elif kind == "NEW":
+            node = New(InterpreterBase.NEW_NODE, var_type=self.__expect("NAME"))
+        else:
+            self.pos = start
+            self.__error()
+        self.positions[node] = self.__position(start)
+        return node
@@ -0,0 +1,149 @@
+# The Profiler counts how many times each AST node and each Brewin function runs and how
+# much wall time it takes, measured around every evaluation (no sampling). Pass one to
+# the Interpreter with profiler=...; the tree walker and the closure engine profile
+# statements, expressions and functions, the VM profiles functions only.
+#
+# Times are reported two ways: the total (inclusive) time of a node or function counts
+# everything that ran inside it, its self time excludes the time spent in the nodes
+# nested in it (for nodes) or in the functions it called (for functions). The total
+# time of a recursive function or node is only counted at its outermost activation.
+import time
+from collections import defaultdict
+
+
+class Stats:
+    __slots__ = ("count", "self_time", "total_time", "active")
+
+    def __init__(self):
+        self.count = 0
+        self.self_time = 0.0
+        self.total_time = 0.0
+        self.active = 0  # number of activations currently running
+
+
+class Profiler:
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.node_stats = {}  # AST node -> Stats
+        self.function_stats = {}  # function name -> Stats
+        self.positions = {}  # AST node -> (line, column) in the source
+        self.stacks = defaultdict(float)  # tuple of function names -> self time
+        self.node_stack = []  # [Stats, start time, time spent in nested nodes]
+        self.function_stack = []  # [Stats, start time, time spent in callees]
+        self.call_path = ()  # names of the running functions, outermost first
+
+    def add_positions(self, positions):
+        """Register the source positions of the nodes of a program about to run"""
+        self.positions.update(positions)
+
+    def enter_node(self, node):
+        stats = self.node_stats.get(node)
+        if stats is None:
+            stats = self.node_stats[node] = Stats()
+        stats.active += 1
+        self.node_stack.append([stats, self.clock(), 0.0])
+
+    def exit_node(self):
+        stats, start, nested = self.node_stack.pop()
+        elapsed = self.clock() - start
+        self.__account(stats, elapsed, nested)
+        if self.node_stack:
+            self.node_stack[-1][2] += elapsed
+
+    def enter_function(self, name):
+        stats = self.function_stats.get(name)
+        if stats is None:
+            stats = self.function_stats[name] = Stats()
+        stats.active += 1
+        self.call_path += (name,)
+        self.function_stack.append([stats, self.clock(), 0.0])
+
+    def exit_function(self):
+        stats, start, callees = self.function_stack.pop()
+        elapsed = self.clock() - start
+        self.__account(stats, elapsed, callees)
+        self.stacks[self.call_path] += elapsed - callees
+        self.call_path = self.call_path[:-1]
+        if self.function_stack:
+            self.function_stack[-1][2] += elapsed
+
+    def __account(self, stats, elapsed, nested):
+        stats.count += 1
+        stats.self_time += elapsed - nested
+        stats.active -= 1
+        if not stats.active:
+            stats.total_time += elapsed
+
+    def line_stats(self):
+        """Returns {line: (hits, self time)}, hits being the execution count of the
+        most executed node on the line"""
+        lines = {}
+        for node, stats in self.node_stats.items():
+            line = self.positions.get(node, (None,))[0]
+            hits, self_time = lines.get(line, (0, 0.0))
+            lines[line] = (max(hits, stats.count), self_time + stats.self_time)
+        return lines
+
+    def report(self, limit=20):
+        """Hot spots sorted by self time, as text"""
+        out = ["Functions", f"{'calls':>10} {'self ms':>10} {'total ms':>10}  function"]
+        functions = sorted(
+            self.function_stats.items(), key=lambda item: -item[1].self_time
+        )
+        for name, stats in functions[:limit]:
+            out.append(
+                f"{stats.count:10} {stats.self_time * 1000:10.3f} "
+                f"{stats.total_time * 1000:10.3f}  {name}"
+            )
+
+        out += ["", "Lines", f"{'hits':>10} {'self ms':>10}  line"]
+        lines = sorted(self.line_stats().items(), key=lambda item: -item[1][1])
+        for line, (hits, self_time) in lines[:limit]:
+            out.append(f"{hits:10} {self_time * 1000:10.3f}  {_format_line(line)}")
+
+        out += [
+            "",
+            "Nodes",
+            f"{'count':>10} {'self ms':>10} {'total ms':>10}  {'position':>8}  node",
+        ]
+        nodes = sorted(self.node_stats.items(), key=lambda item: -item[1].self_time)
+        for node, stats in nodes[:limit]:
+            out.append(
+                f"{stats.count:10} {stats.self_time * 1000:10.3f} "
+                f"{stats.total_time * 1000:10.3f}  "
+                f"{_format_position(self.positions.get(node)):>8}  {_describe(node)}"
+            )
+        return "\n".join(out)
+
+    def collapsed_stacks(self):
+        """Self time per call stack in the collapsed format of flame graph tools, one
+        "main;f;g <microseconds>" line per stack"""
+        return [
+            f"{';'.join(path)} {round(self_time * 1_000_000)}"
+            for path, self_time in sorted(self.stacks.items())
+        ]
+
+    def write_collapsed(self, file):
+        """Write the collapsed stacks to a path or to an open text file"""
+        if isinstance(file, str):
+            with open(file, "w", encoding="utf-8") as f:
+                self.write_collapsed(f)
+            return
+        for line in self.collapsed_stacks():
+            file.write(line + "\n")
+
+
+def _format_line(line):
+    return "?" if line is None else str(line)
+
+
+def _format_position(position):
+    return "?" if position is None else f"{position[0]}:{position[1]}"
+
+
+def _describe(node):
+    """Short description of a node, without its children"""
+    for key in ("name", "val", "var_type"):
+        if key in node._fields:
+            return f"{node.elem_type} {getattr(node, key)}"
+    return node.elem_type
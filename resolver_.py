@@ -0,0 +1,142 @@
+# The Resolver statically binds every variable reference in a Brewin++ function to the
+# declaration it refers to at runtime. Each argument and vardef gets a (depth, slot)
+# binding: depth is the block nesting level of the declaration (0 for the function's
+# arguments) and slot is its index in the function's frame, a flat list of Values.
+#
+# Blocks run their statements in textual order and a block's variables only become
+# visible once their vardef has executed, so walking the statements in order gives the
+# same answer as the runtime lookup through variable_scope_stack. Slots are reused by
+# sibling blocks, so the frame is only as large as the deepest set of live variables.
+from element import Element
+from intbase import InterpreterBase
+
+
+class FunctionLayout:
+    """Result of resolving one function"""
+
+    def __init__(self):
+        self.frame_size = 0
+        # slot of each argument, None for a duplicate argument name
+        self.arg_slots = []
+        # id(node) -> (depth, slot), or None when the name can't be resolved or a
+        # vardef is a duplicate definition in its block. The slot of a void vardef is
+        # None.
+        self.bindings = {}
+
+    def binding(self, node):
+        return self.bindings.get(id(node))
+
+
+class _BlockScope:
+    def __init__(self, depth, first_slot):
+        self.depth = depth
+        self.first_slot = first_slot
+        self.declared = set()  # every name declared in this block
+        self.visible = {}  # name -> (depth, slot) for names that shadow outer scopes
+
+
+class Resolver:
+    def resolve_function(self, func_def: Element) -> FunctionLayout:
+        self.layout = FunctionLayout()
+        self.scopes = []
+        self.next_slot = 0
+
+        # the arguments live in the function scope
+        scope = self.__push_scope()
+        for arg in func_def.get("args"):
+            name = arg.get("name")
+            if name in scope.declared:
+                self.layout.arg_slots.append(None)
+                continue
+            self.layout.arg_slots.append(self.__declare(scope, name))
+
+        self.__resolve_block(func_def.get("statements"))
+        self.__pop_scope()
+        return self.layout
+
+    def __push_scope(self):
+        scope = _BlockScope(len(self.scopes), self.next_slot)
+        self.scopes.append(scope)
+        return scope
+
+    def __pop_scope(self):
+        scope = self.scopes.pop()
+        # slots of a finished block can be reused by its siblings
+        self.next_slot = scope.first_slot
+
+    def __declare(self, scope, name, visible=True):
+        scope.declared.add(name)
+        if not visible:
+            return None
+        slot = self.next_slot
+        self.next_slot += 1
+        self.layout.frame_size = max(self.layout.frame_size, self.next_slot)
+        scope.visible[name] = (scope.depth, slot)
+        return slot
+
+    def __lookup(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope.visible:
+                return scope.visible[name]
+        return None
+
+    def __resolve_block(self, statements):
+        self.__push_scope()
+        for statement in statements:
+            self.__resolve_statement(statement)
+        self.__pop_scope()
+
+    def __resolve_statement(self, statement):
+        elem_type = statement.elem_type
+        if elem_type == InterpreterBase.VAR_DEF_NODE:
+            scope = self.scopes[-1]
+            name = statement.get("name")
+            if name in scope.declared:
+                self.layout.bindings[id(statement)] = None
+                return
+            # a void variable holds no Value, so lookups skip over it to outer scopes
+            visible = statement.get("var_type") != InterpreterBase.VOID_DEF
+            slot = self.__declare(scope, name, visible)
+            self.layout.bindings[id(statement)] = (scope.depth, slot)
+        elif elem_type == "=":
+            self.__resolve_assign(statement)
+        elif elem_type == InterpreterBase.IF_NODE:
+            self.__resolve_expr(statement.get("condition"))
+            self.__resolve_block(statement.get("statements"))
+            self.__resolve_block(statement.get("else_statements") or [])
+        elif elem_type == InterpreterBase.FOR_NODE:
+            self.__push_scope()
+            self.__resolve_assign(statement.get("init"))
+            self.__resolve_expr(statement.get("condition"))
+            self.__resolve_block(statement.get("statements"))
+            self.__resolve_block([statement.get("update")])
+            self.__pop_scope()
+        elif elem_type == InterpreterBase.RETURN_NODE:
+            self.__resolve_expr(statement.get("expression"))
+        elif elem_type == InterpreterBase.FCALL_NODE:
+            self.__resolve_expr(statement)
+        elif elem_type == InterpreterBase.TRY_NODE:
+            self.__resolve_block(statement.get("statements"))
+            for catch_ast in statement.get("catchers"):
+                self.__resolve_block(catch_ast.get("statements"))
+        elif elem_type == InterpreterBase.RAISE_NODE:
+            self.__resolve_expr(statement.get("exception_type"))
+
+    def __resolve_assign(self, assign_ast):
+        self.__resolve_expr(assign_ast.get("expression"))
+        var_name = assign_ast.get("name").split(".", 1)[0]
+        self.layout.bindings[id(assign_ast)] = self.__lookup(var_name)
+
+    def __resolve_expr(self, expr_ast):
+        if expr_ast is None:
+            return
+        elem_type = expr_ast.elem_type
+        if elem_type == InterpreterBase.VAR_NODE:
+            var_name = expr_ast.get("name").split(".", 1)[0]
+            self.layout.bindings[id(expr_ast)] = self.__lookup(var_name)
+        elif elem_type == InterpreterBase.FCALL_NODE:
+            for arg in expr_ast.get("args"):
+                self.__resolve_expr(arg)
+        else:
+            self.__resolve_expr(expr_ast.get("op1"))
+            self.__resolve_expr(expr_ast.get("op2"))
@@ -1,25 +1,63 @@
 from type_value_ import Value
 
 
+class StructLayout:
+    """Field layout of a struct type, computed once and shared by all its instances"""
+
+    __slots__ = ("name", "index", "field_types", "defaults", "nil_value")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.index = {}  # field name -> slot index
+        self.field_types = []  # slot index -> field type
+        self.defaults = []  # slot index -> default Value of the field
+        self.nil_value = Value(name, None)  # default value of a variable of this type
+
+    def add_field(self, field_name: str, field_type: str, default_value: Value):
+        # a field defined twice keeps its first slot and takes the last type
+        if field_name in self.index:
+            slot = self.index[field_name]
+            self.field_types[slot] = field_type
+            self.defaults[slot] = default_value
+            return
+        self.index[field_name] = len(self.field_types)
+        self.field_types.append(field_type)
+        self.defaults.append(default_value)
+
+    def field_type(self, field_name: str):
+        return self.field_types[self.index[field_name]]
+
+    def __contains__(self, field_name):
+        return field_name in self.index
+
+
 class Struct:
-    def __init__(self, field_types: dict[str], get_default_value):
-        self.fields = {}
-        for field_name, field_type in field_types.items():
-            self.fields[field_name] = get_default_value(field_type)
+    """A struct instance, its field values are stored in slot order of its layout"""
+
+    __slots__ = ("layout", "values")
+
+    def __init__(self, layout: StructLayout):
+        self.layout = layout
+        # default values are immutable, so the instances can share them
+        self.values = layout.defaults.copy()
 
     def set_field(self, field_name: str, value: Value):
-        if field_name not in self.fields:
+        if field_name not in self.layout.index:
             raise Exception(f"Field {field_name} does not exist in struct")
 
-        self.fields[field_name] = value
+        self.values[self.layout.index[field_name]] = value
 
     def get_field(self, field_name: str):
-        if field_name not in self.fields:
+        if field_name not in self.layout.index:
             raise AttributeError(
-                f"Field {field_name} does not exist in struct {self.name}"
+                f"Field {field_name} does not exist in struct {self.layout.name}"
             )
 
-        return self.fields[field_name]
+        return self.values[self.layout.index[field_name]]
 
     def field_exists(self, field_name: str):
-        return field_name in self.fields
+        return field_name in self.layout.index
+
+    @property
+    def fields(self):
+        return dict(zip(self.layout.index, self.values))
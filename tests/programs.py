@@ -0,0 +1,51 @@
+# Runs .br test programs laid out like the autograder's (fall-24-autograder/v3/tests
+# and v3/fails) and checks them against their *OUT* section, as tester.py does. The
+# *OUT* section of a program in fails/ ends with the type of the error it fails with.
+# Programs that need an evaluation mode, or a feature the autograder's own v3
+# interpreter lacks, are kept in a directory of their own with the same layout, like
+# v3/lazy/tests, which tester.py doesn't run.
+import glob
+import os
+
+from batch_ import extract_test_data
+from interpreter_ import Interpreter
+
+V3 = os.path.join(os.path.dirname(__file__), os.pardir, "fall-24-autograder", "v3")
+LAZY = os.path.join(V3, "lazy")
+SHORT_CIRCUIT = os.path.join(V3, "short_circuit")
+RECURSION = os.path.join(V3, "recursion")
+EXCEPTIONS = os.path.join(V3, "exceptions")
+ENGINES = sorted(Interpreter.ENGINES)
+
+
+def programs(prefix="", directory=V3):
+    """Paths of the programs in tests/ and fails/ whose name starts with prefix"""
+    return sorted(
+        glob.glob(os.path.join(directory, "tests", prefix + "*.br"))
+        + glob.glob(os.path.join(directory, "fails", prefix + "*.br"))
+    )
+
+
+def run(program, stdin=(), **options):
+    """Output of a program, followed by the error type if it fails"""
+    interpreter = Interpreter(False, list(stdin), False, **options)
+    try:
+        interpreter.run(program)
+    except Exception:  # pylint: disable=broad-except
+        error_type, _ = interpreter.get_error_type_and_line()
+        if error_type is None:
+            raise  # not a Brewin error
+        return interpreter.get_output() + [str(error_type)]
+    return interpreter.get_output()
+
+
+def run_program(path, **options):
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    return run("".join(lines), extract_test_data(lines, "IN"), **options)
+
+
+def check_program(path, **options):
+    with open(path, encoding="utf-8") as f:
+        expected = extract_test_data(f.readlines(), "OUT")
+    assert run_program(path, **options) == expected
@@ -0,0 +1,109 @@
+import marshal
+import os
+
+import pytest
+
+import ast_cache_
+from ast_cache_ import ASTCache, cache_key, serialize
+
+PROGRAM = """
+func main(): void {
+  var x: int;
+  x = 3 + 4;
+  print(x);
+}
+"""
+
+OTHER = """
+func main(): void {
+  print("other");
+}
+"""
+
+
+def disk_path(cache_dir, program):
+    return os.path.join(cache_dir, cache_key(program) + ".ast")
+
+
+def test_memory_hits_and_misses():
+    cache = ASTCache()
+    first = cache.parse(PROGRAM)
+    second = cache.parse(PROGRAM)
+    assert serialize(first) == serialize(second)
+    assert first is not second  # every hit rebuilds the tree
+    assert cache.stats() == {
+        "hits": 1,
+        "disk_hits": 0,
+        "misses": 1,
+        "evictions": 0,
+        "entries": 1,
+        "memory_bytes": len(serialize(first)),
+    }
+
+
+def test_disk_hits(tmp_path):
+    ASTCache(cache_dir=tmp_path).parse(PROGRAM)
+    cache = ASTCache(cache_dir=tmp_path)
+    cache.parse(PROGRAM)
+    cache.parse(PROGRAM)
+    stats = cache.stats()
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 0)
+    assert stats["entries"] == 1
+
+
+def test_eviction_at_capacity():
+    size = len(serialize(ast_cache_.parse_program(PROGRAM)))
+    cache = ASTCache(max_memory_bytes=size)
+    cache.parse(PROGRAM)
+    cache.parse(OTHER)
+    cache.parse(PROGRAM)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (0, 3, 2)
+    assert stats["entries"] == 1
+    assert stats["memory_bytes"] == size
+
+
+def test_too_large_entry_is_not_kept():
+    cache = ASTCache(max_memory_bytes=1)
+    cache.parse(PROGRAM)
+    cache.parse(PROGRAM)
+    stats = cache.stats()
+    assert (stats["misses"], stats["entries"], stats["memory_bytes"]) == (2, 0, 0)
+
+
+@pytest.mark.parametrize(
+    "corrupt",
+    [
+        lambda data: data[: len(data) // 2],
+        lambda data: b"",
+        lambda data: b"\x00" * 64,
+        lambda data: marshal.dumps((5, [])),
+    ],
+    ids=["truncated", "empty", "garbage", "wrong shape"],
+)
+def test_corrupt_disk_entry_is_a_miss(tmp_path, corrupt):
+    expected = serialize(ASTCache(cache_dir=tmp_path).parse(PROGRAM))
+    path = disk_path(tmp_path, PROGRAM)
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(corrupt(data))
+
+    cache = ASTCache(cache_dir=tmp_path)
+    assert serialize(cache.parse(PROGRAM)) == expected
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["misses"]) == (0, 1)
+    with open(path, "rb") as f:
+        assert f.read() == expected  # the entry was written again
+
+
+def test_failed_write_leaves_no_temporary_file(tmp_path, monkeypatch):
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(ast_cache_.os, "replace", fail)
+    cache = ASTCache(cache_dir=tmp_path)
+    cache.parse(PROGRAM)
+    assert os.listdir(tmp_path) == []
+    cache.parse(PROGRAM)
+    assert cache.stats()["hits"] == 1  # the memory level still works
@@ -0,0 +1,76 @@
+import pytest
+
+import batch_
+from batch_ import BatchRunner, Job, ERROR, MEMORY, OK, TIMEOUT
+
+HELLO = """
+func main(): void {
+  print("hello");
+}
+"""
+
+LOOP = """
+func main(): void {
+  var i: int;
+  for (i = 0; true; i = i + 1) {
+    i = i - 1;
+  }
+}
+"""
+
+# doubles a string until it needs 2 GB
+GROW = """
+func main(): void {
+  var s: string;
+  var i: int;
+  s = "abcdefgh";
+  for (i = 0; i < 28; i = i + 1) {
+    s = s + s;
+  }
+  print("done");
+}
+"""
+
+FAIL = """
+func main(): void {
+  print("before");
+  print(1 + "a");
+}
+"""
+
+
+def run(jobs, **kwargs):
+    with BatchRunner(workers=2, **kwargs) as runner:
+        results = list(runner.run(jobs))
+    return sorted(results, key=lambda result: result.job_id)
+
+
+def test_results_are_checked_against_expected_output():
+    results = run(
+        [
+            Job(HELLO, expected=["hello"]),
+            Job(HELLO, expected=["bye"]),
+            # nothing is printed when the program fails
+            Job(FAIL, expected=["ErrorType.TYPE_ERROR"]),
+        ]
+    )
+    assert [result.status for result in results] == [OK, OK, ERROR]
+    assert [result.passed for result in results] == [True, False, True]
+
+
+def test_timeout_kills_the_job_and_replaces_the_worker():
+    results = run([Job(LOOP, name="loop")] + [Job(HELLO)] * 3, timeout=1.0)
+    assert results[0].status == TIMEOUT
+    assert results[0].name == "loop"
+    assert [result.output for result in results[1:]] == [["hello"]] * 3
+
+
+@pytest.mark.skipif(batch_.resource is None, reason="memory limits need resource")
+def test_memory_limit_fails_the_job_and_replaces_the_worker():
+    results = run(
+        [Job(GROW, name="grow")] + [Job(HELLO)] * 3,
+        timeout=30.0,
+        memory_limit=512 << 20,
+    )
+    assert results[0].status == MEMORY
+    assert [result.output for result in results[1:]] == [["hello"]] * 3
@@ -0,0 +1,42 @@
+from benchmarks.runner import compare
+
+
+def metrics(parse_s=0.01, exec_s=1.0, peak_bytes=1000, node_evals=500):
+    return {
+        "parse_s": parse_s,
+        "exec_s": exec_s,
+        "peak_bytes": peak_bytes,
+        "node_evals": node_evals,
+    }
+
+
+def test_timed_metrics_regress_past_the_threshold():
+    baseline = {"fib": {"tree": metrics()}}
+    results = {"fib": {"tree": metrics(parse_s=0.0109, exec_s=1.2, peak_bytes=1101)}}
+    assert compare(results, baseline, 0.1) == [
+        ("fib", "tree", "exec_s", 1.0, 1.2),
+        ("fib", "tree", "peak_bytes", 1000, 1101),
+    ]
+    assert compare(results, baseline, 0.25) == []
+
+
+def test_faster_runs_are_not_regressions():
+    baseline = {"fib": {"tree": metrics()}}
+    results = {"fib": {"tree": metrics(exec_s=0.5, node_evals=400)}}
+    assert compare(results, baseline, 0.0) == []
+
+
+def test_any_growth_of_node_evals_is_a_regression():
+    baseline = {"fib": {"vm": metrics()}}
+    results = {"fib": {"vm": metrics(node_evals=501)}}
+    assert compare(results, baseline, 10.0) == [("fib", "vm", "node_evals", 500, 501)]
+
+
+def test_missing_baselines_are_skipped():
+    baseline = {"fib": {"tree": metrics(parse_s=0, node_evals=None)}}
+    results = {
+        "fib": {"tree": metrics(parse_s=5.0), "closure": metrics(exec_s=9.0)},
+        "loops": {"tree": metrics(exec_s=9.0)},
+    }
+    # a zero or missing baseline value isn't compared either
+    assert compare(results, baseline, 0.1) == []
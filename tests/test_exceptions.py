@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+import vm_
+from programs import ENGINES, EXCEPTIONS, check_program, programs, run_program
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("optimize", [False, True])
+@pytest.mark.parametrize("type_check", [False, True])
+@pytest.mark.parametrize("path", programs(directory=EXCEPTIONS), ids=os.path.basename)
+def test_programs(path, type_check, optimize, engine):
+    check_program(path, engine=engine, type_check=type_check, optimize=optimize)
+
+
+def test_vm_discards_partial_expressions_when_it_catches(monkeypatch):
+    frames = []
+
+    class RecordedFrame(vm_.Frame):
+        __slots__ = ()
+
+        def __init__(self, *args):
+            super().__init__(*args)
+            frames.append(self)
+
+    monkeypatch.setattr(vm_, "Frame", RecordedFrame)
+    path = os.path.join(EXCEPTIONS, "tests", "Exceptions-Partial_Expressions.br")
+    run_program(path, engine="vm")
+    main = frames[0]
+    assert main.code.name == "main"
+    # the operands evaluated before each raise were dropped from main's stack
+    assert main.stack == []
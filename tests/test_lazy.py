@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from interpreter_ import Interpreter
+from programs import LAZY, check_program, programs, run
+
+
+@pytest.mark.parametrize("frontend", ["ply", "pratt"])
+@pytest.mark.parametrize("path", programs(directory=LAZY), ids=os.path.basename)
+def test_programs(path, frontend):
+    check_program(path, lazy=True, frontend=frontend)
+
+
+def test_eager_mode_evaluates_every_assignment():
+    program = """
+func loud(s: string): int {
+  print("evaluated ", s);
+  return 1;
+}
+
+func main(): void {
+  var x: int;
+  x = loud("x");
+  x = 5;
+  print(x);
+}
+"""
+    assert run(program) == ["evaluated x", "5"]
+    assert run(program, lazy=True) == ["5"]
+
+
+def test_strict_logic_forces_a_variable_operand_under_type_check():
+    program = """
+func loud(): bool {
+  print("forced");
+  return true;
+}
+
+func main(): void {
+  var b: bool;
+  b = loud();
+  print(false && b);
+}
+"""
+    assert run(program, lazy=True) == ["forced", "false"]
+    assert run(program, lazy=True, type_check=True) == ["forced", "false"]
+
+
+@pytest.mark.parametrize("engine", ["closure", "vm"])
+def test_lazy_runs_on_the_tree_engine_only(engine):
+    with pytest.raises(ValueError):
+        Interpreter(engine=engine, lazy=True)
@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+from brewparse import parse_program
+from interpreter_ import Interpreter
+from memo_ import MemoCache, PurityAnalyzer, memo_key
+from programs import ENGINES, V3, check_program, programs, run
+from type_value_ import bool_value, int_value, string_value
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("max_entries", [None, 10000, 2])
+@pytest.mark.parametrize("path", programs("Memoization-"), ids=os.path.basename)
+def test_programs(path, max_entries, engine):
+    memo = None if max_entries is None else MemoCache(max_entries)
+    check_program(path, engine=engine, memo=memo)
+
+
+def pure_functions(program):
+    ast = parse_program(program)
+    functions = {(func.name, len(func.args)): func for func in ast.functions}
+    return {func.name for func in PurityAnalyzer(functions).pure_functions()}
+
+
+def test_purity_analysis():
+    program = """
+struct box {
+  val: int;
+}
+
+func double(n: int): int { return n * 2; }
+func quad(n: int): int { return double(double(n)); }
+func uses_box(n: int): int { var b: box; b = new box; b.val = n; return b.val; }
+func prints(n: int): int { print(n); return n; }
+func reads(): int { return inputi(); }
+func calls_prints(n: int): int { return prints(n) + 1; }
+func calls_calls_prints(n: int): int { return calls_prints(n) + 1; }
+func takes_box(b: box): int { return 1; }
+func returns_box(n: int): box { return nil; }
+func returns_void(n: int): void { return; }
+func calls_unknown(n: int): int { return missing(n); }
+func main(): void { print(quad(1)); }
+"""
+    assert pure_functions(program) == {"double", "quad", "uses_box"}
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_impure_functions_are_never_cached(engine):
+    memo = MemoCache()
+    path = os.path.join(V3, "tests", "Memoization-Impure_Functions.br")
+    check_program(path, engine=engine, memo=memo)
+    assert memo.stats()["entries"] == 0
+    assert memo.stats()["hits"] == 0
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_pure_functions_are_cached(engine):
+    program = """
+func fib(n: int): int {
+  if (n < 2) {
+    return n;
+  }
+  return fib(n - 1) + fib(n - 2);
+}
+
+func main(): void {
+  print(fib(60));
+}
+"""
+    memo = MemoCache()
+    assert run(program, engine=engine, memo=memo) == ["1548008755920"]
+    stats = memo.stats()
+    assert (stats["misses"], stats["hits"], stats["entries"]) == (61, 58, 61)
+
+
+def test_lru_eviction_at_capacity():
+    memo = MemoCache(max_entries=2)
+    a, b, c = (memo_key("f", [int_value(n)]) for n in range(3))
+    memo.put(a, int_value(10))
+    memo.put(b, int_value(11))
+    assert memo.get(a) == int_value(10)  # b is now the least recently used
+    memo.put(c, int_value(12))
+    assert memo.get(b) is None
+    assert memo.get(a) == int_value(10)
+    assert memo.get(c) == int_value(12)
+    assert memo.stats() == {
+        "hits": 3,
+        "misses": 1,
+        "hit_rate": 0.75,
+        "evictions": 1,
+        "entries": 2,
+    }
+
+
+def test_memo_key_tells_ints_and_bools_apart():
+    assert memo_key("f", [int_value(1)]) != memo_key("f", [bool_value(True)])
+    assert memo_key("f", [int_value(0)]) != memo_key("f", [bool_value(False)])
+    assert memo_key("f", [int_value(1)]) == memo_key("f", [int_value(1)])
+    # the name and the number of arguments are part of the key
+    assert memo_key("f", [int_value(1)]) != memo_key("g", [int_value(1)])
+    assert memo_key("f", [string_value("")]) != memo_key("f", [])
+
+
+def test_memo_cannot_be_combined_with_lazy():
+    with pytest.raises(ValueError):
+        Interpreter(lazy=True, memo=MemoCache())
@@ -0,0 +1,121 @@
+import os
+
+import pytest
+
+from brewparse import parse_program
+from interpreter_ import Interpreter
+from optimizer_ import Optimizer
+from programs import ENGINES, check_program, programs, run
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("optimize", [False, True])
+@pytest.mark.parametrize("path", programs("Optimizer-"), ids=os.path.basename)
+def test_programs(path, optimize, engine):
+    check_program(path, engine=engine, optimize=optimize)
+
+
+def optimized_main(body):
+    """Statements of main, with the given body, after optimization"""
+    ast = parse_program(f"func main(): void {{\n{body}\n}}")
+    optimized = Optimizer(Interpreter(False, [], False)).optimize(ast)
+    return optimized.functions[0].statements
+
+
+def printed(statement):
+    """The expression printed by a print statement"""
+    assert statement.elem_type == "fcall" and statement.name == "print"
+    return statement.args[0]
+
+
+def test_constants_are_folded():
+    (statement,) = optimized_main('print(3 * 4 - -2 / 2 == 13 && "a" + "b" == "ab");')
+    assert (printed(statement).elem_type, printed(statement).val) == ("bool", True)
+
+
+def test_division_by_zero_is_not_folded():
+    body = "print(1 / (2 - 2));"
+    (statement,) = optimized_main(body)
+    expr = printed(statement)
+    assert expr.elem_type == "/"
+    assert (expr.op1.elem_type, expr.op2.elem_type) == ("int", "int")
+    assert expr.op2.val == 0  # the operands are still folded
+    with pytest.raises(ZeroDivisionError):
+        run(f"func main(): void {{ {body} }}", optimize=True)
+
+
+def test_bool_holding_an_int_is_not_folded():
+    # int || int gives a bool holding an int, which has no literal
+    (statement,) = optimized_main("print(3 || 0);")
+    assert printed(statement).elem_type == "||"
+    program = "func main(): void { print(3 || 0, !3 == (2 && 1)); }"
+    assert run(program, optimize=True) == run(program)
+
+
+def test_constant_branch_declaring_variables_keeps_its_scope():
+    statements = optimized_main(
+        """
+  var x: int;
+  x = 1;
+  if (2 > 1) {
+    var x: string;
+    x = "inner";
+  } else {
+    print("never");
+  }
+  print(x);
+"""
+    )
+    branch = statements[2]
+    assert branch.elem_type == "if"
+    assert (branch.condition.elem_type, branch.condition.val) == ("bool", True)
+    assert branch.else_statements is None
+    assert [statement.elem_type for statement in branch.statements] == ["vardef", "="]
+
+
+def test_constant_branch_without_variables_is_spliced():
+    statements = optimized_main(
+        """
+  if (false) {
+    print("never");
+  } else {
+    print("a");
+    print("b");
+  }
+"""
+    )
+    assert [printed(statement).val for statement in statements] == ["a", "b"]
+
+
+def test_code_after_return_or_raise_is_removed():
+    statements = optimized_main(
+        """
+  print("a");
+  if (true) {
+    return;
+    print("b");
+  }
+  print("c");
+"""
+    )
+    assert [statement.elem_type for statement in statements] == ["fcall", "return"]
+
+    statements = optimized_main(
+        """
+  if (inputi() > 0) {
+    raise "up";
+  } else {
+    return;
+  }
+  print("c");
+"""
+    )
+    assert [statement.elem_type for statement in statements] == ["if"]
+
+
+def test_parsed_tree_is_left_untouched():
+    ast = parse_program('func main(): void { print(1 + 2); return; print("x"); }')
+    before = [statement.elem_type for statement in ast.functions[0].statements]
+    Optimizer(Interpreter(False, [], False)).optimize(ast)
+    assert [statement.elem_type for statement in ast.functions[0].statements] == before
+    assert ast.functions[0].statements[0].args[0].elem_type == "+"
@@ -0,0 +1,98 @@
+import io
+
+import pytest
+
+from interpreter_ import Interpreter
+from output_ import (
+    CallbackSink,
+    FileSink,
+    ListSink,
+    OutputSink,
+    RingBufferSink,
+    StdoutSink,
+)
+
+PROGRAM = """
+func count(n: int): int {
+  print("count ", n);
+  return n;
+}
+
+func main(): void {
+  var i: int;
+  print("start");
+  for (i = 0; i < 3; i = i + 1) {
+    print(count(i) * 10);
+  }
+  print("end");
+}
+"""
+
+EXPECTED = [
+    "start",
+    "count 0",
+    "0",
+    "count 1",
+    "10",
+    "count 2",
+    "20",
+    "end",
+]
+
+
+class RecordingSink(OutputSink):
+    def __init__(self):
+        self.events = []
+
+    def write(self, line):
+        self.events.append(line)
+
+    def flush(self):
+        self.events.append("<flush>")
+
+
+def test_sink_without_write_cannot_be_created():
+    class IncompleteSink(OutputSink):
+        def flush(self):
+            pass
+
+    with pytest.raises(TypeError):
+        IncompleteSink()
+
+
+@pytest.mark.parametrize("engine", sorted(Interpreter.ENGINES))
+def test_custom_sink_receives_lines_in_print_order(engine):
+    sink = RecordingSink()
+    interpreter = Interpreter(False, [], False, engine=engine, output_sink=sink)
+    interpreter.run(PROGRAM)
+    assert sink.events == EXPECTED + ["<flush>"]
+    assert interpreter.get_output() == []
+
+
+def test_sink_is_flushed_when_the_program_fails():
+    sink = RecordingSink()
+    interpreter = Interpreter(False, [], False, output_sink=sink)
+    with pytest.raises(Exception):
+        interpreter.run('func main(): void { print("a"); print(1 + "b"); }')
+    assert sink.events == ["a", "<flush>"]
+
+
+def test_provided_sinks(tmp_path):
+    lines = []
+    stream = io.StringIO()
+    sinks = [
+        ListSink(),
+        CallbackSink(lines.append),
+        RingBufferSink(max_lines=2),
+        StdoutSink(stream, buffer_lines=3),
+        FileSink(tmp_path / "out.txt"),
+    ]
+    for sink in sinks:
+        with sink:
+            Interpreter(False, [], False, output_sink=sink).run(PROGRAM)
+
+    assert sinks[0].lines == EXPECTED
+    assert lines == EXPECTED
+    assert list(sinks[2].lines) == EXPECTED[-2:]
+    assert stream.getvalue() == "\n".join(EXPECTED) + "\n"
+    assert (tmp_path / "out.txt").read_text() == "\n".join(EXPECTED) + "\n"
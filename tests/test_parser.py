@@ -0,0 +1,108 @@
+import glob
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import brewparse
+from ast_cache_ import serialize
+from brewparse import Parser, parse_program
+from pratt_ import PrattParser
+
+AUTOGRADER = os.path.join(os.path.dirname(__file__), os.pardir, "fall-24-autograder")
+PROGRAMS = sorted(
+    glob.glob(os.path.join(AUTOGRADER, "v*", "**", "*.br"), recursive=True)
+)
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def parsed(program, frontend=brewparse.PLY_FRONTEND):
+    """Serialized tree of a program, positions included, None on a syntax error"""
+    try:
+        return serialize(parse_program(program, frontend))
+    except SyntaxError:
+        return None
+
+
+@pytest.fixture
+def frequent_thread_switches():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_concurrent_parse_program(frequent_thread_switches):
+    programs = [read(path) for path in PROGRAMS]
+    expected = [parsed(program) for program in programs]
+    assert expected.count(None) < len(expected)
+    with ThreadPoolExecutor(8) as pool:
+        for _ in range(3):
+            assert list(pool.map(parsed, programs)) == expected
+
+
+def test_each_thread_has_its_own_parser():
+    parsers = []
+
+    def parse():
+        parse_program("func main(): void { print(1); }")
+        parsers.append(brewparse._local.parser)
+
+    threads = [threading.Thread(target=parse) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(parser) for parser in parsers}) == 4
+
+
+def test_parser_is_reusable_after_a_syntax_error():
+    parser = Parser()
+    with pytest.raises(SyntaxError):
+        parser.parse("func main(): void { print(; }")
+    ast = parser.parse("func main(): void { print(1); }")
+    assert serialize(ast) == parsed("func main(): void { print(1); }")
+
+
+@pytest.mark.parametrize(
+    "path", PROGRAMS, ids=lambda path: os.path.relpath(path, AUTOGRADER)
+)
+def test_frontends_build_the_same_tree(path):
+    program = read(path)
+    expected = parsed(program)
+    try:
+        ast = PrattParser().parse(program)
+    except SyntaxError:
+        # left to the PLY parser, which reports the errors and may recover from them
+        pass
+    else:
+        assert serialize(ast) == expected
+    assert parsed(program, brewparse.PRATT_FRONTEND) == expected
+
+
+def test_syntax_error_falls_back_to_ply():
+    # the PLY parser recovers from the error in this program, the Pratt parser doesn't
+    program = read(os.path.join(AUTOGRADER, "v3", "fails", "nil_ret.br"))
+    with pytest.raises(SyntaxError):
+        PrattParser().parse(program)
+    expected = parsed(program)
+    assert expected is not None
+    assert parsed(program, brewparse.PRATT_FRONTEND) == expected
+
+
+def test_deep_nesting_falls_back_to_ply(monkeypatch):
+    depth = sys.getrecursionlimit()
+    program = f"func main(): void {{ print({'(' * depth}1{')' * depth}); }}"
+    with pytest.raises(RecursionError):
+        PrattParser().parse(program)
+
+    used = []
+    monkeypatch.setattr(brewparse.Parser, "parse", lambda self, p: used.append(p))
+    parse_program(program, brewparse.PRATT_FRONTEND)
+    assert used == [program]
@@ -0,0 +1,59 @@
+import pytest
+
+from intbase import ErrorType
+from interpreter_ import Interpreter
+from programs import ENGINES
+
+COERCION = """
+func main(): void {
+  var b: bool;
+  b = true;
+  b = "yes";
+}
+"""
+
+NIL_FIELD_IN_CALLEE = """
+struct node {
+  val: int;
+}
+
+func value(n: node): int {
+  print("in value");
+  return n.val;
+}
+
+func main(): void {
+  var n: node;
+  print(value(n));
+}
+"""
+
+UNCAUGHT_RAISE = """
+func fail(): void {
+  print("failing");
+  raise "oops";
+}
+
+func main(): void {
+  fail();
+}
+"""
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("type_check", [False, True])
+@pytest.mark.parametrize(
+    "program, error_type, line",
+    [
+        (COERCION, ErrorType.TYPE_ERROR, 5),
+        (NIL_FIELD_IN_CALLEE, ErrorType.FAULT_ERROR, 8),
+        (UNCAUGHT_RAISE, ErrorType.FAULT_ERROR, 4),
+    ],
+    ids=["coercion", "nil field in callee", "uncaught raise"],
+)
+def test_errors_report_their_line(program, error_type, line, type_check, engine):
+    interpreter = Interpreter(False, [], False, engine=engine, type_check=type_check)
+    with pytest.raises(Exception) as excinfo:
+        interpreter.run(program)
+    assert interpreter.get_error_type_and_line() == (error_type, line)
+    assert str(excinfo.value).startswith(f"{error_type} on line {line}: ")
@@ -0,0 +1,72 @@
+import itertools
+import re
+
+import pytest
+
+from interpreter_ import Interpreter
+from profiler_ import Profiler
+
+PROGRAM = """
+func g(n: int): int {
+  return n + 1;
+}
+
+func f(n: int): int {
+  return g(n) * 2;
+}
+
+func fact(n: int): int {
+  if (n <= 1) {
+    return 1;
+  }
+  return n * fact(n - 1);
+}
+
+func main(): void {
+  print(f(1));
+  print(g(2));
+  print(fact(3));
+}
+"""
+
+
+def ticking_clock():
+    """Clock advancing by one microsecond every time it is read"""
+    ticks = itertools.count()
+    return lambda: next(ticks) / 1_000_000
+
+
+@pytest.mark.parametrize("engine", sorted(Interpreter.ENGINES))
+def test_collapsed_stacks(engine, tmp_path):
+    profiler = Profiler(clock=ticking_clock())
+    Interpreter(False, [], False, engine=engine, profiler=profiler).run(PROGRAM)
+
+    lines = profiler.collapsed_stacks()
+    assert all(re.fullmatch(r"[\w;]+ \d+", line) for line in lines)
+    stacks = dict(line.rsplit(" ", 1) for line in lines)
+    assert sorted(stacks) == [
+        "main",
+        "main;f",
+        "main;f;g",
+        "main;fact",
+        "main;fact;fact",
+        "main;fact;fact;fact",
+        "main;g",
+    ]
+    # the self times of the stacks add up to the time spent in main
+    main = profiler.function_stats["main"]
+    assert sum(int(time) for time in stacks.values()) == round(main.total_time * 1e6)
+
+    path = tmp_path / "profile.folded"
+    profiler.write_collapsed(str(path))
+    assert path.read_text() == "".join(line + "\n" for line in lines)
+
+
+def test_function_stats_count_recursive_calls_once_in_total_time():
+    profiler = Profiler(clock=ticking_clock())
+    Interpreter(False, [], False, profiler=profiler).run(PROGRAM)
+    fact = profiler.function_stats["fact"]
+    assert fact.count == 3
+    assert fact.active == 0
+    assert fact.total_time >= fact.self_time
+    assert "fact" in profiler.report()
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from programs import ENGINES, RECURSION, check_program, programs, run, run_program
+
+SUM = """
+func sum(n: int): int {
+  if (n == 0) {
+    return 0;
+  }
+  return n + sum(n - 1);
+}
+
+func main(): void {
+  print(sum(%d));
+}
+"""
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("path", programs(directory=RECURSION), ids=os.path.basename)
+def test_programs(path, engine):
+    check_program(path, engine=engine)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_tail_calls_do_not_count_towards_max_call_depth(engine):
+    path = os.path.join(RECURSION, "tests", "Recursion-Deep_Tail_Recursion.br")
+    assert run_program(path, engine=engine, max_call_depth=100) == [
+        "450015000",
+        "false true",
+    ]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_going_past_max_call_depth_is_a_fault(engine):
+    assert run(SUM % 90, engine=engine, max_call_depth=100) == ["4095"]
+    assert run(SUM % 200, engine=engine, max_call_depth=100) == [
+        "ErrorType.FAULT_ERROR"
+    ]
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from interpreter_ import Interpreter
+from programs import ENGINES, SHORT_CIRCUIT, check_program, programs
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("type_check", [False, True])
+@pytest.mark.parametrize(
+    "path", programs(directory=SHORT_CIRCUIT), ids=os.path.basename
+)
+def test_short_circuit_programs(path, type_check, engine):
+    check_program(path, engine=engine, type_check=type_check, short_circuit=True)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("type_check", [False, True])
+@pytest.mark.parametrize("path", programs("Strict_Logic-"), ids=os.path.basename)
+def test_strict_programs(path, type_check, engine):
+    check_program(path, engine=engine, type_check=type_check)
+
+
+def test_only_provably_safe_operands_are_skipped():
+    program = """
+struct box {
+  val: int;
+}
+
+func f(): bool {
+  return true;
+}
+
+func main(): void {
+  var a: int;
+  var b: bool;
+  var x: box;
+  a = 1;
+  x = new box;
+  print(false && b);
+  print(true || a > 1 && !b);
+  print(false && a + 1 == 2);
+  print(false && "s" + "t" == "st");
+  print(false && f());
+  print(false && x.val > 0);
+  print(false && a / 1 > 0);
+  print(false && a);
+  print(false && x == nil);
+  print(false && (a > 0 || f()));
+}
+"""
+    interpreter = Interpreter(False, [], False, type_check=True)
+    interpreter.run(program)
+    assert interpreter.get_output() == ["false", "true"] + ["false"] * 8
+    skipped = sorted(interpreter.line_of(node) for node in interpreter.skippable_ops)
+    # constants, variables and operators on operands of the same type, line 17 has
+    # both an || and an &&. Calls, fields, divisions and coercions are evaluated.
+    assert skipped == [16, 17, 17, 18, 19]
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from interpreter_ import Interpreter
+from programs import ENGINES, check_program, programs, run, run_program
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("type_check", [False, True])
+@pytest.mark.parametrize("path", programs("Type_Checking-"), ids=os.path.basename)
+def test_programs(path, type_check, engine):
+    check_program(path, engine=engine, type_check=type_check)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_checked_output_matches_unchecked_output(engine):
+    for path in programs():
+        assert run_program(path, engine=engine, type_check=True) == run_program(
+            path, engine=engine
+        ), path
+
+
+def test_errors_in_code_that_never_runs_are_reported_up_front():
+    program = """
+func main(): void {
+  var x: int;
+  print("start");
+  if (false) {
+    x = "not an int";
+  }
+  print("end");
+}
+"""
+    assert run(program) == ["start", "end"]
+    assert run(program, type_check=True) == ["ErrorType.TYPE_ERROR"]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("type_check", [False, True])
+def test_division_by_zero_is_still_evaluated(engine, type_check):
+    # a division isn't proven infallible, so strict && still evaluates it
+    program = """
+func main(): void {
+  var a: int;
+  var b: int;
+  a = 1;
+  print(false && a / b > 0);
+}
+"""
+    interpreter = Interpreter(False, [], False, engine=engine, type_check=type_check)
+    with pytest.raises(ZeroDivisionError):
+        interpreter.run(program)
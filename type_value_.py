@@ -9,8 +9,12 @@ class Type:
     NIL = "nil"
 
 
-# Represents a value, which has a type and its value
+# Represents a value, which has a type and its value. Values are immutable: assigning
+# to a variable or a struct field replaces the Value it holds, so the same Value can be
+# shared freely (see the interned constants below).
 class Value:
+    __slots__ = ("t", "v")
+
     def __init__(self, type, value=None):
         self.t = type
         self.v = value
@@ -22,6 +26,48 @@ class Value:
         return self.t
 
 
+# shared constants, to avoid allocating a new Value for the most common results
+TRUE = Value(Type.BOOL, True)
+FALSE = Value(Type.BOOL, False)
+NIL = Value(Type.NIL, None)
+EMPTY_STRING = Value(Type.STRING, "")
+
+SMALL_INT_MIN = -128
+SMALL_INT_MAX = 1023
+_small_ints = [Value(Type.INT, i) for i in range(SMALL_INT_MIN, SMALL_INT_MAX + 1)]
+ZERO = _small_ints[-SMALL_INT_MIN]
+
+# literal strings are interned up to a bound, so a long-running process that parses
+# many programs doesn't keep every string it has seen alive
+MAX_INTERNED_STRINGS = 4096
+_interned_strings = {}
+
+
+def bool_value(b):
+    if b is True:
+        return TRUE
+    if b is False:
+        return FALSE
+    # `int && int` gives a bool Value holding an int, keep it as is
+    return Value(Type.BOOL, b)
+
+
+def int_value(i):
+    if SMALL_INT_MIN <= i <= SMALL_INT_MAX:
+        return _small_ints[i - SMALL_INT_MIN]
+    return Value(Type.INT, i)
+
+
+def string_value(s):
+    """Interned Value for a string literal, use Value() for computed strings"""
+    val = _interned_strings.get(s)
+    if val is None:
+        val = Value(Type.STRING, s)
+        if len(_interned_strings) < MAX_INTERNED_STRINGS:
+            _interned_strings[s] = val
+    return val
+
+
 def get_printable(val):
     if not val:
         return ""
@@ -0,0 +1,407 @@
+# The TypeChecker computes the static type of every expression of a Brewin++ program
+# before it runs. Variables, arguments, struct fields and function returns all have
+# declared types, so the type of an expression only depends on the types of its
+# operands, with the same coercions as at runtime (int to bool, nil to a struct type).
+#
+# check() returns the errors found, in program order, as (ErrorType, description, node)
+# tuples. Unlike the runtime, which only fails when the offending code runs, the checker
+# reports errors in code that may never run. Errors that depend on values are left to
+# the runtime, like accessing a field that doesn't exist, which fails differently when
+# the struct is nil.
+#
+# The checker also fills in side tables the engines use to skip dynamic checks once
+# the whole program has been checked:
+#   types      expression node -> static type, for the expressions it could type
+#   operators  unary or binary operator node -> operator function, for the operators
+#              whose operands always have the same type, so no coercion is needed
+#   assigns    assignments whose value always has the type of the variable or field
+#   infallible expressions that have no effect and can't fail: constants, variables,
+#              and the operators of the operators table applied to them, except
+#              divisions. Strict && and || may skip such a right operand.
+from intbase import InterpreterBase, ErrorType
+from type_value_ import Type, is_non_nil_generic_type
+
+VOID = InterpreterBase.VOID_DEF
+# binary operators returning a value of the type of their operands, the others return
+# a bool
+ARITHMETIC_OPS = {"+", "-", "*", "/"}
+CONSTANT_NODES = {
+    InterpreterBase.INT_NODE,
+    InterpreterBase.STRING_NODE,
+    InterpreterBase.BOOL_NODE,
+    InterpreterBase.NIL_NODE,
+}
+
+
+class _BlockScope:
+    def __init__(self):
+        self.declared = set()  # every name declared in this block
+        self.visible = {}  # name -> type, a void variable is never visible
+
+
+class TypeChecker:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.structure_table = interpreter.structure_table
+        self.functions = interpreter.func_name_to_ast
+        self.op_to_lambda = interpreter.op_to_lambda
+        self.errors = []
+        self.types = {}
+        self.operators = {}
+        self.assigns = set()
+        self.infallible = set()
+
+    def check(self, ast):
+        """Check every function of a program, returns the errors found"""
+        for func_def in ast.functions:
+            self.__check_function(func_def)
+        return self.errors
+
+    def __error(self, error_type, description, node):
+        self.errors.append((error_type, description, node))
+
+    def __is_struct(self, var_type):
+        return var_type in self.structure_table
+
+    def __check_function(self, func_def):
+        self.scopes = [_BlockScope()]
+        self.return_type = func_def.return_type
+        for arg in func_def.args:
+            if arg.name in self.scopes[0].declared:
+                self.__error(
+                    ErrorType.NAME_ERROR,
+                    f"Duplicate definition for function argument name {arg.name}",
+                    arg,
+                )
+            self.scopes[0].declared.add(arg.name)
+            self.scopes[0].visible[arg.name] = arg.var_type
+        self.__check_block(func_def.statements)
+
+    def __check_block(self, statements):
+        self.scopes.append(_BlockScope())
+        for statement in statements:
+            self.__check_statement(statement)
+        self.scopes.pop()
+
+    def __lookup(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope.visible:
+                return scope.visible[name]
+        return None
+
+    def __check_statement(self, statement):
+        elem_type = statement.elem_type
+        if elem_type == InterpreterBase.FCALL_NODE:
+            self.__check_expr(statement)
+        elif elem_type == "=":
+            self.__check_assign(statement)
+        elif elem_type == InterpreterBase.VAR_DEF_NODE:
+            self.__check_var_def(statement)
+        elif elem_type == InterpreterBase.IF_NODE:
+            self.__check_condition(
+                statement.condition, "If condition must be a boolean expression"
+            )
+            self.__check_block(statement.statements)
+            self.__check_block(statement.else_statements or [])
+        elif elem_type == InterpreterBase.RETURN_NODE:
+            self.__check_return(statement)
+        elif elem_type == InterpreterBase.FOR_NODE:
+            self.scopes.append(_BlockScope())
+            self.__check_assign(statement.init)
+            self.__check_condition(
+                statement.condition, "for condition must be a boolean expression"
+            )
+            self.__check_block(statement.statements)
+            self.__check_block([statement.update])
+            self.scopes.pop()
+        elif elem_type == InterpreterBase.TRY_NODE:
+            self.__check_block(statement.statements)
+            for catch_ast in statement.catchers:
+                self.__check_block(catch_ast.statements)
+        elif elem_type == InterpreterBase.RAISE_NODE:
+            exception_type = self.__check_expr(statement.exception_type)
+            if exception_type is not None and exception_type != Type.STRING:
+                self.__error(
+                    ErrorType.TYPE_ERROR,
+                    "Raise expression must be a string",
+                    statement,
+                )
+
+    def __check_var_def(self, var_ast):
+        var_type = var_ast.var_type
+        if (
+            not is_non_nil_generic_type(var_type)
+            and not self.__is_struct(var_type)
+            and var_type not in (Type.NIL, VOID)
+        ):
+            self.__error(ErrorType.TYPE_ERROR, f"Unknown type {var_type}", var_ast)
+            return
+        scope = self.scopes[-1]
+        if var_ast.name in scope.declared:
+            self.__error(
+                ErrorType.NAME_ERROR,
+                f"Duplicate definition for variable {var_ast.name}",
+                var_ast,
+            )
+            return
+        scope.declared.add(var_ast.name)
+        # a void variable holds no value, so lookups skip over it to outer scopes
+        if var_type != VOID:
+            scope.visible[var_ast.name] = var_type
+
+    def __check_assign(self, assign_ast):
+        var_name = assign_ast.name
+        value_type = self.__check_expr(assign_ast.expression)
+        if value_type == VOID:
+            self.__error(
+                ErrorType.TYPE_ERROR,
+                f"Cannot assign void value to variable {var_name}",
+                assign_ast,
+            )
+            return
+        base_name = var_name.split(".", 1)[0]
+        if self.__lookup(base_name) is None:
+            self.__error(
+                ErrorType.NAME_ERROR,
+                f"Undefined variable {var_name} in assignment",
+                assign_ast,
+            )
+            return
+        target_type = self.__check_var(assign_ast, var_name)
+        if self.__coerce(assign_ast, value_type, target_type) is None:
+            return
+        if value_type == target_type:
+            self.assigns.add(assign_ast)
+
+    def __check_condition(self, condition, message):
+        condition_type = self.__coerce(
+            condition, self.__check_expr(condition), Type.BOOL
+        )
+        if condition_type is not None and condition_type != Type.BOOL:
+            self.__error(ErrorType.TYPE_ERROR, message, condition)
+
+    def __check_return(self, return_ast):
+        expression = return_ast.expression
+        if expression is None:
+            return
+        self.__coerce(expression, self.__check_expr(expression), self.return_type)
+
+    def __coerce(self, node, value_type, target_type):
+        """Static type of a value of value_type coerced to target_type, None if either
+        type is unknown or the coercion fails"""
+        if value_type is None or target_type is None:
+            return None
+        if value_type == target_type:
+            return target_type
+        if value_type == Type.INT and target_type == Type.BOOL:
+            return Type.BOOL
+        if value_type == Type.NIL and self.__is_struct(target_type):
+            return target_type
+        self.__error(
+            ErrorType.TYPE_ERROR,
+            f"Cannot coerce value of type {value_type} to type {target_type}",
+            node,
+        )
+        return None
+
+    def __check_expr(self, expr_ast):
+        """Static type of an expression, None when it can't be typed"""
+        if expr_ast is None:
+            return None
+        expr_type = self.__expr_type(expr_ast)
+        if expr_type is not None:
+            self.types[expr_ast] = expr_type
+            if self.__is_infallible(expr_ast):
+                self.infallible.add(expr_ast)
+        return expr_type
+
+    def __is_infallible(self, expr_ast):
+        """Whether a typed expression, its operands checked, has no effect and can't
+        fail"""
+        elem_type = expr_ast.elem_type
+        if elem_type in CONSTANT_NODES:
+            return True
+        if elem_type == InterpreterBase.VAR_NODE:
+            # a field access fails on a nil struct
+            return "." not in expr_ast.name
+        if expr_ast not in self.operators or elem_type == "/":
+            return False
+        if elem_type in self.interpreter.UNARY_OPS:
+            return expr_ast.op1 in self.infallible
+        return expr_ast.op1 in self.infallible and expr_ast.op2 in self.infallible
+
+    def __expr_type(self, expr_ast):
+        elem_type = expr_ast.elem_type
+        if elem_type == InterpreterBase.INT_NODE:
+            return Type.INT
+        if elem_type == InterpreterBase.STRING_NODE:
+            return Type.STRING
+        if elem_type == InterpreterBase.BOOL_NODE:
+            return Type.BOOL
+        if elem_type == InterpreterBase.NIL_NODE:
+            return Type.NIL
+        if elem_type == InterpreterBase.VAR_NODE:
+            if self.__lookup(expr_ast.name.split(".", 1)[0]) is None:
+                self.__error(
+                    ErrorType.NAME_ERROR,
+                    f"Variable {expr_ast.name} not found",
+                    expr_ast,
+                )
+                return None
+            return self.__check_var(expr_ast, expr_ast.name)
+        if elem_type == InterpreterBase.FCALL_NODE:
+            return self.__check_call(expr_ast)
+        if elem_type == InterpreterBase.NEW_NODE:
+            if not self.__is_struct(expr_ast.var_type):
+                self.__error(
+                    ErrorType.TYPE_ERROR,
+                    f"Unknown struct {expr_ast.var_type} on new operation",
+                    expr_ast,
+                )
+                return None
+            return expr_ast.var_type
+        if elem_type in self.interpreter.UNARY_OPS:
+            return self.__check_unary_op(expr_ast)
+        if elem_type in self.interpreter.BIN_OPS:
+            return self.__check_binary_op(expr_ast)
+        return None
+
+    def __check_var(self, node, var_name):
+        """Type of a variable or of a dotted field path, the variable being defined"""
+        names = var_name.split(".")
+        var_type = self.__lookup(names[0])
+        if len(names) > 1 and not self.__is_struct(var_type):
+            self.__error(
+                ErrorType.TYPE_ERROR,
+                f"Unknown struct {var_type} on field access",
+                node,
+            )
+            return None
+        for field_name in names[1:]:
+            layout = self.structure_table.get(var_type)
+            # the error of a bad path depends on which structs on the way are nil
+            if layout is None or field_name not in layout:
+                return None
+            var_type = layout.field_type(field_name)
+        return var_type
+
+    def __check_call(self, call_ast):
+        func_name = call_ast.name
+        args = call_ast.args
+        if func_name == "print":
+            for arg in args:
+                if self.__check_expr(arg) == VOID:
+                    self.__error(
+                        ErrorType.TYPE_ERROR,
+                        "Cannot print void value in print statement",
+                        arg,
+                    )
+            return VOID
+        if func_name in ("inputi", "inputs"):
+            if len(args) > 1:
+                self.__error(
+                    ErrorType.NAME_ERROR,
+                    "No inputi() function that takes > 1 parameter",
+                    call_ast,
+                )
+                return None
+            for arg in args:
+                self.__check_expr(arg)
+            return Type.INT if func_name == "inputi" else Type.STRING
+
+        func_def = self.functions.get((func_name, len(args)))
+        if func_def is None:
+            self.__error(
+                ErrorType.NAME_ERROR, f"Function {func_name} not found", call_ast
+            )
+            return None
+        for arg, arg_def in zip(args, func_def.args):
+            arg_type = self.__check_expr(arg)
+            if arg_type == VOID:
+                self.__error(
+                    ErrorType.TYPE_ERROR,
+                    f"Argument type mismatch in function {func_name} and argument {arg_def.name}",
+                    arg,
+                )
+            else:
+                self.__coerce(arg, arg_type, arg_def.var_type)
+        return func_def.return_type
+
+    def __check_operand(self, operand, message):
+        operand_type = self.__check_expr(operand)
+        if operand_type == VOID:
+            self.__error(ErrorType.TYPE_ERROR, message, operand)
+            return None
+        return operand_type
+
+    def __check_unary_op(self, arith_ast):
+        op = arith_ast.elem_type
+        operand_type = self.__check_operand(
+            arith_ast.op1, "Cannot perform unary operation on void value"
+        )
+        if operand_type is None:
+            return None
+        if op not in self.op_to_lambda.get(operand_type, ()):
+            self.__error(
+                ErrorType.TYPE_ERROR,
+                f"Incompatible operator {op} for type {operand_type}",
+                arith_ast,
+            )
+            return None
+        self.operators[arith_ast] = self.op_to_lambda[operand_type][op]
+        return Type.INT if op == "neg" else Type.BOOL
+
+    def __check_binary_op(self, arith_ast):
+        op = arith_ast.elem_type
+        left_type = self.__check_operand(arith_ast.op1, "Cannot compare void value")
+        right_type = self.__check_operand(arith_ast.op2, "Cannot compare void value")
+        if left_type is None or right_type is None:
+            return None
+
+        if self.__is_struct(left_type) or self.__is_struct(right_type):
+            return self.__check_struct_op(arith_ast, left_type, right_type)
+
+        operand_type = left_type
+        if {left_type, right_type} == {Type.INT, Type.BOOL}:
+            operand_type = Type.BOOL
+        elif left_type != right_type:
+            self.__error(
+                ErrorType.TYPE_ERROR,
+                f"Incompatible types for {op} operation",
+                arith_ast,
+            )
+            return None
+        if op not in self.op_to_lambda[operand_type]:
+            self.__error(
+                ErrorType.TYPE_ERROR,
+                f"Incompatible operator {op} for type {operand_type}",
+                arith_ast,
+            )
+            return None
+        if left_type == right_type:
+            self.operators[arith_ast] = self.op_to_lambda[operand_type][op]
+        return operand_type if op in ARITHMETIC_OPS else Type.BOOL
+
+    def __check_struct_op(self, arith_ast, left_type, right_type):
+        if is_non_nil_generic_type(left_type) or is_non_nil_generic_type(right_type):
+            self.__error(
+                ErrorType.TYPE_ERROR,
+                "Cannot compare struct with non-struct type other than nil",
+                arith_ast,
+            )
+            return None
+        if (
+            left_type != right_type
+            and self.__is_struct(left_type)
+            and self.__is_struct(right_type)
+        ):
+            self.__error(
+                ErrorType.TYPE_ERROR,
+                f"Cannot compare struct {left_type} with struct {right_type}",
+                arith_ast,
+            )
+            return None
+        if arith_ast.elem_type in ("==", "!="):
+            return Type.BOOL
+        # the runtime has no other operator on structs
+        return None
@@ -0,0 +1,430 @@
+# The VM runs the bytecode produced by bytecode_.py with a single dispatch loop. Brewin
+# calls push a new frame on an explicit call stack rather than recursing in Python, so
+# deeply recursive Brewin programs are only limited by memory and max_call_depth. A
+# tail call reuses the frame of its caller.
+from bytecode_ import (
+    CONST,
+    DEFAULT,
+    LOAD,
+    LOAD_FIELD,
+    LOAD_UNDEFINED,
+    COERCE,
+    STORE,
+    STORE_FIELD,
+    STORE_UNDEFINED,
+    VAR_DEF,
+    UNARY_OP,
+    BINARY_OP,
+    NEW,
+    JUMP,
+    JUMP_IF_FALSE,
+    CHECK_BOOL,
+    CALL,
+    CALL_UNDEFINED,
+    RETURN,
+    RETURN_NONE,
+    POP,
+    PRINT_START,
+    PRINT_ARG,
+    PRINT_END,
+    INPUT,
+    TRACE,
+    CHECKED_UNARY_OP,
+    CHECKED_BINARY_OP,
+    STORE_CHECKED,
+    TAIL_CALL,
+    SHORT_CIRCUIT,
+    RAISE,
+    CodeObject,
+)
+from exception_ import BrewinException
+from intbase import InterpreterBase, ErrorType
+from memo_ import memo_key
+from type_value_ import Type, Value, int_value, get_printable
+
+
+class Frame:
+    """Activation record of a running Brewin function"""
+
+    __slots__ = ("code", "pc", "slots", "stack", "tail_calls", "memo_key")
+
+    def __init__(self, code: CodeObject, slots, memo_key=None):
+        self.code = code
+        self.pc = 0
+        self.slots = slots
+        self.stack = []
+        # (caller's CodeObject, pc after the call, coercion) of the tail calls that
+        # reused this frame, None if there was none
+        self.tail_calls = None
+        self.memo_key = memo_key  # where to cache the result of a pure function
+
+
+class VM:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+
+    def run(self, code: CodeObject):
+        """Run a function taking no arguments, returns its return value"""
+        interp = self.interpreter
+        error = interp.error
+        coerce_value = interp.coerce_value
+        get_field = interp._get_struct_field_obj
+        find_field = interp._find_struct_field
+        create_default_value_obj = interp._create_default_value_obj
+        write_output = interp.write_output
+        profiler = interp.profiler  # functions only, the VM doesn't time nodes
+        max_call_depth = interp.max_call_depth
+        memo = interp.memo
+        pure_functions = interp.pure_functions
+        short_circuit_value = interp.short_circuit_value
+
+        call_stack = []
+        frame = Frame(code, [None] * code.frame_size)
+        instructions = code.instructions
+        slots = frame.slots
+        stack = frame.stack
+        pc = 0
+        if profiler is not None:
+            profiler.enter_function(code.name)
+
+        try:
+            while True:
+                op, arg = instructions[pc]
+                pc += 1
+
+                if op == LOAD:
+                    stack.append(slots[arg])
+                elif op == CONST:
+                    stack.append(arg)
+                elif op == BINARY_OP:
+                    right = stack.pop()
+                    stack[-1] = self.__binary_op(arg, stack[-1], right)
+                elif op == CHECKED_BINARY_OP:
+                    right = stack.pop()
+                    stack[-1] = arg(stack[-1], right)
+                elif op == JUMP_IF_FALSE:
+                    condition = stack.pop()
+                    if condition.type() != Type.BOOL:
+                        error(ErrorType.TYPE_ERROR, arg[1])
+                    if not condition.value():
+                        pc = arg[0]
+                elif op == JUMP:
+                    pc = arg
+                elif op == SHORT_CIRCUIT:
+                    value_obj = short_circuit_value(arg[0], stack[-1])
+                    if value_obj is not None:
+                        stack[-1] = value_obj
+                        pc = arg[1]
+                elif op == STORE:
+                    slot, var_name = arg
+                    value_obj = stack.pop()
+                    if value_obj == None:
+                        error(
+                            ErrorType.TYPE_ERROR,
+                            f"Cannot assign void value to variable {var_name}",
+                        )
+                    # coerce_value either returns a value of the variable's type or
+                    # fails, which covers the type checks done by EnvironmentManager.set
+                    slots[slot] = coerce_value(value_obj, slots[slot].type())
+                elif op == STORE_CHECKED:
+                    slots[arg] = stack.pop()
+                elif op == COERCE:
+                    stack[-1] = coerce_value(stack[-1], arg)
+                elif op == LOAD_FIELD:
+                    stack.append(get_field(slots[arg[0]], arg[1]))
+                elif op == STORE_FIELD:
+                    slot, var_name, field_name = arg
+                    value_obj = stack.pop()
+                    if value_obj == None:
+                        error(
+                            ErrorType.TYPE_ERROR,
+                            f"Cannot assign void value to variable {var_name}",
+                        )
+                    owner, field_slot, value_ast = find_field(slots[slot], field_name)
+                    value_obj = coerce_value(value_obj, value_ast.type())
+                    if value_ast.type() != value_obj.type():
+                        error(
+                            ErrorType.TYPE_ERROR,
+                            f"Cannot assign value of type for struct attribute {value_obj.type()} to {value_ast.type()}",
+                        )
+                    owner.values[field_slot] = value_obj
+                elif op == CALL:
+                    callee, n_args = arg
+                    if n_args:
+                        evaluated_args = stack[-n_args:]
+                        del stack[-n_args:]
+                    else:
+                        evaluated_args = []
+                    callee_slots = self.__bind_args(callee, evaluated_args)
+                    key = None
+                    if callee.func_def in pure_functions:
+                        key = memo_key(callee.name, evaluated_args)
+                        return_val = memo.get(key)
+                        if return_val is not None:
+                            stack.append(return_val)
+                            continue
+                    if len(call_stack) + 1 >= max_call_depth:
+                        interp.call_depth_exceeded()
+                    if profiler is not None:
+                        profiler.enter_function(callee.name)
+                    frame.pc = pc
+                    call_stack.append(frame)
+                    frame = Frame(callee, callee_slots, key)
+                    instructions = callee.instructions
+                    slots = callee_slots
+                    stack = frame.stack
+                    pc = 0
+                elif op == RETURN or op == RETURN_NONE:
+                    return_val = stack.pop() if op == RETURN else None
+                    if profiler is not None:
+                        profiler.exit_function()
+                    return_val = self.__check_return(frame.code, return_val)
+                    if frame.tail_calls is not None:
+                        # finish the returns of the tail calls, innermost first
+                        for caller, pc, coerce_to in reversed(frame.tail_calls):
+                            frame.code = caller  # for the line of an error
+                            if coerce_to is not None:
+                                return_val = coerce_value(return_val, coerce_to)
+                            return_val = self.__check_return(caller, return_val)
+                    if frame.memo_key is not None:
+                        memo.put(frame.memo_key, return_val)
+                    if not call_stack:
+                        return return_val
+                    frame = call_stack.pop()
+                    instructions = frame.code.instructions
+                    slots = frame.slots
+                    stack = frame.stack
+                    pc = frame.pc
+                    stack.append(return_val)
+                elif op == TAIL_CALL:
+                    callee, n_args, coerce_to = arg
+                    if n_args:
+                        evaluated_args = stack[-n_args:]
+                        del stack[-n_args:]
+                    else:
+                        evaluated_args = []
+                    callee_slots = self.__bind_args(callee, evaluated_args)
+                    if profiler is not None:
+                        profiler.exit_function()
+                        profiler.enter_function(callee.name)
+                    if frame.tail_calls is None:
+                        frame.tail_calls = []
+                    frame.tail_calls.append((frame.code, pc, coerce_to))
+                    frame.code = callee
+                    frame.slots = callee_slots
+                    instructions = callee.instructions
+                    slots = callee_slots
+                    pc = 0
+                elif op == POP:
+                    stack.pop()
+                elif op == VAR_DEF:
+                    slot, var_type, var_name, is_duplicate = arg
+                    default_value = create_default_value_obj(var_type)
+                    if is_duplicate:
+                        error(
+                            ErrorType.NAME_ERROR,
+                            f"Duplicate definition for variable {var_name}",
+                        )
+                    # a void variable holds no value and is never looked up
+                    if slot is not None:
+                        slots[slot] = default_value
+                elif op == UNARY_OP:
+                    stack[-1] = self.__unary_op(arg, stack[-1])
+                elif op == CHECKED_UNARY_OP:
+                    stack[-1] = arg(stack[-1])
+                elif op == PRINT_START:
+                    stack.append("")
+                elif op == PRINT_ARG:
+                    result = stack.pop()
+                    if result == None:
+                        error(
+                            ErrorType.TYPE_ERROR,
+                            "Cannot print void value in print statement",
+                        )
+                    stack[-1] = stack[-1] + get_printable(result)
+                elif op == PRINT_END:
+                    write_output(stack[-1])
+                    stack[-1] = None
+                elif op == NEW:
+                    stack.append(interp._new_struct(arg))
+                elif op == DEFAULT:
+                    stack.append(create_default_value_obj(arg))
+                elif op == CHECK_BOOL:
+                    if stack.pop().type() != Type.BOOL:
+                        error(ErrorType.TYPE_ERROR, arg)
+                elif op == INPUT:
+                    stack.append(self.__input(arg, stack))
+                elif op == LOAD_UNDEFINED:
+                    error(ErrorType.NAME_ERROR, f"Variable {arg} not found")
+                elif op == STORE_UNDEFINED:
+                    if stack.pop() == None:
+                        error(
+                            ErrorType.TYPE_ERROR,
+                            f"Cannot assign void value to variable {arg}",
+                        )
+                    error(
+                        ErrorType.NAME_ERROR, f"Undefined variable {arg} in assignment"
+                    )
+                elif op == CALL_UNDEFINED:
+                    error(ErrorType.NAME_ERROR, f"Function {arg} not found")
+                elif op == TRACE:
+                    interp.trace(arg)
+                elif op == RAISE:
+                    value_obj = stack.pop()
+                    if value_obj == None or value_obj.type() != Type.STRING:
+                        error(ErrorType.TYPE_ERROR, "Raise expression must be a string")
+                    exception = BrewinException(
+                        value_obj.value(), frame.code.lines[pc - 1]
+                    )
+                    frame.pc = pc
+                    # leave the frames of the functions that don't catch it
+                    catch_pc = self.__find_catch(frame, exception.exception_type)
+                    while catch_pc is None:
+                        if not call_stack:
+                            raise exception
+                        if profiler is not None:
+                            profiler.exit_function()
+                        frame = call_stack.pop()
+                        catch_pc = self.__find_catch(frame, exception.exception_type)
+                    instructions = frame.code.instructions
+                    slots = frame.slots
+                    stack = frame.stack
+                    # statements leave the stack empty, what's left was being evaluated
+                    stack.clear()
+                    pc = catch_pc
+                else:
+                    raise ValueError(f"Unknown opcode {op}")
+        except Exception:
+            # errors are raised without a line, it's the line of the failing instruction
+            if interp.error_type is None or interp.error_line is not None:
+                raise
+            line = frame.code.lines[pc - 1]
+            if line is None:
+                raise
+        error(interp.error_type, interp.error_description, line)
+
+    def __find_catch(self, frame, exception_type):
+        """pc of the catch block for exception_type of the innermost try block running
+        in frame, None if it has none"""
+        pc = frame.pc - 1  # the instruction raising or calling
+        for start, end, catch_pcs in frame.code.handlers:
+            if start <= pc < end and exception_type in catch_pcs:
+                return catch_pcs[exception_type]
+        return None
+
+    def __bind_args(self, code: CodeObject, evaluated_args):
+        """Check the arguments of a call and build the callee's slots, mirrors
+        Interpreter.__run_function"""
+        interp = self.interpreter
+        # check if the type of the arguments passed in matches the type of the arguments in the function definition
+        if not interp.type_check:
+            for val, arg_def in zip(evaluated_args, code.args):
+                if val.type() != arg_def.get("var_type"):
+                    interp.error(
+                        ErrorType.TYPE_ERROR,
+                        f"Argument type mismatch in function {code.name} and argument {arg_def.get('name')}",
+                    )
+
+        slots = [None] * code.frame_size
+        for slot, arg_def, value in zip(code.arg_slots, code.args, evaluated_args):
+            if slot is None:
+                interp.error(
+                    ErrorType.NAME_ERROR,
+                    f"Duplicate definition for function argument name {arg_def.get('name')}",
+                )
+            slots[slot] = value
+        return slots
+
+    def __check_return(self, code: CodeObject, return_val):
+        """Apply the default-return rules of Interpreter.__run_function"""
+        interp = self.interpreter
+        return_type = code.return_type
+
+        # if the function return_type is void, it must not have return value
+        if return_type == InterpreterBase.VOID_DEF:
+            if return_val is not None:
+                interp.error(
+                    ErrorType.TYPE_ERROR,
+                    f"Function {code.name} must return a value of type {return_type}",
+                )
+            return None
+
+        # if there is no return statement or no specific return value
+        if return_val is None:
+            return_val = interp._create_default_value_obj(return_type)
+
+        # if the function return_type is struct, and the return value is nil
+        if interp._is_struct(return_type) and return_val.value() == None:
+            return_val = interp._create_default_value_obj(return_type)
+
+        # if the return type isn't match
+        if not interp.type_check and return_val.type() != return_type:
+            interp.error(
+                ErrorType.TYPE_ERROR,
+                f"Function {code.name} must return a value of type {return_type}",
+            )
+        return return_val
+
+    def __unary_op(self, arg, value_obj):
+        interp = self.interpreter
+        op, lambdas = arg
+        if value_obj == None:
+            interp.error(
+                ErrorType.TYPE_ERROR,
+                f"Cannot perform unary operation on void value",
+            )
+        f = lambdas.get(value_obj.type())
+        if f is None:
+            # unknown types fail with the same exception as the tree walker
+            if op not in interp.op_to_lambda[value_obj.type()]:
+                interp.error(
+                    ErrorType.TYPE_ERROR,
+                    f"Incompatible operator {op} for type {value_obj.type()}",
+                )
+        return f(value_obj)
+
+    def __binary_op(self, arg, left_value_obj, right_value_obj):
+        interp = self.interpreter
+        op, lambdas, arith_ast = arg
+        if left_value_obj == None or right_value_obj == None:
+            interp.error(ErrorType.TYPE_ERROR, f"Cannot compare void value")
+
+        left_type = left_value_obj.type()
+        right_type = right_value_obj.type()
+        if interp._is_struct(left_type) or interp._is_struct(right_type):
+            return interp._struct_eval_op(arith_ast, left_value_obj, right_value_obj)
+
+        if left_type == Type.BOOL and right_type == Type.INT:
+            right_value_obj = interp.coerce_value(right_value_obj, Type.BOOL)
+            right_type = Type.BOOL
+        if right_type == Type.BOOL and left_type == Type.INT:
+            left_value_obj = interp.coerce_value(left_value_obj, Type.BOOL)
+            left_type = Type.BOOL
+
+        if left_type != right_type:
+            interp.error(
+                ErrorType.TYPE_ERROR,
+                f"Incompatible types for {op} operation",
+            )
+        f = lambdas.get(left_type)
+        if f is None:
+            interp.error(
+                ErrorType.TYPE_ERROR,
+                f"Incompatible operator {op} for type {left_type}",
+            )
+        return f(left_value_obj, right_value_obj)
+
+    def __input(self, arg, stack):
+        interp = self.interpreter
+        func_name, n_args = arg
+        if n_args == 1:
+            interp.write_output(get_printable(stack.pop()))
+        elif n_args > 1:
+            interp.error(
+                ErrorType.NAME_ERROR,
+                "No inputi() function that takes > 1 parameter",
+            )
+        inp = interp.get_input()
+        if func_name == "inputi":
+            return int_value(int(inp))
+        return Value(Type.STRING, inp)